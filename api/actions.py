@@ -1,67 +1,82 @@
 import time
-from api.state import state
-from config.settings import DEVICE_MAP, OVERRIDE_DURATION
-from api.tapo_client import get_tapo_client
+from api.rooms import get_room
+from config.settings import OVERRIDE_DURATION
+from api.tapo_client import get_device, drop_device, device_lock
+from utils.metrics import DEVICE_SECONDS, DEVICE_COMMANDS
 
-async def toggle_device(device_name, state_requested):
-    """Turn any Tapo device ON or OFF dynamically while respecting manual overrides."""
+async def toggle_device(device_name, state_requested, override=True, room=None):
+    """
+    Turn any Tapo device ON or OFF dynamically while respecting manual overrides.
+    Scheduled jobs pass `override=False` so their switching is not mistaken for a manual override.
+    """
+    room = get_room(room)
     
-    if device_name not in DEVICE_MAP:
+    if device_name not in room.device_map:
         raise ValueError(f"❌ Invalid device name: {device_name}")
 
-    device_ip = DEVICE_MAP[device_name]["ip"]
-    device_type = DEVICE_MAP[device_name]["type"]
-
-    client = await get_tapo_client()
-    device = await getattr(client, device_type)(device_ip)
+    device_ip = room.device_map[device_name]["ip"]
+    device_type = room.device_map[device_name]["type"]
 
+    start = time.perf_counter()
+    outcome = "ok"
     try:
-        if state_requested:
-            print(f"🔄 Turning ON {device_name}... (Override Active)")
-            await device.on()
-            state[device_name] = True
-        else:
-            print(f"🔄 Turning OFF {device_name}... (Override Active)")
-            await device.off()
-            state[device_name] = False
+        async with device_lock(device_ip):
+            device = await get_device(device_type, device_ip)
+            if state_requested:
+                print(f"🔄 Turning ON {device_name}... (Override Active)")
+                await device.on()
+                room.state[device_name] = True
+            else:
+                print(f"🔄 Turning OFF {device_name}... (Override Active)")
+                await device.off()
+                room.state[device_name] = False
 
         # ✅ Store the manual override timestamp
-        state["overrides"][device_name] = {"state": state_requested, "timestamp": time.time()}
+        if override:
+            room.state.set_in("overrides", device_name, {"state": state_requested, "timestamp": time.time()})
 
     except Exception as e:
+        outcome = "error"
+        drop_device(device_type, device_ip)
         print(f"⚠️ Failed to toggle {device_name}: {str(e)}")
 
+    finally:
+        DEVICE_SECONDS.observe(time.perf_counter() - start, device=device_name, outcome=outcome)
+        DEVICE_COMMANDS.inc(room=room.name, device=device_name, outcome=outcome)
+
 
-def is_override_active(device_name):
+def is_override_active(device_name, room=None):
     """Check if an override is still active."""
-    if device_name in state["overrides"]:
-        override_time = state["overrides"][device_name]["timestamp"]
+    room_state = get_room(room).state
+    overrides = room_state["overrides"]
+    if device_name in overrides:
+        override_time = overrides[device_name]["timestamp"]
         if time.time() - override_time < OVERRIDE_DURATION:
             return True  # Override is still active
         else:
-            del state["overrides"][device_name]  # Remove expired override
+            room_state.pop_in("overrides", device_name)  # Remove expired override
     return False
 
 
-async def toggle_humidifier(state_requested):
+async def toggle_humidifier(state_requested, room=None):
     """Turn the humidifier ON or OFF while respecting manual override."""
-    if is_override_active("humidifier"):
+    if is_override_active("humidifier", room):
         print("🚫 Skipping humidifier adjustment due to manual override")
         return
-    await toggle_device("humidifier", state_requested)
+    await toggle_device("humidifier", state_requested, room=room)
 
 
-async def toggle_exhaust(state_requested):
+async def toggle_exhaust(state_requested, room=None):
     """Turn the exhaust ON or OFF while respecting manual override."""
-    if is_override_active("exhaust"):
+    if is_override_active("exhaust", room):
         print("🚫 Skipping exhaust adjustment due to manual override")
         return
-    await toggle_device("exhaust", state_requested)
+    await toggle_device("exhaust", state_requested, room=room)
 
 
-async def toggle_dehumidifier(state_requested):
+async def toggle_dehumidifier(state_requested, room=None):
     """Turn the dehumidifier ON or OFF while respecting manual override."""
-    if is_override_active("dehumidifier"):
+    if is_override_active("dehumidifier", room):
         print("🚫 Skipping dehumidifier adjustment due to manual override")
         return
-    await toggle_device("dehumidifier", state_requested)
+    await toggle_device("dehumidifier", state_requested, room=room)
@@ -1,16 +1,16 @@
-from api.tapo_client import get_tapo_client
-from config.settings import DEVICE_MAP
+from api.rooms import get_room
+from api.tapo_client import get_device
 
-async def get_device_status(device_name):
+async def get_device_status(device_name, room=None):
     """Fetch the status of any Tapo device dynamically."""
+    device_map = get_room(room).device_map
     
-    if device_name not in DEVICE_MAP:
+    if device_name not in device_map:
         raise ValueError(f"❌ Invalid device name: {device_name}")
 
-    device_ip = DEVICE_MAP[device_name]["ip"]
-    device_type = DEVICE_MAP[device_name]["type"]
+    device_ip = device_map[device_name]["ip"]
+    device_type = device_map[device_name]["type"]
 
-    client = await get_tapo_client()
-    device = await getattr(client, device_type)(device_ip)
+    device = await get_device(device_type, device_ip)
 
     return await device.get_device_info()
@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from api.rooms import load_rooms
+from api.tapo_client import get_device, drop_device, device_lock
+from utils.history import record_energy
+from utils.metrics import ENERGY_POLL_SECONDS, DEVICE_POWER, DEVICE_ENERGY_TODAY, DEVICE_RUNTIME_TODAY
+from config.settings import ENERGY_DEVICE_TYPES, ENERGY_POLL_INTERVAL, ENERGY_POLL_TIMEOUT
+
+
+def energy_plugs(rooms):
+    """(device type, ip) -> [(room, device name)] of every energy-monitoring plug, once per plug."""
+    plugs = {}
+    for room in rooms:
+        for name, config in room.device_map.items():
+            if config.get("type") in ENERGY_DEVICE_TYPES:
+                plugs.setdefault((config["type"], config["ip"]), []).append((room, name))
+    return plugs
+
+
+async def read_energy(device_type, device_ip, timeout=ENERGY_POLL_TIMEOUT):
+    """Current power (W), today's energy (Wh) and runtime (min) and this month's energy (Wh) of one plug."""
+    async with device_lock(device_ip):
+        device = await get_device(device_type, device_ip)
+        usage = await asyncio.wait_for(device.get_energy_usage(), timeout)
+        # Older firmware leaves the power out of the usage report (mW), it has its own call (W)
+        if usage.current_power is not None:
+            power_w = usage.current_power / 1000
+        else:
+            power_w = (await asyncio.wait_for(device.get_current_power(), timeout)).current_power
+
+    return {
+        "power_w": power_w,
+        "today_energy_wh": usage.today_energy,
+        "today_runtime_min": usage.today_runtime,
+        "month_energy_wh": usage.month_energy,
+    }
+
+
+class EnergyCollector:
+    """
+    Polls every energy-monitoring plug (P110/P115) of the rooms at a fixed rate.
+
+    All plugs are read concurrently on their own task, so the control loop never
+    waits for telemetry; a plug only waits for its own device lock. Each poll is
+    stored in the history database of every room using the plug and published as
+    gauges. A failed read drops the plug's handle and is retried next poll.
+    """
+
+    def __init__(self, rooms=None, interval=ENERGY_POLL_INTERVAL, timeout=ENERGY_POLL_TIMEOUT):
+        self.plugs = energy_plugs(rooms or load_rooms())
+        self.interval = interval
+        self.timeout = timeout
+        self.latest = {}
+
+    async def _read(self, device_type, device_ip):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            return await read_energy(device_type, device_ip, self.timeout)
+        except Exception as e:
+            outcome = "timeout" if isinstance(e, asyncio.TimeoutError) else "error"
+            drop_device(device_type, device_ip)
+            print(f"⚠️ Energy read of {device_type} at {device_ip} failed: {str(e) or outcome}")
+            return None
+        finally:
+            ENERGY_POLL_SECONDS.observe(time.perf_counter() - started, device=device_type, outcome=outcome)
+
+    async def poll(self):
+        """Read every plug once. Returns {room name: {device name: sample}} of the plugs that answered."""
+        timestamp = time.time()
+        keys = list(self.plugs)
+        results = await asyncio.gather(*(self._read(*key) for key in keys))
+
+        samples = {}
+        for key, sample in zip(keys, results):
+            if sample is None:
+                continue
+            for room, name in self.plugs[key]:
+                samples.setdefault(room, {})[name] = sample
+                DEVICE_POWER.set(sample["power_w"], room=room.name, device=name)
+                DEVICE_ENERGY_TODAY.set(sample["today_energy_wh"], room=room.name, device=name)
+                DEVICE_RUNTIME_TODAY.set(sample["today_runtime_min"] * 60, room=room.name, device=name)
+
+        for room, room_samples in samples.items():
+            await asyncio.to_thread(record_energy, timestamp, room_samples, room.history_path)
+            self.latest[room.name] = {"timestamp": timestamp, **room_samples}
+        return {room.name: room_samples for room, room_samples in samples.items()}
+
+    async def run(self):
+        """Poll every `interval` seconds, measured from the start of each poll, until cancelled."""
+        if not self.plugs:
+            print("⚠️ No energy-monitoring plugs configured, energy telemetry is off.")
+            return
+        print(f"⚡ Collecting energy telemetry from {len(self.plugs)} plug(s) every {self.interval}s.")
+        while True:
+            started = time.monotonic()
+            try:
+                await self.poll()
+            except Exception as e:
+                print(f"❌ Energy poll failed: {e}")
+            await asyncio.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+
+if __name__ == "__main__":
+    async def main():
+        for room, samples in (await EnergyCollector().poll()).items():
+            for device, sample in samples.items():
+                print(f"⚡ [{room}] {device}: {sample['power_w']:.1f} W now, {sample['today_energy_wh']} Wh "
+                      f"and {sample['today_runtime_min']} min today, {sample['month_energy_wh']} Wh this month")
+
+    asyncio.run(main())
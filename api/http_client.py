@@ -0,0 +1,223 @@
+import json
+import asyncio
+from urllib.parse import urlsplit
+
+from config.settings import HTTP_TIMEOUT, HTTP_POOL_SIZE
+
+# Methods without side effects, sent without a body unless one is given
+IDEMPOTENT_METHODS = {"GET", "HEAD"}
+
+
+class RequestError(Exception):
+    """Connection failure, timeout or (from `raise_for_status`) a non-2xx status."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _StaleConnection(Exception):
+    """A reused keep-alive connection the server had already closed before answering."""
+
+
+class Response:
+    def __init__(self, status, reason, headers, body):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+    def raise_for_status(self):
+        if not 200 <= self.status < 300:
+            raise RequestError(f"{self.status} {self.reason}", self.status)
+
+
+class _Connection:
+    """One keep-alive HTTP/1.1 connection to a host."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.reusable = True
+
+    @classmethod
+    async def open(cls, host, port):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    def send(self, payload):
+        self.writer.write(payload)
+
+    async def read_response(self, method):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by the server")
+
+        version, status, reason = (status_line.decode("latin-1").rstrip("\r\n").split(" ", 2) + [""])[:3]
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        status = int(status)
+        connection = headers.get("connection", "").lower()
+        self.reusable = (connection != "close") if version == "HTTP/1.1" else (connection == "keep-alive")
+
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            body = b""
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await self._read_chunked()
+        elif "content-length" in headers:
+            body = await self.reader.readexactly(int(headers["content-length"]))
+        else:
+            # No framing, the body ends when the server closes the connection
+            body = await self.reader.read()
+            self.reusable = False
+        return Response(status, reason, headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readline()).split(b";")[0].strip(), 16)
+            if size == 0:
+                # Skip trailers up to the blank line
+                while (await self.reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                return b"".join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def close(self):
+        self.reusable = False
+        self.writer.close()
+
+
+class HTTPClient:
+    """
+    Small asyncio HTTP/1.1 client for calls between the controller and the other services.
+
+    Connections are kept alive and pooled per host (at most `pool_size` open at a
+    time) and every call has a timeout that covers connecting, sending and reading.
+    Nothing blocks the event loop while a service is slow to answer.
+    """
+
+    def __init__(self, timeout=HTTP_TIMEOUT, pool_size=HTTP_POOL_SIZE):
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.loop = None
+        self._idle = {}
+        self._slots = {}
+
+    @staticmethod
+    def _target(url):
+        parts = urlsplit(url)
+        if parts.scheme != "http":
+            raise RequestError(f"Unsupported URL scheme in {url}")
+        host = parts.hostname or "localhost"
+        path = parts.path or "/"
+        if parts.query:
+            path += f"?{parts.query}"
+        return host, parts.port or 80, path
+
+    @staticmethod
+    def _encode(method, host, port, path, body=b"", headers=None):
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}:{port}", "Connection: keep-alive", "Accept: application/json"]
+        if body or method not in IDEMPOTENT_METHODS:
+            lines.append(f"Content-Length: {len(body)}")
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+    async def _acquire(self, host, port):
+        key = (host, port)
+        slots = self._slots.setdefault(key, asyncio.Semaphore(self.pool_size))
+        await slots.acquire()
+        idle = self._idle.setdefault(key, [])
+        while idle:
+            connection = idle.pop()
+            if not connection.reader.at_eof():
+                return connection, True
+            connection.close()
+        try:
+            return await _Connection.open(host, port), False
+        except BaseException:
+            slots.release()
+            raise
+
+    def _release(self, host, port, connection):
+        if connection.reusable and not connection.reader.at_eof():
+            self._idle[(host, port)].append(connection)
+        else:
+            connection.close()
+        self._slots[(host, port)].release()
+
+    async def _exchange(self, host, port, payload, method):
+        """Send `payload` on a pooled connection and read its response."""
+        connection, reused = await self._acquire(host, port)
+        try:
+            connection.send(payload)
+            await connection.writer.drain()
+            return await connection.read_response(method)
+        except (ConnectionResetError, BrokenPipeError) as e:
+            connection.close()
+            if reused:
+                raise _StaleConnection() from e
+            raise
+        except BaseException:
+            connection.close()
+            raise
+        finally:
+            self._release(host, port, connection)
+
+    async def request(self, method, url, json_body=None, headers=None, timeout=None):
+        """Send one request and return its `Response`; raises `RequestError` on failure or timeout."""
+        method = method.upper()
+        host, port, path = self._target(url)
+        body = b""
+        headers = dict(headers or {})
+        if json_body is not None:
+            body = json.dumps(json_body).encode("utf-8")
+            headers.setdefault("Content-Type", "application/json")
+        payload = self._encode(method, host, port, path, body, headers)
+
+        try:
+            async with asyncio.timeout(self.timeout if timeout is None else timeout):
+                try:
+                    return await self._exchange(host, port, payload, method)
+                except _StaleConnection:
+                    # The server dropped the idle connection without answering, send it again on a fresh one
+                    return await self._exchange(host, port, payload, method)
+        except TimeoutError as e:
+            raise RequestError(f"{method} {url} timed out") from e
+        except (OSError, asyncio.IncompleteReadError, ValueError) as e:
+            raise RequestError(f"{method} {url} failed: {e}") from e
+
+    async def get(self, url, **kwargs):
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url, json=None, **kwargs):
+        return await self.request("POST", url, json_body=json, **kwargs)
+
+    async def close(self):
+        for idle in self._idle.values():
+            for connection in idle:
+                connection.close()
+        self._idle.clear()
+
+
+_client = None
+
+
+def get_http_client():
+    """Shared client of the running event loop, created on first use."""
+    global _client
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.loop is not loop:
+        _client = HTTPClient()
+        _client.loop = loop
+    return _client
@@ -1,27 +1,203 @@
-import joblib
-
-# Global dictionary to store models
-models = {}
-
-def load_models():
-    """Loads all required machine learning models into the global `models` dictionary."""
-    global models  # Ensure we're modifying the global dictionary
-
-    model_files = {
-        "Q_table": "../model/q_learning.pkl",
-        "exhaust_model": "../model/exhaust_model.pkl",
-        "humidifier_model": "../model/humidifier_model.pkl",
-        "dehumidifier_model": "../model/dehumidifier_model.pkl",
-        "anomaly_detector": "../model/anomaly_detector.pkl",
-    }
-
-    for model_name, path in model_files.items():
-        try:
-            models[model_name] = joblib.load(path)
-            print(f"✅ {model_name} loaded successfully!")
-        except FileNotFoundError:
-            print(f"❌ ERROR: Model {model_name} NOT found at {path}. Check if it exists!")
-            models[model_name] = None
-        except Exception as e:
-            print(f"❌ ERROR loading {model_name}: {str(e)}")
-            models[model_name] = None
+import os
+import sys
+import mmap
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.q_grid import QGrid, metadata_path
+from model.compiled_forest import CompiledForest, CompiledIsolationForest, forest_metadata_path
+from model.manifest import load_manifest, artifact_key
+from config.settings import (
+    Q_GRID_PATH, Q_TABLE_PATH, Q_INDEX_PATH, Q_GRID_INDEX_PATH, ANOMALY_MODEL_PATH, ANOMALY_FOREST_PATH,
+    EXHAUST_MODEL_PATH, HUMIDIFIER_MODEL_PATH, DEHUMIDIFIER_MODEL_PATH,
+    EXHAUST_FOREST_PATH, HUMIDIFIER_FOREST_PATH, DEHUMIDIFIER_FOREST_PATH, MANIFEST_PATH, ONLINE_LEARNING,
+    ROOM_MODEL_PATH
+)
+
+
+class Artifact:
+    """One model artifact, loaded on first use."""
+
+    def __init__(self, name, loader, paths):
+        self.name = name
+        self.loader = loader
+        self.paths = paths
+        self.value = None
+        self.loaded = False
+        self.source = None
+        self.signature = None
+        self.load_seconds = None
+        self.warm_seconds = None
+
+
+class ArtifactStore:
+    """
+    Lazily loaded, memory-mapped model artifacts with per-artifact load times.
+
+    Array artifacts (the Q-grid, compiled forests) are memory-mapped, so loading
+    one only reads its small .json metadata and the OS pages the arrays in as they
+    are used. `warm_up` touches every page up front for a service that would rather
+    pay that cost at startup than on the first request. Pickles are only unpickled
+    as a fallback when no array export exists.
+    """
+
+    def __init__(self):
+        self.artifacts = {}
+
+    def register(self, name, loader, paths):
+        """`loader()` returns (value, source); `paths` are the files it reads."""
+        self.artifacts[name] = Artifact(name, loader, paths)
+
+    def _signature(self, artifact):
+        """
+        Content hash of every artifact file as recorded in the training manifest, so
+        a retrain that reproduces a file does not force a reload. Files written after
+        the manifest (or missing from it) fall back to their mtime.
+        """
+        hashes = {}
+        manifest = load_manifest() or {}
+        manifest_time = os.path.getmtime(MANIFEST_PATH) if manifest else 0
+        for entry in manifest.get("artifacts", {}).values():
+            hashes.update(entry.get("artifacts", {}))
+
+        signature = []
+        for path in artifact.paths:
+            if not os.path.exists(path):
+                signature.append(None)
+            elif artifact_key(path) in hashes and os.path.getmtime(path) <= manifest_time:
+                signature.append(hashes[artifact_key(path)])
+            else:
+                signature.append(os.path.getmtime(path))
+        return tuple(signature)
+
+    def get(self, name):
+        artifact = self.artifacts[name]
+        if not artifact.loaded:
+            start = time.perf_counter()
+            artifact.value, artifact.source = artifact.loader()
+            artifact.load_seconds = time.perf_counter() - start
+            artifact.signature = self._signature(artifact)
+            artifact.loaded = True
+            print(f"📦 {name} loaded in {artifact.load_seconds * 1000:.1f} ms ({artifact.source})")
+        return artifact.value
+
+    def override(self, name, value, source="override"):
+        """Serve `value` for `name` instead of loading it, e.g. a synthetic model in a benchmark."""
+        artifact = self.artifacts[name]
+        artifact.value, artifact.source = value, source
+        artifact.loaded, artifact.signature = True, None
+        artifact.load_seconds = artifact.warm_seconds = None
+
+    def warm_up(self, names=None):
+        """Load the given (default: every available) artifact and fault in its mapped pages."""
+        for name in names or self.available():
+            artifact = self.artifacts[name]
+            self.get(name)
+            start = time.perf_counter()
+            for array in _mapped_arrays(artifact.value):
+                array.reshape(-1).view(np.uint8)[::mmap.PAGESIZE].sum()
+            artifact.warm_seconds = time.perf_counter() - start
+
+    def available(self):
+        """Artifacts with at least one of their files on disk."""
+        return [name for name, artifact in self.artifacts.items() if any(os.path.exists(path) for path in artifact.paths)]
+
+    def refresh(self):
+        """
+        Drop loaded artifacts whose files changed (per the training manifest) so the
+        next `get` reloads them. Unchanged artifacts stay mapped. Returns the dropped names.
+        """
+        changed = []
+        for name, artifact in self.artifacts.items():
+            if artifact.loaded and self._signature(artifact) != artifact.signature:
+                artifact.loaded, artifact.value = False, None
+                changed.append(name)
+        return changed
+
+    def report(self):
+        """Per-artifact startup report: source, load and warm-up time, mapped bytes."""
+        return [
+            {
+                "name": artifact.name,
+                "loaded": artifact.loaded,
+                "source": artifact.source,
+                "load_ms": None if artifact.load_seconds is None else round(artifact.load_seconds * 1000, 2),
+                "warm_ms": None if artifact.warm_seconds is None else round(artifact.warm_seconds * 1000, 2),
+                "mapped_bytes": sum(array.nbytes for array in _mapped_arrays(artifact.value)),
+            }
+            for artifact in self.artifacts.values()
+        ]
+
+    def print_report(self):
+        print("📦 Artifact startup report:")
+        for entry in self.report():
+            if entry["loaded"]:
+                warm = f", warm-up {entry['warm_ms']} ms" if entry["warm_ms"] is not None else ""
+                print(f"   {entry['name']}: {entry['source']}, {entry['load_ms']} ms{warm}, "
+                      f"{entry['mapped_bytes'] / 1e6:.1f} MB mapped")
+            else:
+                print(f"   {entry['name']}: not loaded")
+
+
+def _mapped_arrays(value):
+    """The memory-mapped backing array of a Q-grid (`table`) or compiled forest (`nodes`)."""
+    arrays = [getattr(value, attribute, None) for attribute in ("table", "nodes")]
+    return [array for array in arrays if isinstance(array, np.memmap)]
+
+
+def _load_pickle(path):
+    import joblib
+
+    return joblib.load(path)
+
+
+def load_q_table(mmap_mode="r"):
+    """The Q-grid when one was exported (memory-mapped unless `mmap_mode` is None), else the pickled dict."""
+    if os.path.exists(Q_GRID_PATH):
+        return QGrid.load(Q_GRID_PATH, mmap_mode=mmap_mode), "mmap" if mmap_mode else "npy"
+    if os.path.exists(Q_TABLE_PATH):
+        return _load_pickle(Q_TABLE_PATH), "pickle"
+    raise FileNotFoundError(f"❌ Error: Q-table file not found at {Q_GRID_PATH} or {Q_TABLE_PATH}.")
+
+
+def _forest_loader(forest_path, model_path, compiled_class):
+    """Memory-map the compiled forest, or compile the pickled sklearn model on load."""
+    def load():
+        if os.path.exists(forest_path):
+            return compiled_class.load(forest_path), "mmap"
+        return compiled_class.from_estimator(_load_pickle(model_path)), "pickle (compiled on load)"
+    return load
+
+
+def _neighbour_index_loader():
+    from utils.state_encoder import load_neighbour_index
+
+    Q_table = artifacts.get("q_table")
+    if isinstance(Q_table, QGrid):
+        return load_neighbour_index(Q_table, Q_GRID_INDEX_PATH), "pickle (Q-grid cells)"
+    return load_neighbour_index(Q_table), "pickle"
+
+
+def _room_model_loader():
+    from model.room_model import RoomModel
+
+    if os.path.exists(ROOM_MODEL_PATH):
+        return RoomModel.load(ROOM_MODEL_PATH), "json"
+    return RoomModel.from_dynamics(), "defaults (simulator dynamics)"
+
+
+artifacts = ArtifactStore()
+# Online learning writes to the Q-grid, so it needs a private copy instead of a read-only map
+artifacts.register("q_table", lambda: load_q_table(None if ONLINE_LEARNING else "r"),
+                   [Q_GRID_PATH, metadata_path(Q_GRID_PATH), Q_TABLE_PATH])
+artifacts.register("neighbour_index", _neighbour_index_loader, [Q_INDEX_PATH, Q_GRID_INDEX_PATH])
+artifacts.register("room_model", _room_model_loader, [ROOM_MODEL_PATH])
+for _name, _forest_path, _model_path, _compiled_class in [
+    ("exhaust_model", EXHAUST_FOREST_PATH, EXHAUST_MODEL_PATH, CompiledForest),
+    ("humidifier_model", HUMIDIFIER_FOREST_PATH, HUMIDIFIER_MODEL_PATH, CompiledForest),
+    ("dehumidifier_model", DEHUMIDIFIER_FOREST_PATH, DEHUMIDIFIER_MODEL_PATH, CompiledForest),
+    ("anomaly_detector", ANOMALY_FOREST_PATH, ANOMALY_MODEL_PATH, CompiledIsolationForest),
+]:
+    artifacts.register(_name, _forest_loader(_forest_path, _model_path, _compiled_class),
+                       [_forest_path, forest_metadata_path(_forest_path), _model_path])
@@ -1,12 +1,10 @@
 import os
 import sys
-from flask import Flask, request, jsonify, request, Response
-import requests
-import joblib
+import time
+import hmac
+from flask import Flask, request, jsonify, request, Response, g
 import asyncio
-import pandas as pd
 import numpy as np
-import asyncio
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
@@ -14,21 +12,70 @@ from api.tapo_controller import get_device_info_json, get_sensor_data, get_devic
 from api.device_status import get_device_status
 from api.actions import toggle_dehumidifier, toggle_exhaust, toggle_humidifier
 from api.state import state  
-from api.models import models, load_models
+from api.models import artifacts
+from model.policy import choose_best_action
+from api.rooms import load_rooms, room_path, get_room
+from utils.metrics import REQUEST_SECONDS, CONTENT_TYPE, render
+from utils.profiling import ProfileSession
 from utils.calculate import calculate_vpd
+from utils.history import load_rollup, load_energy, energy_summary
+from utils.state_encoder import encode_state, LOOKUP_STATS
 from flask_cors import CORS
-from config.settings import ACTION_MAP, ANOMALY_MODEL_PATH, Q_TABLE_PATH, EXHAUST_MODEL_PATH, HUMIDIFIER_MODEL_PATH, DEHUMIDIFIER_MODEL_PATH, WS_URL, DEVICE_MAP, MAX_HUMIDITY_LEVELS, VPD_TARGET, VPD_MODES, FASTAPI_URL, PROXY_URL, KPA_TOLERANCE, LEAF_TEMP_OFFSET
+from config.settings import ACTION_MAP, ANOMALY_SCORE_THRESHOLD, ARTIFACT_WARMUP, WS_URL, DEVICE_MAP, MAX_HUMIDITY_LEVELS, VPD_TARGET, VPD_MODES, FASTAPI_URL, PROXY_URL, KPA_TOLERANCE, LEAF_TEMP_OFFSET, NEIGHBOUR_TOLERANCE, DEFAULT_ROOM, HISTORY_DB, ADMIN_TOKEN, PROFILE_SIGNAL_DURATION
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True)
 
-Q_table = None
-models = {
-    "exhaust_model": None,
-    "humidifier_model": None,
-    "dehumidifier_model": None
-}
-anomaly_detector = None
+
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_latency(response):
+    # Label by route pattern, not the raw path, so /history/<tier> stays one series
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    REQUEST_SECONDS.observe(time.perf_counter() - g.request_started, service="proxy", route=route,
+                            method=request.method, status=response.status_code)
+    return response
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics of the proxy process."""
+    return Response(render(), content_type=CONTENT_TYPE)
+
+
+profiler = ProfileSession(name="proxy")
+
+
+def is_admin():
+    token = request.headers.get("X-Admin-Token", "")
+    return ADMIN_TOKEN is not None and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+@app.route('/admin/profile', methods=['GET'])
+def profile_status():
+    """The running capture and the summary of the last one."""
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    return jsonify(profiler.status())
+
+
+@app.route('/admin/profile/<kind>', methods=['POST'])
+def start_profile(kind):
+    """Start a `cpu` (sampling, pstats + collapsed stacks) or `memory` (tracemalloc) capture for `?duration=` seconds."""
+    if not is_admin():
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        status = profiler.start(kind, request.args.get("duration", PROFILE_SIGNAL_DURATION, type=float))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if status is None:
+        return jsonify({"error": "A profile is already running", **profiler.status()}), 409
+    return jsonify(status), 202
+
 
 @app.route('/config-settings', methods=['GET'])
 async def config_settings():
@@ -44,7 +91,7 @@ async def config_settings():
             "DEVICE_MAP": DEVICE_MAP,
             "WS_URL": WS_URL
         })
-    except requests.RequestException as e:
+    except Exception as e:
         return jsonify({"error": str(e)}), 500
     
 
@@ -122,6 +169,9 @@ def adjust_conditions():
 @app.route("/vpd", methods=["GET"])
 def get_vpd_data():
     """Fetch latest VPD data from FastAPI."""
+    # Only this route talks to another service synchronously, import the client on first use
+    import requests
+
     try:
         response = requests.get(f"{FASTAPI_URL}/ws/vpd", stream=True)
         return Response(response.iter_content(), content_type=response.headers['Content-Type'])
@@ -241,7 +291,16 @@ def dehumidifier_info_json():
 
 @app.route('/device_state', methods=['GET'])
 def get_device_state():
-    return jsonify(state)  
+    """The shared controller state of `?room=` (default room), with its version in the X-State-Version header."""
+    name = request.args.get("room", DEFAULT_ROOM)
+    rooms = {room.name: room for room in load_rooms()}
+    if name != DEFAULT_ROOM and name not in rooms:
+        return jsonify({"error": f"Unknown room: {name}"}), 404
+
+    version, snapshot = (rooms[name].state if name in rooms else state).snapshot()
+    response = jsonify(snapshot)
+    response.headers["X-State-Version"] = str(version)
+    return response
 
 
 @app.route('/set_vpd_target', methods=['POST'])
@@ -270,23 +329,58 @@ def get_vpd_target():
         return jsonify({"error": "Server error"}), 500
  
  
+@app.route("/history/<tier>", methods=["GET"])
+def history(tier):
+    """Return a rollup tier (min/max/mean per bucket) for dashboards, of `?room=` or the default room."""
+    try:
+        start = request.args.get("start", type=float)
+        end = request.args.get("end", type=float)
+        name = request.args.get("room", DEFAULT_ROOM)
+        if name != DEFAULT_ROOM and name not in [room.name for room in load_rooms()]:
+            return jsonify({"error": f"Unknown room: {name}"}), 404
+        return jsonify(load_rollup(tier, start, end, room_path(HISTORY_DB, name)))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+
+@app.route("/energy", methods=["GET"])
+def energy():
+    """
+    Plug telemetry of `?room=` (default room) between `?start=` and `?end=` (default: the last 24 h):
+    the energy summary (duty cycle, Wh per hour in the VPD band) and the latest sample per plug.
+    """
+    name = request.args.get("room", DEFAULT_ROOM)
+    rooms = {room.name: room for room in load_rooms()}
+    if name != DEFAULT_ROOM and name not in rooms:
+        return jsonify({"error": f"Unknown room: {name}"}), 404
+    room = rooms.get(name) or get_room()
+
+    end = request.args.get("end", default=time.time(), type=float)
+    start = request.args.get("start", default=end - 24 * 3600, type=float)
+    path = room_path(HISTORY_DB, name)
+    latest = {}
+    for sample in load_energy(start, end, path=path):
+        latest[sample["device"]] = sample
+
+    return jsonify({**energy_summary(start, end, room.vpd_range(), path=path), "latest": latest})
+
+
 def load_models():
-    """Load all required models into memory."""
-    global Q_table, models, anomaly_detector
+    """Load every available artifact and fault in its pages up front, then report the times."""
+    artifacts.warm_up()
+    artifacts.print_report()
+
 
-    if Q_table is None:
-        Q_table = joblib.load(Q_TABLE_PATH)
-        print("✅ Q-learning table loaded!")
+@app.route("/artifacts", methods=["GET"])
+def artifact_report():
+    """Per-artifact load source, load / warm-up time and mapped size."""
+    return jsonify(artifacts.report())
 
-    if models["exhaust_model"] is None:
-        models["exhaust_model"] = joblib.load(EXHAUST_MODEL_PATH)
-        models["humidifier_model"] = joblib.load(HUMIDIFIER_MODEL_PATH)
-        models["dehumidifier_model"] = joblib.load(DEHUMIDIFIER_MODEL_PATH)
-        print("✅ ML models loaded!")
 
-    if anomaly_detector is None:
-        anomaly_detector = joblib.load(ANOMALY_MODEL_PATH)
-        print("✅ Anomaly detection model loaded!")
+@app.route("/artifacts/refresh", methods=["POST"])
+def refresh_artifacts():
+    """Drop artifacts that were retrained since they were loaded; they reload on next use."""
+    return jsonify({"reloading": artifacts.refresh()})
 
 
 @app.route("/get_prediction_data", methods=["GET"])
@@ -331,8 +425,10 @@ def predict_action():
             response.headers.add("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
             response.headers.add("Access-Control-Allow-Headers", "Content-Type, Authorization")
             return response, 204
-        
-        load_models()
+
+
+        Q_table = artifacts.get("q_table")
+        state_tree, known_states = artifacts.get("neighbour_index")
 
         # Debugging: Print incoming request details
         print(f"📥 Received headers: {request.headers}")
@@ -344,7 +440,7 @@ def predict_action():
 
         data = request.get_json()
 
-        input_state = (
+        input_state = encode_state(
             float(data.get("humidity", 0)),
             float(data.get("leaf_temperature", 0)),
             float(data.get("temperature", 0)),
@@ -352,11 +448,8 @@ def predict_action():
             float(data.get("vpd_leaf", 0))
         )
 
-        if input_state not in Q_table:
-            print(f"⚠️ Warning: Unseen state {input_state}, taking random action")
-            action = np.random.choice(list(ACTION_MAP.keys()))
-        else:
-            action = np.argmax(Q_table[input_state])
+        grow_stage = data.get("grow_stage", state.get("grow_stage", "flowering"))
+        action = choose_best_action(input_state, Q_table, state_tree, known_states, grow_stage, NEIGHBOUR_TOLERANCE)
 
         action_name = ACTION_MAP.get(action, "unknown_action")  
         return jsonify({"predicted_action": action_name})
@@ -367,6 +460,12 @@ def predict_action():
 
 
 
+@app.route("/lookup_stats", methods=["GET"])
+def lookup_stats():
+    """Q-table hit / near-hit / miss counters of this process."""
+    return jsonify(LOOKUP_STATS)
+
+
 @app.route("/predict", methods=["OPTIONS", "POST"])
 def predict():
     try:
@@ -377,8 +476,6 @@ def predict():
             response.headers.add("Access-Control-Allow-Headers", "Content-Type, Authorization")
             return response, 204
         
-        load_models()  
-
         data = request.json
         required_fields = ["temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf"]
         for field in required_fields:
@@ -387,9 +484,9 @@ def predict():
 
         features = np.array([[data[f] for f in required_fields]])
 
-        exhaust_prediction = models["exhaust_model"].predict(features)[0]
-        humidifier_prediction = models["humidifier_model"].predict(features)[0]
-        dehumidifier_prediction = models["dehumidifier_model"].predict(features)[0]
+        exhaust_prediction = artifacts.get("exhaust_model").predict(features)[0]
+        humidifier_prediction = artifacts.get("humidifier_model").predict(features)[0]
+        dehumidifier_prediction = artifacts.get("dehumidifier_model").predict(features)[0]
 
         return jsonify({
             "exhaust": bool(exhaust_prediction),
@@ -412,7 +509,7 @@ def detect_anomaly():
             response.headers.add("Access-Control-Allow-Headers", "Content-Type, Authorization")
             return response, 204
         
-        load_models()  
+        anomaly_detector = artifacts.get("anomaly_detector")
 
         data = request.json
         if not isinstance(data, dict):
@@ -425,18 +522,17 @@ def detect_anomaly():
 
         print(f"✅ Processed data for anomaly detection: {data}")
 
-        input_features = pd.DataFrame([data])
         expected_features = ["temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf", "exhaust", "humidifier", "dehumidifier"]
 
         for col in expected_features:
-            if col not in input_features.columns:
+            if col not in data:
                 print(f"⚠️ Missing feature: {col}, filling with False/0")
-                input_features[col] = False if col in ["exhaust", "humidifier", "dehumidifier"] else 0
+                data[col] = False if col in ["exhaust", "humidifier", "dehumidifier"] else 0
 
-        input_features = input_features[expected_features]
+        input_features = np.array([[data[col] for col in expected_features]], dtype=np.float64)
 
         anomaly_score = anomaly_detector.decision_function(input_features)
-        is_anomaly = anomaly_score[0] < -0.5 
+        is_anomaly = anomaly_score[0] < ANOMALY_SCORE_THRESHOLD
         
         print(f"🚀 Anomaly Score: {anomaly_score}, Detected: {bool(is_anomaly)}")
         return jsonify({"anomaly_detected": bool(is_anomaly)})
@@ -447,5 +543,6 @@ def detect_anomaly():
 
 
 if __name__ == "__main__":
-    load_models() 
+    if ARTIFACT_WARMUP:
+        load_models()
     app.run(host="0.0.0.0", port=5000, debug=True)
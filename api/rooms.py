@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from api.state import state, new_state
+from utils.logs import LOG_CSV_FILE
+from config.settings import DEVICE_MAP, VPD_MODES, CONTROL_INTERVAL, HISTORY_DB, ROOMS_FILE, DEFAULT_ROOM
+
+CONTROLLED_DEVICES = ["exhaust", "humidifier", "dehumidifier"]
+
+
+def room_path(path, name):
+    """`path` for the default room, `<base>_<room><ext>` for every other room."""
+    if name == DEFAULT_ROOM:
+        return path
+    base, ext = os.path.splitext(path)
+    return f"{base}_{name}{ext}"
+
+
+class Room:
+    """
+    One controlled room: its devices, grow stage, VPD target, tick interval and state.
+
+    Rooms only hold configuration and state. The Tapo client, device handles and
+    models are shared by every room of the process.
+    """
+
+    def __init__(self, name, devices=DEVICE_MAP, grow_stage="flowering", vpd_target=None,
+                 control_interval=CONTROL_INTERVAL, room_state=None):
+        missing = [device for device in ["sensor_hub", *CONTROLLED_DEVICES] if device not in devices]
+        if missing:
+            raise ValueError(f"❌ Room '{name}' is missing devices: {', '.join(missing)}")
+        if grow_stage not in VPD_MODES:
+            raise ValueError(f"❌ Room '{name}' has an invalid grow stage: {grow_stage}")
+
+        self.name = name
+        self.device_map = devices
+        self.vpd_target = tuple(vpd_target) if vpd_target else None
+        self.control_interval = control_interval
+        self.state = room_state if room_state is not None else new_state(grow_stage, name)
+
+    @property
+    def grow_stage(self):
+        return self.state.get("grow_stage", "flowering")
+
+    def vpd_range(self):
+        """The configured VPD target, or the band of the current grow stage."""
+        return self.vpd_target or VPD_MODES.get(self.grow_stage, (1.2, 1.6))
+
+    @property
+    def log_path(self):
+        return room_path(LOG_CSV_FILE, self.name)
+
+    @property
+    def history_path(self):
+        return room_path(HISTORY_DB, self.name)
+
+    def __repr__(self):
+        return f"Room({self.name!r}, stage={self.grow_stage!r})"
+
+
+# The single-room setup: DEVICE_MAP and the global `state`
+default_room = Room(DEFAULT_ROOM, DEVICE_MAP, room_state=state)
+
+
+def load_rooms(path=ROOMS_FILE):
+    """Rooms listed in the rooms file, or just the default room when there is none."""
+    if not os.path.exists(path):
+        return [default_room]
+
+    with open(path, "r", encoding="utf-8") as file:
+        config = json.load(file)
+
+    rooms, names = [], set()
+    for entry in config:
+        name = entry["name"]
+        if name in names:
+            raise ValueError(f"❌ Duplicate room name: {name}")
+        names.add(name)
+        rooms.append(Room(
+            name, entry["devices"], entry.get("grow_stage", "flowering"), entry.get("vpd_target"),
+            entry.get("control_interval", CONTROL_INTERVAL),
+            # The default room keeps sharing the global state the proxy and API read, with its configured stage
+            room_state=new_state(entry.get("grow_stage"), DEFAULT_ROOM) if name == DEFAULT_ROOM else None,
+        ))
+    return rooms
+
+
+def get_room(room=None):
+    """`room`, or the default room when none is given."""
+    return room if room is not None else default_room
@@ -0,0 +1,193 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from api.rooms import get_room
+from api.actions import toggle_device, is_override_active
+from config.settings import AIR_EXCHANGE_SETTINGS, OVERRIDE_DURATION
+
+
+class Job:
+    """One timed device task and its progress, as shown under `state["jobs"]`."""
+
+    def __init__(self, name, kind, device=None):
+        self.name = name
+        self.kind = kind
+        self.device = device
+        self.status = "scheduled"
+        self.runs = 0
+        self.next_run = None
+        self.ends = None
+        self.detail = None
+        self.task = None
+
+    def to_dict(self):
+        return {
+            "kind": self.kind,
+            "device": self.device,
+            "status": self.status,
+            "runs": self.runs,
+            "next_run": self.next_run,
+            "ends": self.ends,
+            "detail": self.detail,
+        }
+
+
+class DeviceScheduler:
+    """
+    Runs timed device jobs as asyncio tasks next to the control loop.
+
+    A job sleeps on its own task, so a six minute air exchange or a timed window
+    never holds up sensor sampling. Jobs switch devices without recording a manual
+    override and leave devices alone while one is active. Every transition is
+    published to `state["jobs"]`, and `on_change(reason)` is called when a job
+    finishes or is cancelled (the controller passes `cadence.wake`). Each room of
+    a multi-room controller has its own scheduler working on its own devices and state.
+    """
+
+    def __init__(self, on_change=None, room=None):
+        self.on_change = on_change
+        self.room = get_room(room)
+        self.state = self.room.state
+        self.jobs = {}
+        self.state["jobs"] = {}
+
+    def _publish(self, job):
+        # A replaced job may still be winding down, it must not overwrite its successor
+        if self.jobs.get(job.name) is job:
+            self.state.set_in("jobs", job.name, job.to_dict())
+
+    def _start(self, job, coroutine):
+        if job.name in self.jobs and self.jobs[job.name].status in ("scheduled", "running"):
+            self.cancel(job.name)
+        self.jobs[job.name] = job
+        job.task = asyncio.create_task(self._run(job, coroutine))
+        self._publish(job)
+        return job
+
+    async def _run(self, job, coroutine):
+        try:
+            await coroutine
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.detail = str(e)
+            print(f"⚠️ Job '{job.name}' failed: {e}")
+        finally:
+            job.next_run = None
+            self._publish(job)
+            if self.on_change is not None and self.jobs.get(job.name) is job:
+                self.on_change(f"job {job.name} {job.status}")
+
+    async def _switch(self, device, on):
+        """Switch a device for a job, unless a manual override holds it."""
+        if is_override_active(device, self.room):
+            print(f"🚫 Skipping scheduled {device} {'ON' if on else 'OFF'} due to manual override")
+            return False
+        if self.state.get(device) != on:
+            await toggle_device(device, on, override=False, room=self.room)
+        return True
+
+    async def _window(self, job, device, duration, on):
+        """Hold `device` at `on` for `duration` seconds, then restore its previous state."""
+        previous = self.state.get(device, False)
+        if not await self._switch(device, on):
+            job.detail = "skipped, manual override active"
+            return
+        job.status = "running"
+        job.ends = time.time() + duration
+        self._publish(job)
+        try:
+            await asyncio.sleep(duration)
+        finally:
+            # Also restore on cancel, so a cancelled window never leaves a device stuck
+            await asyncio.shield(self._switch(device, previous))
+            job.ends = None
+
+    def schedule_window(self, name, device, duration, delay=0, on=True):
+        """Switch `device` to `on` after `delay` seconds and back after `duration` seconds."""
+        job = Job(name, "window", device)
+        job.next_run = time.time() + delay
+
+        async def run():
+            await asyncio.sleep(delay)
+            await self._window(job, device, duration, on)
+            job.runs += 1
+
+        return self._start(job, run())
+
+    def schedule_air_exchange(self):
+        """
+        Vent through the exhaust every `AIR_EXCHANGE_SETTINGS[stage]["interval"]` seconds
+        for its `duration`. The stage is read each cycle, so a stage change applies
+        from the next exchange on.
+        """
+        job = Job("air_exchange", "periodic", "exhaust")
+
+        async def run():
+            while True:
+                stage = self.room.grow_stage
+                settings = AIR_EXCHANGE_SETTINGS.get(stage, AIR_EXCHANGE_SETTINGS["flowering"])
+                job.status = "scheduled"
+                job.next_run = time.time() + settings["interval"]
+                self._publish(job)
+                await asyncio.sleep(settings["interval"])
+
+                print(f"\n🔄 **Air Exchange Cycle: {stage.capitalize()} mode - Venting Air for {settings['duration'] // 60} minutes...**")
+                await self._window(job, "exhaust", settings["duration"], True)
+                job.runs += 1
+                print("✅ **Air Exchange Complete: Restoring previous state.**")
+
+        return self._start(job, run())
+
+    def track_overrides(self):
+        """Schedule an expiry job for every manual override that does not have one yet."""
+        for device, override in list(self.state["overrides"].items()):
+            name = f"override_expiry:{device}"
+            job = self.jobs.get(name)
+            if job is not None and job.status == "scheduled" and job.detail == override["timestamp"]:
+                continue
+            self._expire_override(name, device, override["timestamp"])
+
+    def _expire_override(self, name, device, timestamp):
+        job = Job(name, "override_expiry", device)
+        job.detail = timestamp
+        job.next_run = timestamp + OVERRIDE_DURATION
+
+        async def run():
+            await asyncio.sleep(max(job.next_run - time.time(), 0))
+
+            def expire(overrides):
+                # A newer override replaced this one, it gets its own expiry job
+                if overrides.get(device, {}).get("timestamp") == timestamp:
+                    del overrides[device]
+                    print(f"⌛ Manual override on {device} expired.")
+                return overrides
+
+            self.state.modify("overrides", expire, {})
+            job.runs += 1
+
+        return self._start(job, run())
+
+    def cancel(self, name):
+        """Cancel a job. A running window restores its device. Returns False for unknown or finished jobs."""
+        job = self.jobs.get(name)
+        if job is None or job.task is None or job.task.done():
+            return False
+        job.task.cancel()
+        return True
+
+    async def close(self):
+        """Cancel every job and wait for devices to be restored."""
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def snapshot(self):
+        return {name: job.to_dict() for name, job in self.jobs.items()}
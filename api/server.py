@@ -2,13 +2,19 @@ import sys
 import os
 import asyncio
 import json
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import time
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from api.tapo_controller import get_sensor_data
+from api.state import state
+from api.rooms import load_rooms
 from utils.calculate import calculate_vpd
+from utils.cadence import AdaptiveCadence
+from utils.metrics import REQUEST_SECONDS, CONTENT_TYPE, render
+from config.settings import LIVE_FEED_INTERVALS, DEFAULT_ROOM
 
 app = FastAPI()
 
@@ -21,6 +27,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    REQUEST_SECONDS.observe(time.perf_counter() - started, service="api", route=route,
+                            method=request.method, status=response.status_code)
+    return response
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics of the API process."""
+    return Response(render(), media_type=CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     return {"message": "FastAPI is running on port 8001"}
@@ -28,6 +50,9 @@ async def root():
 
 async def fetch_live_vpd_data():
     """Fetches real sensor data and calculates VPD dynamically."""
+    min_interval, base_interval, max_interval = LIVE_FEED_INTERVALS
+    cadence = AdaptiveCadence(base_interval, min_interval, max_interval)
+
     while True:
         # Fetch live sensor data
         air_temp, leaf_temp, humidity = await get_sensor_data()
@@ -35,14 +60,19 @@ async def fetch_live_vpd_data():
         # Calculate VPD values
         vpd_air, vpd_leaf = calculate_vpd(air_temp, leaf_temp, humidity)
 
+        # Update faster while conditions move, slower while they are steady
+        interval, reason = cadence.next_interval(humidity, vpd_leaf, state.get("grow_stage", "flowering"))
+
         yield {
             "temperature": air_temp,
             "humidity": humidity,
             "vpd_air": round(vpd_air, 2),
             "vpd_leaf": round(vpd_leaf, 2),
+            "next_update": interval,
+            "update_reason": reason,
         }
 
-        await asyncio.sleep(5)  # Fetch new data every 5 seconds
+        await asyncio.sleep(interval)
 
 
 @app.websocket("/ws/vpd")
@@ -65,6 +95,37 @@ async def websocket_vpd(websocket: WebSocket):
         print("🔄 WebSocket Connection Closed Gracefully")
 
 
+@app.websocket("/ws/state")
+async def websocket_state(websocket: WebSocket, room: str = DEFAULT_ROOM):
+    """Pushes the shared controller state of `?room=` (default room) on connect and after every change."""
+    rooms = {entry.name: entry for entry in load_rooms()}
+    if room != DEFAULT_ROOM and room not in rooms:
+        await websocket.close(code=1008)
+        return
+    room_state = rooms[room].state if room in rooms else state
+
+    await websocket.accept()
+    changed = asyncio.Event()
+    notify = lambda change: changed.set()
+    room_state.subscribe(notify, asyncio.get_running_loop())
+
+    try:
+        sent = None
+        while True:
+            version, snapshot = room_state.snapshot()
+            if version != sent:
+                await websocket.send_text(json.dumps({"version": version, "state": snapshot}))
+                sent = version
+            await changed.wait()
+            changed.clear()
+    except WebSocketDisconnect:
+        print("🔌 State WebSocket Disconnected.")
+    except Exception as e:
+        print(f"⚠️ Unexpected State WebSocket Error: {e}")
+    finally:
+        room_state.unsubscribe(notify)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
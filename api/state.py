@@ -1,9 +1,317 @@
-state = {
-    "overrides": {}, 
-    "humidifier": False,
-    "exhaust": False,
-    "dehumidifier": False,
-    "everything_ok": True,
-    "grow_stage": "flowering" 
-}
+import os
+import sys
+import copy
+import json
+import atexit
+import socket
+import sqlite3
+import threading
+from collections.abc import MutableMapping
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import STATE_DB, DEFAULT_ROOM
+
+# One connection per database and one SharedState per (database, room) in each process
+_connections = {}
+_lock = threading.RLock()
+_instances = {}
+_notifiers = {}
+_sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+
+def default_state(grow_stage="flowering"):
+    """Fresh controller state of one room."""
+    return {
+        "overrides": {},
+        "humidifier": False,
+        "exhaust": False,
+        "dehumidifier": False,
+        "everything_ok": True,
+        "grow_stage": grow_stage
+    }
+
+
+def get_connection(path=STATE_DB):
+    """Open (once per path) the shared state database and make sure its tables exist."""
+    if path not in _connections:
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS state (room TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (room, key))"
+        )
+        connection.execute("CREATE TABLE IF NOT EXISTS state_versions (room TEXT PRIMARY KEY, version INTEGER NOT NULL)")
+        connection.execute("CREATE TABLE IF NOT EXISTS state_subscribers (port INTEGER PRIMARY KEY, pid INTEGER NOT NULL)")
+        _connections[path] = connection
+    return _connections[path]
+
+
+def _pid_alive(pid):
+    # Signal 0 only probes on POSIX, on Windows os.kill would terminate the process
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class _Notifier:
+    """
+    Receives change notifications for one state database.
+
+    The listener binds a UDP socket on localhost and registers its port in the
+    database; every writer sends each committed change to all registered ports.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.bind(("127.0.0.1", 0))
+        self.port = self.socket.getsockname()[1]
+
+        connection = get_connection(path)
+        for port, pid in connection.execute("SELECT port, pid FROM state_subscribers").fetchall():
+            if not _pid_alive(pid):
+                connection.execute("DELETE FROM state_subscribers WHERE port = ?", (port,))
+        connection.execute("INSERT OR REPLACE INTO state_subscribers (port, pid) VALUES (?, ?)", (self.port, os.getpid()))
+        atexit.register(self.close)
+        threading.Thread(target=self._listen, name="state-notifier", daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                message = json.loads(self.socket.recv(65536))
+            except OSError:
+                return
+            except ValueError:
+                continue
+            _dispatch(self.path, message)
+
+    def close(self):
+        with _lock:
+            get_connection(self.path).execute("DELETE FROM state_subscribers WHERE port = ?", (self.port,))
+        self.socket.close()
+
+
+def _dispatch(path, message):
+    instance = _instances.get((path, message.get("room")))
+    if instance is not None:
+        instance._changed(message)
+
+
+def _notify(connection, path, message):
+    """Hand a committed change to this process's subscribers and send it to every other process."""
+    _dispatch(path, message)
+    own = _notifiers[path].port if path in _notifiers else None
+    data = json.dumps(message).encode("utf-8")
+    for (port,) in connection.execute("SELECT port FROM state_subscribers").fetchall():
+        if port != own:
+            try:
+                _sender.sendto(data, ("127.0.0.1", port))
+            except OSError:
+                pass
+
+
+_MISSING = object()
+
+
+class SharedState(MutableMapping):
+    """
+    Controller state of one room, shared by every process through a SQLite database.
+
+    Reads are served from a local copy that is reloaded only when another process
+    committed a change (SQLite's `data_version`). Every write is one transaction
+    that bumps the room's `version`, so a process never sees half an update. After
+    a commit, subscribers in all processes are notified of the changed keys.
+
+    Values are returned as copies, so change a nested value with `set_in`, `pop_in`
+    or `modify` instead of mutating what `state[key]` returned. Values must be JSON.
+
+    Get instances through `new_state`. Every instance of a database shares the
+    process's one connection, whose `data_version` ignores its own commits, so a
+    second instance for the same room would never see the first one's writes;
+    constructing one raises.
+    """
+
+    def __init__(self, room=DEFAULT_ROOM, defaults=None, values=None, path=STATE_DB):
+        with _lock:
+            if (path, room) in _instances:
+                raise ValueError(f"❌ Room {room!r} already has a shared state in this process, use new_state().")
+            _instances[(path, room)] = self
+        self.room = room
+        self.path = path
+        self.version = 0
+        self._data = {}
+        self._seen = None
+        self._callbacks = []
+        # Applied on first use, so importing the module does not touch the database
+        self._pending = (defaults or {}, values or {})
+
+    def _connect(self):
+        connection = get_connection(self.path)
+        if self._pending is not None:
+            defaults, values = self._pending
+            self._pending = None
+
+            def initialise(data):
+                for key, value in defaults.items():
+                    data.setdefault(key, value)
+                data.update(values)
+
+            self._write(connection, initialise)
+        return connection
+
+    def _refresh(self, connection):
+        seen = connection.execute("PRAGMA data_version").fetchone()[0]
+        if seen == self._seen:
+            return
+        row = connection.execute("SELECT version FROM state_versions WHERE room = ?", (self.room,)).fetchone()
+        version = row[0] if row else 0
+        if self._seen is None or version != self.version:
+            rows = connection.execute("SELECT key, value FROM state WHERE room = ?", (self.room,)).fetchall()
+            self._data = {key: json.loads(value) for key, value in rows}
+            self.version = version
+        self._seen = seen
+
+    def _write(self, connection, change):
+        """Apply `change(data)` to the room's latest state in one transaction. Returns what `change` returned."""
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            self._refresh(connection)
+            data = copy.deepcopy(self._data)
+            result = change(data)
+            changed = [key for key in {*self._data, *data} if self._data.get(key, _MISSING) != data.get(key, _MISSING)]
+            if not changed:
+                connection.execute("ROLLBACK")
+                return result
+
+            for key in changed:
+                if key in data:
+                    value = json.dumps(data[key])
+                    # Keep the local copy exactly what other processes will read (tuples become lists)
+                    data[key] = json.loads(value)
+                    connection.execute("INSERT OR REPLACE INTO state (room, key, value) VALUES (?, ?, ?)",
+                                       (self.room, key, value))
+                else:
+                    connection.execute("DELETE FROM state WHERE room = ? AND key = ?", (self.room, key))
+            connection.execute(
+                "INSERT INTO state_versions (room, version) VALUES (?, 1) "
+                "ON CONFLICT(room) DO UPDATE SET version = version + 1", (self.room,)
+            )
+            version = connection.execute("SELECT version FROM state_versions WHERE room = ?", (self.room,)).fetchone()[0]
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        self._data, self.version = data, version
+        _notify(connection, self.path, {"room": self.room, "version": version, "keys": sorted(changed), "pid": os.getpid()})
+        return result
+
+    def transaction(self, change):
+        """Run `change(data)` on a copy of the latest state and commit what it changed, atomically across processes."""
+        with _lock:
+            return self._write(self._connect(), change)
+
+    def snapshot(self):
+        """(version, copy of the whole state), read consistently."""
+        with _lock:
+            self._refresh(self._connect())
+            return self.version, copy.deepcopy(self._data)
+
+    def __getitem__(self, key):
+        with _lock:
+            self._refresh(self._connect())
+            value = self._data[key]
+        return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+    def __setitem__(self, key, value):
+        self.transaction(lambda data: data.__setitem__(key, value))
+
+    def __delitem__(self, key):
+        def delete(data):
+            if key not in data:
+                raise KeyError(key)
+            del data[key]
+        self.transaction(delete)
+
+    def __iter__(self):
+        return iter(self.snapshot()[1])
+
+    def __len__(self):
+        return len(self.snapshot()[1])
+
+    def update(self, *args, **kwargs):
+        """Set several keys in one transaction."""
+        values = dict(*args, **kwargs)
+        self.transaction(lambda data: data.update(values))
+
+    def modify(self, key, func, default=None):
+        """Replace `state[key]` with `func(current value or default)` atomically. Returns the new value."""
+        def change(data):
+            data[key] = func(copy.deepcopy(data.get(key, default)))
+            return data[key]
+        return self.transaction(change)
+
+    def set_in(self, key, field, value):
+        """`state[key][field] = value` for a dict value."""
+        def change(current):
+            current[field] = value
+            return current
+        self.modify(key, change, {})
+
+    def pop_in(self, key, field):
+        """Remove `field` from the dict `state[key]`, if present."""
+        def change(current):
+            current.pop(field, None)
+            return current
+        self.modify(key, change, {})
+
+    def subscribe(self, callback, loop=None):
+        """
+        Call `callback(change)` after every committed change of this room, from any
+        process. `change` holds the room, new version, changed keys and writer pid.
+        Callbacks run on a listener thread, or on `loop` (thread-safe) when given.
+        """
+        with _lock:
+            if self.path not in _notifiers and self.path != ":memory:":
+                _notifiers[self.path] = _Notifier(self.path)
+            self._callbacks.append((callback, loop))
+
+    def unsubscribe(self, callback):
+        with _lock:
+            self._callbacks = [(registered, loop) for registered, loop in self._callbacks if registered is not callback]
+
+    def _changed(self, message):
+        for callback, loop in list(self._callbacks):
+            try:
+                if loop is None:
+                    callback(message)
+                else:
+                    loop.call_soon_threadsafe(callback, message)
+            except Exception as e:
+                print(f"⚠️ State subscriber failed: {e}")
+
+    def __repr__(self):
+        return f"SharedState({self.room!r}, version={self.version})"
+
+
+def new_state(grow_stage=None, room=DEFAULT_ROOM, path=STATE_DB):
+    """
+    The shared state of `room`, created with the defaults where it has none yet.
+    A given `grow_stage` replaces the stored one.
+    """
+    with _lock:
+        instance = _instances.get((path, room))
+        if instance is None:
+            instance = SharedState(room, default_state(grow_stage or "flowering"), path=path)
+        if grow_stage is not None:
+            instance._pending = (instance._pending or ({}, {}))[0], {"grow_stage": grow_stage}
+    return instance
+
+
+state = new_state()
@@ -1,7 +1,48 @@
+import asyncio
+import weakref
 from tapo import ApiClient
 from config.settings import TAPO_USERNAME, TAPO_PASSWORD
 
+# Device handles and command locks per event loop, shared by every room of the process
+_pools = weakref.WeakKeyDictionary()
+
 async def get_tapo_client():
     """Initialize and return a Tapo API Client instance."""
     
     return ApiClient(TAPO_USERNAME, TAPO_PASSWORD)
+
+
+def _pool():
+    loop = asyncio.get_running_loop()
+    if loop not in _pools:
+        _pools[loop] = {"client": None, "devices": {}, "locks": {}}
+    return _pools[loop]
+
+
+async def get_device(device_type, device_ip):
+    """
+    Logged-in handle of a device from the shared pool.
+
+    Each device is logged into once per event loop and reused, so rooms sharing a
+    hub or polling every tick do not pay a handshake per call.
+    """
+    pool = _pool()
+    key = (device_type, device_ip)
+    if key not in pool["devices"]:
+        if pool["client"] is None:
+            pool["client"] = await get_tapo_client()
+        pool["devices"][key] = await getattr(pool["client"], device_type)(device_ip)
+    return pool["devices"][key]
+
+
+def drop_device(device_type, device_ip):
+    """Forget a handle after a failed call, so the next call logs in again."""
+    _pool()["devices"].pop((device_type, device_ip), None)
+
+
+def device_lock(device_ip):
+    """Lock that serializes commands to one device across rooms."""
+    locks = _pool()["locks"]
+    if device_ip not in locks:
+        locks[device_ip] = asyncio.Lock()
+    return locks[device_ip]
@@ -8,101 +8,97 @@ from tapo.responses import T31XResult
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from api.state import state 
-from config.settings import KPA_TOLERANCE, DEVICE_MAP, MAX_HUMIDITY_LEVELS, AIR_EXCHANGE_SETTINGS, HUB_IP, LEAF_TEMP_OFFSET
+from api.rooms import get_room
+from config.settings import KPA_TOLERANCE, MAX_HUMIDITY_LEVELS, LEAF_TEMP_OFFSET, SENSOR_FALLBACK
 from utils.calculate import calculate_required_humidity
 from api.actions import toggle_dehumidifier, toggle_exhaust, toggle_humidifier
-from api.tapo_client import get_tapo_client
+from api.tapo_client import get_device, drop_device, device_lock
+from utils.metrics import SENSOR_SECONDS, SENSOR_ATTEMPTS
 
-async def get_device_info(device_name):
-    """Fetch device info dynamically based on device name."""
-    if device_name not in DEVICE_MAP:
+async def _room_device(device_name, room=None):
+    """Pooled handle and IP of a device of `room` (default: the default room)."""
+    device_map = get_room(room).device_map
+    if device_name not in device_map:
         raise ValueError(f"❌ Invalid device name: {device_name}")
 
-    device_ip = DEVICE_MAP[device_name]["ip"]
-    device_type = DEVICE_MAP[device_name]["type"]
-
-    client = await get_tapo_client()
-    device = await getattr(client, device_type)(device_ip)
+    device_ip = device_map[device_name]["ip"]
+    device_type = device_map[device_name]["type"]
+    return await get_device(device_type, device_ip), device_ip
 
-    return await device.get_device_info()
+async def get_device_info(device_name, room=None):
+    """Fetch device info dynamically based on device name."""
+    device, device_ip = await _room_device(device_name, room)
+    async with device_lock(device_ip):
+        return await device.get_device_info()
 
-async def get_device_info_json(device_name):
+async def get_device_info_json(device_name, room=None):
     """Fetch device info in JSON format."""
-    if device_name not in DEVICE_MAP:
-        raise ValueError(f"❌ Invalid device name: {device_name}")
-
-    device_ip = DEVICE_MAP[device_name]["ip"]
-    device_type = DEVICE_MAP[device_name]["type"]
-
-    client = await get_tapo_client()
-    device = await getattr(client, device_type)(device_ip)
+    device, device_ip = await _room_device(device_name, room)
+    async with device_lock(device_ip):
+        return await device.get_device_info_json()
 
-    return await device.get_device_info_json()
-
-async def air_exchange_cycle(last_air_exchange, target_vpd_min, target_vpd_max):
+async def read_device_states(room=None):
     """
-    Adjusts air exchange duration & interval dynamically based on selected VPD stage.
-    Ensures the exhaust fan runs periodically for fresh air supply.
+    Replace the stored ON/OFF state of the room's exhaust, humidifier and dehumidifier
+    with what the plugs report. The state database outlives the controller, so a stored
+    state may be stale; a plug that cannot be read is taken as OFF. Overrides and the
+    grow stage are kept.
     """
-    
-    # Determine which VPD mode is active
-    if target_vpd_max <= 0.8:
-        stage = "propagation"
-    elif target_vpd_max <= 1.2:
-        stage = "vegetative"
-    else:
-        stage = "flowering"
-
-    settings = AIR_EXCHANGE_SETTINGS[stage]
-    AIR_EXCHANGE_INTERVAL = settings["interval"]
-    AIR_EXCHANGE_DURATION = settings["duration"]
-
-    current_time = time.time()
-
-    # Check if the last air exchange exceeded the set interval
-    if current_time - last_air_exchange >= AIR_EXCHANGE_INTERVAL:
-        print(f"\n🔄 **Air Exchange Cycle: {stage.capitalize()} mode - Venting Air for {AIR_EXCHANGE_DURATION // 60} minutes...**")
-
-        if not state["exhaust"]:  # Only turn ON if it's OFF
-            await toggle_exhaust(True)
-            state["everything_ok"] = False
-
-        await asyncio.sleep(AIR_EXCHANGE_DURATION)  # Keep exhaust ON for the duration
-
-        print("✅ **Air Exchange Complete: Restoring previous state.**")
-        await toggle_exhaust(False)  # Turn OFF exhaust after the cycle
-        state["everything_ok"] = True
-
-        return time.time()  # Update last air exchange timestamp
-
-    return last_air_exchange  # No change if air exchange was not needed
+    room = get_room(room)
+    devices = {}
+    for device_name in ("exhaust", "humidifier", "dehumidifier"):
+        devices[device_name] = False
+        if device_name not in room.device_map:
+            continue
+        try:
+            devices[device_name] = bool((await get_device_info(device_name, room)).device_on)
+        except Exception as e:
+            config = room.device_map[device_name]
+            drop_device(config["type"], config["ip"])
+            print(f"⚠️ Could not read the {device_name} state, assuming OFF: {e}")
+    room.state.update(devices)
+    return devices
 
-async def get_sensor_data(retries=3, delay=2):
-    """Fetch temperature & humidity from the Tapo sensor with retries."""
-    client = await get_tapo_client()
+async def get_sensor_data(retries=3, delay=2, room=None):
+    """
+    Fetch temperature & humidity from the Tapo sensor with retries.
+    A room's `sensor_hub` may name its sensor with `sensor_id` when several rooms share a hub.
+    """
+    room = get_room(room)
+    hub_config = room.device_map["sensor_hub"]
+    sensor_id = hub_config.get("sensor_id")
+    start = time.perf_counter()
 
     for attempt in range(retries):
         try:
-            hub = await client.h100(HUB_IP)  # Ensure SENSOR_IP is correctly set in .env
-            child_device_list = await hub.get_child_device_list()
+            async with device_lock(hub_config["ip"]):
+                hub = await get_device(hub_config["type"], hub_config["ip"])
+                child_device_list = await hub.get_child_device_list()
 
             for child in child_device_list:
-                if isinstance(child, T31XResult):
+                if isinstance(child, T31XResult) and sensor_id in (None, child.device_id):
                     air_temp = round(child.current_temperature or 0, 1)
                     leaf_temp = round(max(air_temp - LEAF_TEMP_OFFSET, 0), 1)  # Estimate leaf temperature
                     humidity = round(child.current_humidity or 0, 1)
+                    SENSOR_ATTEMPTS.inc(room=room.name, outcome="ok")
+                    SENSOR_SECONDS.observe(time.perf_counter() - start, room=room.name, outcome="ok")
                     return air_temp, leaf_temp, humidity  # ✅ Successfully retrieved values
 
             print("⚠️ No valid sensor data found! Using default values (20°C, 18.8°C, 50%).")
-            return 20.0, 18.8, 50.0  # Return safe default values
+            SENSOR_ATTEMPTS.inc(room=room.name, outcome="no_data")
+            SENSOR_SECONDS.observe(time.perf_counter() - start, room=room.name, outcome="no_data")
+            return SENSOR_FALLBACK  # Return safe default values
 
         except Exception as e:
+            SENSOR_ATTEMPTS.inc(room=room.name, outcome="error")
+            drop_device(hub_config["type"], hub_config["ip"])
             print(f"⚠️ Error fetching sensor data (attempt {attempt+1}/{retries}): {e}")
 
         await asyncio.sleep(delay)  # Wait before retrying
 
     print("❌ Failed to fetch sensor data after multiple attempts. Using default values.")
-    return 20.0, 18.8, 50.0  # Return safe defaults after repeated failures
+    SENSOR_SECONDS.observe(time.perf_counter() - start, room=room.name, outcome="failed")
+    return SENSOR_FALLBACK  # Return safe defaults after repeated failures
 
 async def adjust_conditions(target_vpd_min, target_vpd_max, vpd_leaf, vpd_air, humidity, tolerance=KPA_TOLERANCE):
     """Gradually adjust humidifier, dehumidifier, and exhaust for smooth transitions, while enforcing max humidity limits."""
@@ -0,0 +1,233 @@
+import os
+import sys
+import tempfile
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.harness import Benchmark
+from config.settings import ACTION_MAP, NEIGHBOUR_TOLERANCE
+
+Q_TABLE_SIZES = [1_000, 10_000, 100_000]
+BATCH_SIZE = 100_000
+LOG_SIZES = [1_000, 10_000]
+SEED = 42
+
+
+def synthetic_readings(n, seed=SEED):
+    """Plausible grow-room readings: (air_temp, leaf_temp, humidity) arrays."""
+    rng = np.random.default_rng(seed)
+    air_temp = np.round(rng.uniform(18.0, 30.0, n), 1)
+    leaf_temp = np.round(air_temp - 1.3, 1)
+    humidity = np.round(rng.uniform(35.0, 75.0, n), 1)
+    return air_temp, leaf_temp, humidity
+
+
+def synthetic_q_table(size, seed=SEED):
+    """A dict Q-table with `size` distinct encoded states and random Q-values."""
+    from utils.calculate import calculate_vpd_array
+    from utils.state_encoder import encode_states
+
+    rng = np.random.default_rng(seed)
+    states = set()
+    while len(states) < size:
+        # Wider than `synthetic_readings` (independent leaf offset), so 100k distinct states exist
+        air_temp = np.round(rng.uniform(10.0, 40.0, size), 1)
+        leaf_temp = np.round(air_temp - rng.uniform(0.0, 4.0, size), 1)
+        humidity = rng.uniform(0.0, 100.0, size)
+        vpd_air, vpd_leaf = calculate_vpd_array(air_temp, leaf_temp, humidity, decimals=2)
+        encoded = encode_states(np.column_stack([humidity, leaf_temp, air_temp, vpd_air, vpd_leaf]))
+        states.update(map(tuple, encoded.tolist()))
+    return {state: rng.normal(size=len(ACTION_MAP)) for state in list(states)[:size]}
+
+
+def lookup_states(Q_table, seed=SEED):
+    """One state per `choose_best_action` path: exact hit, KDTree neighbour and rule fallback."""
+    rng = np.random.default_rng(seed)
+    keys = list(Q_table)
+    exact = keys[int(rng.integers(len(keys)))]
+
+    # Nudge a known state off the grid in leaf temperature until it is no longer a key
+    near = None
+    for key in keys:
+        candidate = (key[0], round(key[1] + 0.1, 6), *key[2:])
+        if candidate not in Q_table:
+            near = candidate
+            break
+
+    far = (100.0, 49.9, 49.9, 4.9, -0.9)
+    return exact, near, far
+
+
+def _synthetic_models():
+    """Small forests trained on synthetic data, compiled the way training exports them."""
+    from sklearn.ensemble import RandomForestClassifier, IsolationForest
+    from model.compiled_forest import CompiledForest, CompiledIsolationForest
+    from utils.calculate import calculate_vpd_array
+
+    air_temp, leaf_temp, humidity = synthetic_readings(2_000)
+    vpd_air, vpd_leaf = calculate_vpd_array(air_temp, leaf_temp, humidity, decimals=2)
+    X = np.column_stack([air_temp, leaf_temp, humidity, vpd_air, vpd_leaf])
+    rng = np.random.default_rng(SEED)
+    devices = rng.integers(0, 2, size=(len(X), 3))
+
+    models = {}
+    for i, name in enumerate(["exhaust_model", "humidifier_model", "dehumidifier_model"]):
+        forest = RandomForestClassifier(n_estimators=100, random_state=SEED).fit(X, devices[:, i])
+        models[name] = CompiledForest.from_estimator(forest)
+    isolation = IsolationForest(n_estimators=100, contamination=0.05, random_state=SEED).fit(np.column_stack([X, devices]))
+    models["anomaly_detector"] = CompiledIsolationForest.from_estimator(isolation)
+    return models
+
+
+def vpd_cases():
+    from utils.calculate import (
+        calculate_vpd, calculate_required_humidity, calculate_vpd_array, calculate_required_humidity_array, SVPTable
+    )
+
+    air_temp, leaf_temp, humidity = synthetic_readings(BATCH_SIZE)
+    svp_table = SVPTable()
+    return [
+        Benchmark("vpd.calculate_vpd.scalar", lambda: calculate_vpd(24.3, 23.0, 55.2)),
+        Benchmark(f"vpd.calculate_vpd.batch_{BATCH_SIZE}", lambda: calculate_vpd_array(air_temp, leaf_temp, humidity)),
+        Benchmark(f"vpd.calculate_vpd.batch_{BATCH_SIZE}_svp_table",
+                  lambda: calculate_vpd_array(air_temp, leaf_temp, humidity, svp_table=svp_table)),
+        Benchmark("vpd.calculate_required_humidity.scalar", lambda: calculate_required_humidity(1.4, 24.3, 23.0)),
+        Benchmark(f"vpd.calculate_required_humidity.batch_{BATCH_SIZE}",
+                  lambda: calculate_required_humidity_array(1.4, air_temp, leaf_temp)),
+    ]
+
+
+def state_cases():
+    from main import discretize_state
+
+    return [Benchmark("state.discretize_state", lambda: discretize_state(55.2, 23.0, 24.3, 1.36, 1.17))]
+
+
+def policy_cases(sizes=Q_TABLE_SIZES):
+    from model.policy import choose_best_action, build_state_lookup
+
+    cases = []
+    for size in sizes:
+        label = f"q{size // 1000}k"
+        Q_table = synthetic_q_table(size)
+        state_tree, known_states = build_state_lookup(Q_table)
+        exact, near, far = lookup_states(Q_table)
+
+        for path, state in [("exact", exact), ("kdtree", near), ("fallback", far)]:
+            cases.append(Benchmark(
+                f"policy.choose_best_action.{path}.{label}",
+                lambda state=state, Q_table=Q_table, state_tree=state_tree, known_states=known_states: choose_best_action(
+                    state, Q_table, state_tree, known_states, "flowering", NEIGHBOUR_TOLERANCE
+                ),
+            ))
+        cases.append(Benchmark(f"policy.build_state_lookup.{label}", lambda Q_table=Q_table: build_state_lookup(Q_table)))
+    return cases
+
+
+def planner_cases(horizons=(2, 3, 4, 5)):
+    from model.planner import plan_devices, _level
+    from model.room_model import RoomModel
+
+    room_model = RoomModel.from_dynamics()
+    devices = {"exhaust": True, "humidifier": False, "dehumidifier": False}
+    cases = []
+    for horizon in horizons:
+        # The per-step device combinations are built once and cached, as in the running controller
+        _level(horizon - 1)
+        cases.append(Benchmark(
+            f"planner.plan_devices.h{horizon}",
+            lambda horizon=horizon: plan_devices(24.3, 23.0, 55.2, room_model, "flowering", devices, horizon=horizon),
+        ))
+    return cases
+
+
+def proxy_cases():
+    from model.policy import build_state_lookup
+    from api.models import artifacts
+    from api.proxy import app, ensure_feature_format
+
+    for name, model in _synthetic_models().items():
+        artifacts.override(name, model, "synthetic")
+    Q_table = synthetic_q_table(10_000)
+    artifacts.override("q_table", Q_table, "synthetic")
+    artifacts.override("neighbour_index", build_state_lookup(Q_table), "synthetic")
+
+    client = app.test_client()
+    reading = {"temperature": 24.3, "leaf_temperature": 23.0, "humidity": 55.2, "vpd_air": 1.36, "vpd_leaf": 1.17}
+    device_reading = {**reading, "exhaust": True, "humidifier": False, "dehumidifier": False}
+
+    def post(path, payload):
+        def call():
+            response = client.post(path, json=payload)
+            assert response.status_code == 200, response.get_data(as_text=True)
+        return call
+
+    return [
+        Benchmark("proxy.ensure_feature_format", lambda: ensure_feature_format(dict(reading))),
+        Benchmark("proxy.predict", post("/predict", reading)),
+        Benchmark("proxy.predict_action", post("/predict_action", {**reading, "grow_stage": "flowering"})),
+        Benchmark("proxy.detect_anomaly", post("/detect_anomaly", device_reading)),
+    ]
+
+
+def log_cases(sizes=LOG_SIZES):
+    import json
+    import utils.logs as logs
+
+    directory = tempfile.mkdtemp(prefix="vpd-bench-")
+    row = (1.7e9, 24.3, 23.0, 55.2, 1.36, 1.17, True, False, False)
+    # The timed calls append to the log, each repeat starts again from the file setup wrote
+    written = {}
+
+    def restore(path):
+        def reset():
+            with open(path, "wb") as file:
+                file.write(written[path])
+        return reset
+
+    def csv_setup(size, path):
+        def setup():
+            for _ in range(size):
+                logs.log_to_csv(*row, path=path)
+            with open(path, "rb") as file:
+                written[path] = file.read()
+            return lambda: logs.log_to_csv(*row, path=path)
+        return setup
+
+    def json_setup(size, path):
+        def setup():
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump([dict(zip(["Timestamp", "Air Temperature (°C)", "Leaf Temperature (°C)", "Humidity (%)",
+                                     "Air VPD (kPa)", "Leaf VPD (kPa)", "Exhaust", "Humidifier", "Dehumidifier"], row))] * size,
+                          file, indent=4, ensure_ascii=False)
+            with open(path, "rb") as file:
+                written[path] = file.read()
+            return lambda: logs.log_to_json(*row, path=path)
+        return setup
+
+    cases = []
+    for sink, setup in [("csv", csv_setup), ("json", json_setup)]:
+        for size in sizes:
+            path = os.path.join(directory, f"log_{size}.{sink}")
+            cases.append(Benchmark(f"logs.log_to_{sink}.rows_{size}", setup=setup(size, path), reset=restore(path)))
+    return cases
+
+
+def import_cases(modules=None):
+    from benchmarks.imports import cold_import, SERVICE_MODULES
+
+    # A fresh interpreter per call, so this is the cold start a restarted service pays
+    return [Benchmark(f"imports.cold_start.{module}", lambda module=module: cold_import(module))
+            for module in modules or SERVICE_MODULES]
+
+
+# Group name -> factory building that group's cases
+GROUPS = {
+    "vpd": vpd_cases,
+    "state": state_cases,
+    "policy": policy_cases,
+    "planner": planner_cases,
+    "proxy": proxy_cases,
+    "logs": log_cases,
+    "imports": import_cases,
+}
@@ -0,0 +1,145 @@
+import io
+import gc
+import os
+import json
+import time
+import platform
+import statistics
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+
+class Benchmark:
+    """
+    One timed case: `func()` is called `number` times per repeat.
+
+    `setup()` runs once before timing and may return the function to time, so a
+    case can build its inputs (a Q-table, a log file) outside the measurement.
+    `reset()`, if given, runs untimed before every repeat, so a case whose calls
+    change its inputs (a growing log) starts each repeat from the same state.
+    """
+
+    def __init__(self, name, func=None, setup=None, group=None, reset=None):
+        self.name = name
+        self.func = func
+        self.setup = setup
+        self.reset = reset
+        self.group = group or name.split(".")[0]
+
+
+def _autorange(func, min_time):
+    """Smallest power-of-ten loop count whose total time reaches `min_time`."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_time or number >= 10 ** 7:
+            return number
+        number *= 10
+
+
+def run_benchmark(benchmark, repeat=5, min_time=0.05):
+    """Time one case. Returns per-call seconds (min / median / max of the repeats)."""
+    # Handlers print on every call, keep that out of the report (the cost is still measured)
+    with redirect_stdout(io.StringIO()):
+        func = benchmark.setup() if benchmark.setup is not None else benchmark.func
+        number = _autorange(func, min_time)
+        times = []
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for _ in range(repeat):
+                if benchmark.reset is not None:
+                    benchmark.reset()
+                start = time.perf_counter()
+                for _ in range(number):
+                    func()
+                times.append((time.perf_counter() - start) / number)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    return {
+        "median": statistics.median(times),
+        "min": min(times),
+        "max": max(times),
+        "number": number,
+        "repeat": repeat,
+    }
+
+
+def environment():
+    """Where a result set was measured, so baselines from different machines are not mixed up silently."""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def run_all(benchmarks, repeat=5, min_time=0.05, verbose=True):
+    results = {}
+    for benchmark in benchmarks:
+        results[benchmark.name] = run_benchmark(benchmark, repeat, min_time)
+        if verbose:
+            print(f"   {benchmark.name:<55} {format_seconds(results[benchmark.name]['median']):>10}")
+    return {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "results": results,
+    }
+
+
+def format_seconds(seconds):
+    for unit, scale in [("s", 1), ("ms", 1e-3), ("µs", 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def save_results(results, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=4)
+    os.replace(tmp_path, path)
+
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def compare(baseline, current, threshold=0.25):
+    """
+    Compare median per-call times against a baseline.
+
+    A case is a regression when it got slower by more than `threshold` (0.25 = 25 %),
+    an improvement when it got faster by as much. Returns one row per case.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            rows.append({"name": name, "status": "new", "current": result["median"]})
+            continue
+        ratio = result["median"] / base["median"] if base["median"] else float("inf")
+        status = "regression" if ratio > 1 + threshold else "improved" if ratio < 1 - threshold else "ok"
+        rows.append({"name": name, "status": status, "baseline": base["median"], "current": result["median"], "ratio": ratio})
+    for name in baseline["results"]:
+        if name not in current["results"]:
+            rows.append({"name": name, "status": "missing", "baseline": baseline["results"][name]["median"]})
+    return rows
+
+
+def print_comparison(rows):
+    icons = {"regression": "🔴", "improved": "🟢", "ok": "  ", "new": "🆕", "missing": "⚪"}
+    for row in rows:
+        if "ratio" in row:
+            detail = f"{format_seconds(row['baseline']):>10} -> {format_seconds(row['current']):>10}  x{row['ratio']:.2f}"
+        else:
+            detail = format_seconds(row.get("current", row.get("baseline")))
+        print(f"{icons[row['status']]} {row['name']:<55} {detail}")
@@ -0,0 +1,82 @@
+import os
+import sys
+import argparse
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Entry modules of the controller, the Flask proxy and the FastAPI server
+SERVICE_MODULES = ["main", "api.proxy", "api.server"]
+
+
+def cold_import(module, python=sys.executable, importtime=False):
+    """Import `module` in a fresh interpreter; returns the completed process (stderr holds the -X importtime log)."""
+    command = [python, *(["-X", "importtime"] if importtime else []), "-c", f"import {module}"]
+    process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+    if process.returncode != 0:
+        raise RuntimeError(f"❌ Importing {module} failed:\n{process.stderr.strip().splitlines()[-1]}")
+    return process
+
+
+def parse_importtime(log):
+    """
+    Parse `-X importtime` output into (module, self µs, cumulative µs, depth) rows,
+    in the interpreter's order (a package is listed after everything it imported).
+    """
+    rows = []
+    for line in log.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def import_report(module, top=15):
+    """
+    Where the import time of `module` goes: its total and the modules it imports
+    directly, plus the `top` modules by self time anywhere in the import graph.
+    Times are in milliseconds.
+    """
+    rows = parse_importtime(cold_import(module, importtime=True).stderr)
+    target = next((row for row in rows if row[0] == module), None)
+    if target is None:
+        raise RuntimeError(f"❌ {module} is not in the import log (already imported by site?)")
+
+    position = rows.index(target)
+    # Direct imports sit one level deeper and are logged between the previous top-level entry and the module
+    start = max((i for i, row in enumerate(rows[:position]) if row[3] <= target[3]), default=-1) + 1
+    children = [row for row in rows[start:position] if row[3] == target[3] + 1]
+
+    return {
+        "module": module,
+        "total_ms": round(target[2] / 1000, 1),
+        "interpreter_ms": round(sum(row[2] for row in rows if row[3] == 0 and row is not target) / 1000, 1),
+        "direct": [{"module": name, "ms": round(cumulative / 1000, 1)}
+                   for name, _, cumulative, _ in sorted(children, key=lambda row: -row[2])],
+        "top_self": [{"module": name, "ms": round(self_us / 1000, 1)}
+                     for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:top]],
+    }
+
+
+def print_import_report(report, limit=15, min_ms=1.0):
+    print(f"📦 import {report['module']}: {report['total_ms']} ms (+{report['interpreter_ms']} ms interpreter start-up)")
+    print("   Direct imports (cumulative):")
+    for entry in [entry for entry in report["direct"] if entry["ms"] >= min_ms][:limit]:
+        print(f"     {entry['ms']:>8.1f} ms  {entry['module']}")
+    print("   Slowest modules (self):")
+    for entry in report["top_self"][:limit]:
+        print(f"     {entry['ms']:>8.1f} ms  {entry['module']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-module import time of the services, from python -X importtime.")
+    parser.add_argument("modules", nargs="*", default=SERVICE_MODULES)
+    parser.add_argument("--top", type=int, default=15, help="Modules listed per section.")
+    parser.add_argument("--min-ms", type=float, default=1.0, help="Hide direct imports faster than this.")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        print_import_report(import_report(module, args.top), args.top, args.min_ms)
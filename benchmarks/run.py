@@ -0,0 +1,60 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from benchmarks.harness import run_all, save_results, load_results, compare, print_comparison
+from benchmarks.cases import GROUPS
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Microbenchmarks of the controller's hot paths.")
+    parser.add_argument("--group", nargs="+", choices=list(GROUPS), help="Only run these groups.")
+    parser.add_argument("--filter", help="Only run cases whose name contains this text.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05, help="Seconds per repeat, the loop count is scaled up to reach it.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="Write the results as the new baseline.")
+    parser.add_argument("--output", help="Also write the results to this file.")
+    parser.add_argument("--compare", action="store_true", help="Compare with the baseline, exit 1 on a regression.")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Slowdown (0.25 = 25 %%) that counts as a regression.")
+    args = parser.parse_args()
+
+    if args.compare and not os.path.exists(args.baseline):
+        print(f"❌ Error: baseline '{args.baseline}' not found, create it with --save first.")
+        sys.exit(2)
+
+    benchmarks = []
+    for group in args.group or GROUPS:
+        print(f"🔧 Preparing {group} cases...")
+        benchmarks.extend(GROUPS[group]())
+    if args.filter:
+        benchmarks = [benchmark for benchmark in benchmarks if args.filter in benchmark.name]
+
+    print(f"⏱️ Running {len(benchmarks)} benchmarks (median per call):")
+    results = run_all(benchmarks, args.repeat, args.min_time)
+
+    if args.output:
+        save_results(results, args.output)
+    if args.save:
+        save_results(results, args.baseline)
+        print(f"✅ Baseline saved at {args.baseline}")
+
+    if args.compare:
+        baseline = load_results(args.baseline)
+        # Only cases that ran are compared, so a --group / --filter run does not report the rest as missing
+        names = {benchmark.name for benchmark in benchmarks}
+        baseline["results"] = {name: result for name, result in baseline["results"].items() if name in names}
+        if baseline.get("environment") != results["environment"]:
+            print("⚠️ Warning: the baseline was measured on a different machine or Python, expect noise.")
+
+        rows = compare(baseline, results, args.threshold)
+        print(f"📊 Comparison with {args.baseline} (threshold {args.threshold:.0%}):")
+        print_comparison(rows)
+        regressions = [row["name"] for row in rows if row["status"] == "regression"]
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ No regressions.")
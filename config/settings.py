@@ -17,11 +17,39 @@ BASE_URL = "http://localhost:5000" #os.getenv('BASE_URL')
 
 CONTROL_INTERVAL = 30
 
+# Adaptive control cadence: bounds of the tick interval (seconds), change per minute
+# that counts as fast, distance from a limit that counts as near, calm ticks before slowing down
+CADENCE_MIN_INTERVAL = 10
+CADENCE_MAX_INTERVAL = 120
+CADENCE_FAST_RATES = {"humidity": 1.0, "vpd_leaf": 0.05}
+CADENCE_LIMIT_MARGINS = {"humidity": 3.0, "vpd_leaf": 0.1}
+CADENCE_STABLE_TICKS = 3
+LIVE_FEED_INTERVALS = (2, 5, 20)  # (min, base, max) seconds between live dashboard updates
+
+# Prometheus metrics: histogram buckets (seconds) and the controller's /metrics port (0 disables it)
+METRIC_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9108))
+
+# On-demand profiling: admin endpoints need the X-Admin-Token header to match ADMIN_TOKEN
+# (unset disables them); the controller profiles on SIGUSR1 (CPU) and SIGUSR2 (memory)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "../profiles")
+PROFILE_MAX_DURATION = 300
+PROFILE_SIGNAL_DURATION = int(os.getenv("PROFILE_SIGNAL_DURATION", 30))
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_TOP = 20  # Functions / allocation sites listed in a profile summary
+
+# Controller -> proxy/API calls: seconds per call and kept-alive connections per host
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 5))
+HTTP_POOL_SIZE = 4
+
 KPA_TOLERANCE = float(os.getenv("KPA_TOLERANCE", 0.1))
 LEAF_TEMP_OFFSET = 1.3
 
 OVERRIDE_DURATION = 3000 
 
+AIR_EXCHANGE_ENABLED = os.getenv("AIR_EXCHANGE_ENABLED", "true").lower() == "true"
+
 AIR_EXCHANGE_SETTINGS = {
     "propagation": {"interval": 45 * 60, "duration": 2 * 60},  # Every 45 min, 2 min duration
     "vegetative": {"interval": 30 * 60, "duration": 4 * 60},  # Every 30 min, 4 min duration
@@ -46,6 +74,14 @@ DEVICE_MAP = {
     "dehumidifier": {"ip": DEHUMIDIFIER_IP, "type": "p115"},
 }
 
+# Multi-room controller: a JSON list of rooms, each with its own devices, grow stage,
+# optional VPD target and control interval, e.g.
+# [{"name": "tent_a", "grow_stage": "vegetative", "vpd_target": [0.8, 1.2], "control_interval": 30,
+#   "devices": {"sensor_hub": {"ip": "...", "type": "h100", "sensor_id": "..."}, "exhaust": {"ip": "...", "type": "p100"}, ...}}]
+# Without the file the controller runs one room on DEVICE_MAP.
+ROOMS_FILE = os.getenv("ROOMS_FILE", os.path.join(os.path.dirname(__file__), "rooms.json"))
+DEFAULT_ROOM = "default"
+
 ACTION_MAP = {
     0: {"exhaust": True},  1: {"exhaust": False},
     2: {"humidifier": True}, 3: {"humidifier": False},
@@ -63,12 +99,95 @@ COLUMN_MAPPING = {
     "Dehumidifier": "dehumidifier"
 }
 
-MODEL_DIR = os.path.join(os.path.dirname(__file__), "../model")
+MODEL_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../model"))
 Q_TABLE_PATH = os.path.join(MODEL_DIR, "q_learning.pkl")
+Q_GRID_PATH = os.path.join(MODEL_DIR, "q_grid.npy")
+Q_INDEX_PATH = os.path.join(MODEL_DIR, "q_learning_index.pkl")
+Q_GRID_INDEX_PATH = os.path.join(MODEL_DIR, "q_grid_index.pkl")
 EXHAUST_MODEL_PATH = os.path.join(MODEL_DIR, "exhaust_model.pkl")
 HUMIDIFIER_MODEL_PATH = os.path.join(MODEL_DIR, "humidifier_model.pkl")
 DEHUMIDIFIER_MODEL_PATH = os.path.join(MODEL_DIR, "dehumidifier_model.pkl")
 ANOMALY_MODEL_PATH = os.path.join(MODEL_DIR, "anomaly_detector.pkl")
+EXHAUST_FOREST_PATH = os.path.join(MODEL_DIR, "exhaust_model.forest.npy")
+HUMIDIFIER_FOREST_PATH = os.path.join(MODEL_DIR, "humidifier_model.forest.npy")
+DEHUMIDIFIER_FOREST_PATH = os.path.join(MODEL_DIR, "dehumidifier_model.forest.npy")
+ANOMALY_FOREST_PATH = os.path.join(MODEL_DIR, "anomaly_detector.forest.npy")
+ROOM_MODEL_PATH = os.path.join(MODEL_DIR, "room_model.json")
+MANIFEST_PATH = os.path.join(MODEL_DIR, "manifest.json")
+# Fault in every memory-mapped artifact page at startup instead of on first use
+ARTIFACT_WARMUP = os.getenv("ARTIFACT_WARMUP", "false").lower() == "true"
+
+# Discretization grid of the array-backed Q-table: (low, high, step) per state dimension
+Q_GRID = {
+    "humidity": (0.0, 100.0, 5.0),
+    "leaf_temperature": (0.0, 50.0, 0.1),
+    "temperature": (0.0, 50.0, 0.1),
+    "vpd_air": (0.0, 5.0, 0.1),
+    "vpd_leaf": (-1.0, 4.0, 0.1),
+}
+# State encoding shared by training and inference: rounding step per dimension
+# (humidity, leaf_temp, air_temp, vpd_air, vpd_leaf) and the scale that makes one
+# unit of neighbour distance comparable across dimensions
+STATE_RESOLUTION = (5.0, 0.1, 0.1, 0.1, 0.1)
+STATE_SCALE = (5.0, 0.5, 0.5, 0.1, 0.1)
+NEIGHBOUR_TOLERANCE = float(os.getenv("NEIGHBOUR_TOLERANCE", 1.5))
+# Online Q-learning inside the running controller
+ONLINE_LEARNING = os.getenv("ONLINE_LEARNING", "false").lower() == "true"
+ONLINE_ALPHA = float(os.getenv("ONLINE_ALPHA", 0.05))
+ONLINE_GAMMA = float(os.getenv("ONLINE_GAMMA", 0.9))
+ONLINE_MAX_DELTA = 0.05  # Largest change applied to a Q-value in a single update
+Q_CHECKPOINT_INTERVAL = 10 * 60
 
+# Device policy of the controller: "q_table" looks up one single-device action per tick,
+# "planner" scores every exhaust/humidifier/dehumidifier combination over a short horizon.
+# Both are advisory on the live devices (LiveIO.apply switches nothing yet): the decision is
+# logged, traced and measured, and only replay.py switches its recorded devices
+CONTROL_POLICY = os.getenv("CONTROL_POLICY", "q_table")
+# Lookahead planner: steps simulated with the room model, seconds per step, and cost weights
+# (leaf VPD outside the band in kPa, humidity outside the stage limits and heat above
+# MAX_AIR_TEMP per step, each device switch, each device-step ON, humidifier and dehumidifier ON together)
+PLANNER_HORIZON = int(os.getenv("PLANNER_HORIZON", 4))
+PLANNER_STEP = 60
+PLANNER_WEIGHTS = {"vpd": 1.0, "humidity": 0.05, "heat": 0.1, "switch": 0.02, "runtime": 0.005, "conflict": 1.0}
+
+# Anomaly detection: "local" runs the in-process streaming engine, "proxy" posts every
+# reading to the proxy's /detect_anomaly
+ANOMALY_BACKEND = os.getenv("ANOMALY_BACKEND", "local")
+SENSOR_FALLBACK = (20.0, 18.8, 50.0)  # (air_temp, leaf_temp, humidity) returned when the sensor fails
+ANOMALY_WARMUP = 20  # Readings before z-scores are trusted
+ANOMALY_EWMA_ALPHA = 0.05
+ANOMALY_Z_THRESHOLD = 6.0
+ANOMALY_STUCK_TICKS = 40  # Identical raw readings in a row before the sensor counts as stuck
+# IsolationForest decision_function cut-off: below 0 is the fitted model's own boundary (predict == -1).
+# decision_function = score_samples - offset_ never drops below -1 - offset_, so a negative cut-off may never fire
+ANOMALY_SCORE_THRESHOLD = 0.0
+# Largest plausible change per minute, per feature
+ANOMALY_RATE_LIMITS = {"temperature": 3.0, "leaf_temperature": 3.0, "humidity": 20.0}
+# Smallest deviation scale per feature, keeps z-scores finite while a reading is flat
+ANOMALY_MIN_SCALE = {"temperature": 0.2, "leaf_temperature": 0.2, "humidity": 1.0, "vpd_air": 0.03, "vpd_leaf": 0.03}
 
 CSV_FILE = os.path.join(os.path.dirname(__file__), "../vpd_log.csv")
+
+HISTORY_DB = os.path.join(os.path.dirname(__file__), "../vpd_history.db")
+
+# Rollup tiers (bucket width in seconds) kept up to date as readings arrive
+ROLLUP_TIERS = {"1m": 60, "15m": 15 * 60, "1h": 60 * 60}
+
+# Retention in seconds per tier, None keeps the tier forever
+HISTORY_RETENTION = {
+    "raw": int(os.getenv("RAW_RETENTION_DAYS", 7)) * 24 * 3600,
+    "1m": int(os.getenv("ROLLUP_1M_RETENTION_DAYS", 30)) * 24 * 3600,
+    "15m": int(os.getenv("ROLLUP_15M_RETENTION_DAYS", 365)) * 24 * 3600,
+    "1h": None,
+}
+HISTORY_PRUNE_INTERVAL = 60 * 60
+
+# Energy telemetry of the P110/P115 plugs: seconds between polls (0 disables the collector),
+# seconds before a plug read is abandoned, and how long samples are kept
+ENERGY_DEVICE_TYPES = ("p110", "p115")
+ENERGY_POLL_INTERVAL = int(os.getenv("ENERGY_POLL_INTERVAL", 60))
+ENERGY_POLL_TIMEOUT = 10
+ENERGY_RETENTION = int(os.getenv("ENERGY_RETENTION_DAYS", 30)) * 24 * 3600
+
+# Controller state shared by the controller, proxy and API processes (one row per room and key)
+STATE_DB = os.getenv("STATE_DB", os.path.join(os.path.dirname(__file__), "../vpd_state.db"))
@@ -1,55 +1,81 @@
-import joblib
 import os
 import sys
 import time
-import requests
+import signal
 import asyncio
+import numpy as np
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 from utils.calculate import calculate_vpd
 from utils.logs import log_to_csv
+from utils.history import record_reading
 from api.tapo_controller import (
     toggle_exhaust,
     toggle_dehumidifier,
     toggle_humidifier,
     get_sensor_data,
-    air_exchange_cycle
+    read_device_states
 )
-from model.train_rl_agent import choose_best_action, build_state_lookup
+from model.policy import choose_best_action, transition_reward, infer_logged_actions
+from model.planner import plan_devices
+from model.online_learning import OnlineQLearner
+from model.anomaly_engine import StreamingAnomalyDetector
+from utils.state_encoder import encode_state
+from utils.cadence import AdaptiveCadence
+from model.q_grid import QGrid
 from api.state import state
-from config.settings import KPA_TOLERANCE, CONTROL_INTERVAL, ACTION_MAP, MAX_HUMIDITY_LEVELS, BASE_URL, MAX_AIR_TEMP, PROXY_URL, Q_TABLE_PATH
+from api.rooms import load_rooms, get_room, DEFAULT_ROOM
+from api.models import artifacts
+from api.scheduler import DeviceScheduler
+from api.energy import EnergyCollector
+from api.http_client import get_http_client, RequestError
+from utils.profiling import ProfileSession
+from utils.metrics import TICK_SECONDS, TICK_INTERVAL, TICK_OVERRUNS, ANOMALY_SECONDS, ANOMALIES, PLAN_SECONDS, start_metrics_server
+from config.settings import NEIGHBOUR_TOLERANCE, ACTION_MAP, MAX_HUMIDITY_LEVELS, BASE_URL, MAX_AIR_TEMP, PROXY_URL, Q_TABLE_PATH, Q_GRID_PATH, ONLINE_LEARNING, VPD_MODES, ANOMALY_BACKEND, ARTIFACT_WARMUP, AIR_EXCHANGE_ENABLED, METRICS_PORT, PROFILE_SIGNAL_DURATION, CONTROL_POLICY, ENERGY_POLL_INTERVAL
 from api.actions import is_override_active
 
 
 def load_q_table():
-    if os.path.exists(Q_TABLE_PATH):
-        Q_table = joblib.load(Q_TABLE_PATH)
-        print("✅ Q-table loaded successfully.")
-        return Q_table
-    else:
-        print("❌ Error: Q-table file not found.")
+    try:
+        Q_table = artifacts.get("q_table")
+    except FileNotFoundError as e:
+        print(e)
         exit()
+    print(f"✅ Q-table loaded successfully ({len(Q_table)} states).")
+    return Q_table
+
 
+async def start_anomaly_detection(sensor_data, anomaly_detector=None, timestamp=None):
+    if anomaly_detector is not None:
+        with ANOMALY_SECONDS.time(backend="local"):
+            is_anomaly, reasons = anomaly_detector.check(sensor_data, timestamp)
+        if is_anomaly:
+            print(f"🚨 Anomaly detected ({', '.join(reasons)})! Skipping adjustments.")
+        return is_anomaly
 
-async def start_anomaly_detection(sensor_data):
     try:
-        response = requests.post(f"{PROXY_URL}/detect_anomaly", json=sensor_data)
-        response.raise_for_status()
-        anomaly_response = response.json()
+        with ANOMALY_SECONDS.time(backend="proxy"):
+            response = await get_http_client().post(f"{PROXY_URL}/detect_anomaly", json=sensor_data)
+            response.raise_for_status()
+            anomaly_response = response.json()
 
         if anomaly_response.get('anomaly_detected', False):
             print("🚨 Anomaly detected! Skipping adjustments.")
             return True
 
-    except requests.RequestException as e:
+    except RequestError as e:
         print(f"❌ Error during anomaly detection request: {e}")
         return True
 
     return False
 
 
-async def sync_device_states(action_dict, humidity, max_humidity, air_temp):
+async def sync_device_states(action_dict, humidity, max_humidity, air_temp, room=None, toggle=None):
+    """Switch the devices towards `action_dict`. `toggle(device, state, room)` replaces the Tapo calls (replay records them)."""
+    room = get_room(room)
+    room_state = room.state
+
     if air_temp > MAX_AIR_TEMP:
         action_dict["exhaust"] = True
         print("🔥 Air temperature above 26°C: Ensuring exhaust is ON.")
@@ -59,94 +85,265 @@ async def sync_device_states(action_dict, humidity, max_humidity, air_temp):
             print(f"⚠️ Unknown device '{device}', skipping...")
             continue
 
-        if is_override_active(device):
+        if is_override_active(device, room):
             print(f"🚫 Skipping {device} due to override")
             continue
 
-        if device == "humidifier" and (state.get("dehumidifier", False) or humidity >= max_humidity):
+        if device == "humidifier" and (room_state.get("dehumidifier", False) or humidity >= max_humidity):
             print("⚠️ Skipping humidifier ON due to active dehumidifier or humidity within optimal range.")
             continue
 
-        if device == "dehumidifier" and (state.get("humidifier", False) or humidity <= max_humidity - 5):
+        if device == "dehumidifier" and (room_state.get("humidifier", False) or humidity <= max_humidity - 5):
             print("⚠️ Skipping dehumidifier ON due to active humidifier or humidity within optimal range.")
             continue
 
         print(f"🔄 Toggling {device} {'ON' if target_state else 'OFF'}")
 
-        if device == "exhaust":
-            await toggle_exhaust(target_state)
+        if toggle is not None:
+            await toggle(device, target_state, room)
+        elif device == "exhaust":
+            await toggle_exhaust(target_state, room)
         elif device == "humidifier":
-            await toggle_humidifier(target_state)
+            await toggle_humidifier(target_state, room)
         elif device == "dehumidifier":
-            await toggle_dehumidifier(target_state)
+            await toggle_dehumidifier(target_state, room)
 
-        state[device] = target_state
+        room_state[device] = target_state
 
 
 def discretize_state(humidity, leaf_temp, air_temp, vpd_air, vpd_leaf):
-    return (
-        round(humidity / 5) * 5,
-        round(leaf_temp, 1),
-        round(air_temp, 1),
-        round(vpd_air, 1),
-        round(vpd_leaf, 1)
-    )
-
-
-async def monitor_vpd(target_vpd_min, target_vpd_max, Q_table):
-    last_air_exchange = time.time()
-
-    print(f"✅ Monitoring VPD: {target_vpd_min}-{target_vpd_max} kPa")
-
-    state_tree, known_states = build_state_lookup(Q_table)
-
-    while True:
-        air_temp, leaf_temp, humidity = await get_sensor_data()
-        vpd_air, vpd_leaf = calculate_vpd(air_temp, leaf_temp, humidity)
-        sensor_data = {
-            "temperature": air_temp,
-            "leaf_temperature": leaf_temp,
-            "humidity": humidity,
-            "vpd_air": vpd_air,
-            "vpd_leaf": vpd_leaf,
-            "exhaust": state.get("exhaust", False),  
-            "humidifier": state.get("humidifier", False),
-            "dehumidifier": state.get("dehumidifier", False),
-        }
-
-        print(f"✅ Processed data for anomaly detection: {sensor_data}")
-
-        if await start_anomaly_detection(sensor_data):
-            await asyncio.sleep(5)
-            continue
+    return encode_state(humidity, leaf_temp, air_temp, vpd_air, vpd_leaf)
 
-        grow_stage = state.get("grow_stage", "flowering")
-        max_humidity = MAX_HUMIDITY_LEVELS.get(grow_stage, 50)
 
-        state_tuple = discretize_state(humidity, leaf_temp, air_temp, vpd_air, vpd_leaf)
+class LiveIO:
+    """
+    Where `monitor_vpd` gets its readings and time from, how it waits, and where its
+    readings and device commands go. The replay harness (replay.py) swaps in logged
+    readings, a virtual clock and recorded device calls.
+    """
 
-        best_action = choose_best_action(state_tuple, Q_table, state_tree, known_states, grow_stage, KPA_TOLERANCE)
+    anomaly_backend = ANOMALY_BACKEND
 
-        recommended_action = ACTION_MAP.get(best_action, {})
+    def time(self):
+        return time.time()
 
-        #await sync_device_states(recommended_action, humidity, max_humidity, air_temp)
+    async def read_sensor(self, room):
+        """(air_temp, leaf_temp, humidity), or None to stop monitoring."""
+        return await get_sensor_data(room=room)
 
-        log_to_csv(time.time(), air_temp, leaf_temp, humidity, vpd_air, vpd_leaf,
-                   state["exhaust"], state["humidifier"], state["dehumidifier"])
+    async def sleep(self, seconds):
+        await asyncio.sleep(seconds)
 
-        #last_air_exchange = await air_exchange_cycle(last_air_exchange, target_vpd_min, target_vpd_max)
+    async def wait(self, cadence, interval):
+        await cadence.wait(interval)
 
-        print(f"🔄 Waiting {CONTROL_INTERVAL} seconds...")
-        await asyncio.sleep(CONTROL_INTERVAL)
+    def record(self, timestamp, air_temp, leaf_temp, humidity, vpd_air, vpd_leaf, room):
+        room_state = room.state
+        log_to_csv(timestamp, air_temp, leaf_temp, humidity, vpd_air, vpd_leaf,
+                   room_state["exhaust"], room_state["humidifier"], room_state["dehumidifier"], path=room.log_path)
+        record_reading(timestamp, air_temp, leaf_temp, humidity, vpd_air, vpd_leaf,
+                       room_state["exhaust"], room_state["humidifier"], room_state["dehumidifier"], path=room.history_path)
 
+    async def apply(self, action, humidity, max_humidity, air_temp, room):
+        # Q-table and planner decisions are not switched on the live devices yet
+        #await sync_device_states(action, humidity, max_humidity, air_temp, room)
+        pass
 
-if __name__ == "__main__":
-    state["everything_ok"] = True
-    response = requests.get(f"{BASE_URL}/get_vpd_target").json()
+    def trace(self, entry):
+        """One decision of the loop (reading, state, action, next interval); replay keeps them."""
+        pass
+
+
+async def monitor_vpd(target_vpd_min, target_vpd_max, Q_table, scheduler=None, room=None, learner=None, io=None,
+                      policy=CONTROL_POLICY):
+    room = get_room(room)
+    room_state = room.state
+    io = io or LiveIO()
+
+    print(f"✅ Monitoring VPD in {room.name}: {target_vpd_min}-{target_vpd_max} kPa ({policy} policy)")
 
-    target_vpd_min = float(response.get("target_vpd_min", 1.2))
-    target_vpd_max = float(response.get("target_vpd_max", 1.6))
+    state_tree, known_states = artifacts.get("neighbour_index")
+    room_model = artifacts.get("room_model") if policy == "planner" else None
 
-    Q_table = load_q_table()
+    anomaly_detector = None
+    if io.anomaly_backend == "local":
+        forest = artifacts.get("anomaly_detector") if "anomaly_detector" in artifacts.available() else None
+        anomaly_detector = StreamingAnomalyDetector(forest)
+        print(f"🛡️ Local anomaly detection enabled ({'with' if anomaly_detector.forest else 'without'} IsolationForest).")
 
-    asyncio.run(monitor_vpd(target_vpd_min, target_vpd_max, Q_table))
+    previous_step = None
+    cadence = AdaptiveCadence(room.control_interval)
+    if scheduler is not None:
+        # Finished or cancelled jobs change the room, take a reading right away
+        scheduler.on_change = cadence.wake
+
+    def on_state_change(change):
+        # Overrides and stage changes made by another process (proxy, API) apply right away
+        if change["pid"] != os.getpid() and {"overrides", "grow_stage"} & set(change["keys"]):
+            cadence.wake(f"{', '.join(change['keys'])} changed")
+
+    room_state.subscribe(on_state_change, asyncio.get_running_loop())
+    try:
+        while True:
+            tick_started = time.perf_counter()
+            reading = await io.read_sensor(room)
+            if reading is None:
+                break
+            air_temp, leaf_temp, humidity = reading
+            vpd_air, vpd_leaf = calculate_vpd(air_temp, leaf_temp, humidity)
+            sensor_data = {
+                "temperature": air_temp,
+                "leaf_temperature": leaf_temp,
+                "humidity": humidity,
+                "vpd_air": vpd_air,
+                "vpd_leaf": vpd_leaf,
+                "exhaust": room_state.get("exhaust", False),  
+                "humidifier": room_state.get("humidifier", False),
+                "dehumidifier": room_state.get("dehumidifier", False),
+            }
+
+            print(f"✅ Processed data for anomaly detection: {sensor_data}")
+
+            if await start_anomaly_detection(sensor_data, anomaly_detector, io.time()):
+                ANOMALIES.inc(room=room.name)
+                TICK_SECONDS.observe(time.perf_counter() - tick_started, room=room.name)
+                io.trace({"timestamp": io.time(), "room": room.name, **sensor_data, "anomaly": True})
+                previous_step = None
+                await io.sleep(5)
+                continue
+
+            grow_stage = room.grow_stage
+            max_humidity = MAX_HUMIDITY_LEVELS.get(grow_stage, 50)
+
+            state_tuple = discretize_state(humidity, leaf_temp, air_temp, vpd_air, vpd_leaf)
+
+            plan = None
+            if room_model is not None:
+                with PLAN_SECONDS.time(room=room.name):
+                    plan = plan_devices(air_temp, leaf_temp, humidity, room_model, grow_stage, sensor_data,
+                                        (target_vpd_min, target_vpd_max))
+                print(f"🧭 Plan: {plan['devices']} (cost {plan['cost']:.3f}, {plan['candidates']} sequences "
+                      f"in {plan['seconds'] * 1000:.1f} ms)")
+                # Only the devices that have to change; advisory live, like the Q-table action (see LiveIO.apply)
+                best_action = None
+                recommended_action = {device: on for device, on in plan["devices"].items() if on != sensor_data[device]}
+            else:
+                best_action = choose_best_action(state_tuple, Q_table, state_tree, known_states, grow_stage, NEIGHBOUR_TOLERANCE)
+                recommended_action = ACTION_MAP.get(best_action, {})
+
+            await io.apply(recommended_action, humidity, max_humidity, air_temp, room)
+
+            timestamp = io.time()
+            io.record(timestamp, air_temp, leaf_temp, humidity, vpd_air, vpd_leaf, room)
+
+            if learner is not None:
+                # Credit the device change that actually happened since the last tick (as logged
+                # and inferred offline), not the recommendation, which may never have been applied
+                devices = [room_state.get(device, False) for device in ("exhaust", "humidifier", "dehumidifier")]
+                if previous_step is not None:
+                    previous_state, previous_devices = previous_step
+                    actions, _ = infer_logged_actions(np.array([previous_devices, devices], dtype=bool))
+                    vpd_min, vpd_max = VPD_MODES.get(grow_stage, (1.2, 1.6))
+                    reward = transition_reward(state_tuple, (vpd_min + vpd_max) / 2, max_humidity)
+                    learner.observe(previous_state, int(actions[0]), reward, state_tuple)
+                previous_step = (state_tuple, devices)
+
+            if scheduler is not None:
+                scheduler.track_overrides()
+
+            tick_seconds = time.perf_counter() - tick_started
+            TICK_SECONDS.observe(tick_seconds, room=room.name)
+            if tick_seconds > cadence.interval:
+                TICK_OVERRUNS.inc(room=room.name)
+                print(f"⚠️ [{room.name}] Tick took {tick_seconds:.1f}s, longer than its {cadence.interval:.0f}s interval.")
+
+            interval, reason = cadence.next_interval(humidity, vpd_leaf, grow_stage, timestamp, (target_vpd_min, target_vpd_max))
+            TICK_INTERVAL.set(interval, room=room.name)
+            io.trace({"timestamp": timestamp, "room": room.name, **sensor_data, "anomaly": False, "state": state_tuple,
+                      "action": best_action, "plan": plan, "interval": interval, "reason": reason})
+            print(f"🔄 [{room.name}] Waiting {interval:.0f} seconds ({reason})...")
+            await io.wait(cadence, interval)
+    finally:
+        room_state.unsubscribe(on_state_change)
+
+
+async def run_room(room, Q_table, learner=None):
+    """Control loop of one room, with its own job scheduler and timing."""
+    # Device states stored by an earlier run may no longer match the plugs
+    devices = await read_device_states(room)
+    print(f"🔌 [{room.name}] Device states on start: {devices}")
+    scheduler = DeviceScheduler(room=room)
+    if AIR_EXCHANGE_ENABLED:
+        scheduler.schedule_air_exchange()
+
+    target_vpd_min, target_vpd_max = room.vpd_range()
+    try:
+        await monitor_vpd(target_vpd_min, target_vpd_max, Q_table, scheduler, room, learner)
+    finally:
+        await scheduler.close()
+
+
+def install_profile_signals(session):
+    """`kill -USR1 <pid>` profiles the CPU, `kill -USR2 <pid>` traces memory, for PROFILE_SIGNAL_DURATION seconds."""
+    if not hasattr(signal, "SIGUSR1"):
+        return
+    loop = asyncio.get_running_loop()
+    for signum, kind in [(signal.SIGUSR1, "cpu"), (signal.SIGUSR2, "memory")]:
+        loop.add_signal_handler(signum, lambda kind=kind: session.start(kind, PROFILE_SIGNAL_DURATION)
+                                or print("⚠️ A profile is already running, ignoring the signal."))
+
+
+async def main():
+    client = get_http_client()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    install_profile_signals(ProfileSession(name="controller"))
+    energy_task = learner = learner_task = None
+    try:
+        rooms = load_rooms()
+
+        # The proxy serves the target of the default room only
+        response = (await client.get(f"{BASE_URL}/get_vpd_target")).json()
+        for room in rooms:
+            if room.name == DEFAULT_ROOM and room.vpd_target is None:
+                room.vpd_target = (float(response.get("target_vpd_min", 1.2)), float(response.get("target_vpd_max", 1.6)))
+
+        # Every room shares the Tapo device pool, the loaded models and one online learner
+        Q_table = load_q_table()
+        if ARTIFACT_WARMUP:
+            artifacts.warm_up([name for name in ("q_table", "neighbour_index", "anomaly_detector") if name in artifacts.available()])
+        if CONTROL_POLICY == "planner":
+            artifacts.get("room_model")
+        artifacts.print_report()
+
+        if ONLINE_LEARNING:
+            # The learner writes to the table, a read-only memory map would fail on the first update
+            if isinstance(Q_table, QGrid) and not Q_table.table.flags.writeable:
+                Q_table = QGrid.load(Q_GRID_PATH, mmap_mode=None)
+            learner = OnlineQLearner(Q_table, Q_GRID_PATH if isinstance(Q_table, QGrid) else Q_TABLE_PATH)
+            learner_task = asyncio.create_task(learner.run())
+            print("🧠 Online Q-learning enabled.")
+
+        # Plug telemetry runs on its own task, outside the control ticks
+        if ENERGY_POLL_INTERVAL:
+            energy_task = asyncio.create_task(EnergyCollector(rooms, ENERGY_POLL_INTERVAL).run())
+
+        print(f"🏠 Controlling {len(rooms)} room(s): {', '.join(room.name for room in rooms)}")
+        await asyncio.gather(*(run_room(room, Q_table, learner) for room in rooms))
+    finally:
+        if energy_task is not None:
+            energy_task.cancel()
+        if learner_task is not None:
+            # The last updates since the previous checkpoint would be lost otherwise
+            learner_task.cancel()
+            await asyncio.gather(learner_task, return_exceptions=True)
+            try:
+                await learner.close()
+            except Exception as e:
+                print(f"⚠️ Failed to save the final Q-table checkpoint: {e}")
+        await client.close()
+
+
+if __name__ == "__main__":
+    state["everything_ok"] = True
+    asyncio.run(main())
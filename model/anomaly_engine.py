@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import (
+    SENSOR_FALLBACK, ANOMALY_WARMUP, ANOMALY_EWMA_ALPHA,
+    ANOMALY_Z_THRESHOLD, ANOMALY_STUCK_TICKS, ANOMALY_SCORE_THRESHOLD, ANOMALY_RATE_LIMITS, ANOMALY_MIN_SCALE
+)
+
+# Column order the anomaly IsolationForest was trained on
+ANOMALY_FEATURES = ["temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf", "exhaust", "humidifier", "dehumidifier"]
+SENSOR_FEATURES = ["temperature", "leaf_temperature", "humidity"]
+
+# Mean absolute deviation of a normal distribution is sigma * sqrt(2 / pi)
+_MAD_TO_SIGMA = 1.2533
+
+
+class StreamingAnomalyDetector:
+    """
+    In-process anomaly checks on each controller reading.
+
+    Every reading goes through, in order:
+    - the sensor fallback values `get_sensor_data` returns when the hub fails,
+    - a stuck sensor repeating the exact same raw reading,
+    - rate-of-change limits against the last accepted reading,
+    - robust z-scores against an EWMA mean and EWMA absolute deviation per feature,
+    - and, only if all of those pass, the IsolationForest score when a forest is loaded.
+
+    The statistical checks are plain float arithmetic on a handful of values, so a
+    check takes microseconds and never depends on the proxy being up.
+    """
+
+    def __init__(self, forest=None, alpha=ANOMALY_EWMA_ALPHA, z_threshold=ANOMALY_Z_THRESHOLD,
+                 warmup=ANOMALY_WARMUP, stuck_ticks=ANOMALY_STUCK_TICKS, score_threshold=ANOMALY_SCORE_THRESHOLD,
+                 rate_limits=ANOMALY_RATE_LIMITS, min_scale=ANOMALY_MIN_SCALE):
+        self.forest = forest
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.warmup = warmup
+        self.stuck_ticks = stuck_ticks
+        self.score_threshold = score_threshold
+        self.rate_limits = rate_limits
+        self.min_scale = min_scale
+
+        self.mean = {}
+        self.deviation = {}
+        self.count = 0
+        self.last_accepted = None
+        self.last_timestamp = None
+        self.last_raw = None
+        self.repeats = 0
+        self.counters = {"checks": 0, "anomalies": 0}
+
+    def _scale(self, feature):
+        return max(self.deviation[feature] * _MAD_TO_SIGMA, self.min_scale.get(feature, 0.0))
+
+    def _update_statistics(self, sensor_data):
+        self.count += 1
+        alpha = max(self.alpha, 1.0 / self.count)
+        for feature in self.min_scale:
+            value = float(sensor_data[feature])
+            if feature not in self.mean:
+                self.mean[feature], self.deviation[feature] = value, 0.0
+                continue
+
+            # Clip the update so a single spike cannot drag the baseline along with it
+            mean = self.mean[feature]
+            limit = self.z_threshold * self._scale(feature)
+            value = min(max(value, mean - limit), mean + limit)
+            self.deviation[feature] += alpha * (abs(value - mean) - self.deviation[feature])
+            self.mean[feature] = mean + alpha * (value - mean)
+
+    def check(self, sensor_data, timestamp=None):
+        """
+        Check one reading (a dict with at least the sensor and VPD features).
+
+        Returns:
+        - (bool, list): whether the reading is anomalous and the reasons that fired.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        self.counters["checks"] += 1
+        raw = tuple(float(sensor_data[feature]) for feature in SENSOR_FEATURES)
+
+        # The fallback leaf temperature is not air - LEAF_TEMP_OFFSET, so a real reading never matches it
+        if raw == SENSOR_FALLBACK:
+            return self._report(["sensor_fallback"])
+
+        reasons = []
+        self.repeats = self.repeats + 1 if raw == self.last_raw else 0
+        self.last_raw = raw
+        if self.repeats + 1 >= self.stuck_ticks:
+            reasons.append("stuck_sensor")
+
+        if self.last_accepted is not None:
+            minutes = max(timestamp - self.last_timestamp, 1.0) / 60
+            for feature, limit in self.rate_limits.items():
+                if abs(float(sensor_data[feature]) - self.last_accepted[feature]) > limit * minutes:
+                    reasons.append(f"rate:{feature}")
+
+        if self.count >= self.warmup:
+            for feature in self.min_scale:
+                if abs(float(sensor_data[feature]) - self.mean[feature]) > self.z_threshold * self._scale(feature):
+                    reasons.append(f"zscore:{feature}")
+
+        if not reasons and self.forest is not None:
+            row = [float(sensor_data.get(feature, 0)) for feature in ANOMALY_FEATURES]
+            if self.forest.decision_function(row)[0] < self.score_threshold:
+                reasons.append("isolation_forest")
+
+        self._update_statistics(sensor_data)
+        if not any(reason.startswith("rate:") for reason in reasons):
+            self.last_accepted = {feature: float(sensor_data[feature]) for feature in self.rate_limits}
+            self.last_timestamp = timestamp
+        return self._report(reasons)
+
+    def _report(self, reasons):
+        if reasons:
+            self.counters["anomalies"] += 1
+            for reason in reasons:
+                self.counters[reason] = self.counters.get(reason, 0) + 1
+        return bool(reasons), reasons
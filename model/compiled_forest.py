@@ -0,0 +1,228 @@
+import os
+import sys
+import json
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.manifest import save_array, save_json
+
+
+def forest_metadata_path(path):
+    """Path of the forest metadata stored next to a `.npy` node array."""
+    return os.path.splitext(path)[0] + ".json"
+
+
+def remove_forest(path):
+    """Delete a compiled forest (.npy) and its metadata, so services fall back to the pickled model."""
+    for file_path in (path, forest_metadata_path(path)):
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+class CompiledForest:
+    """
+    A trained random forest flattened into one contiguous node array.
+
+    Every tree's nodes are stored back to back as (feature, threshold, left, right,
+    value) records, with children as global node indices. Leaves point at
+    themselves, so prediction walks all rows through all trees at once for a fixed
+    `max_depth` steps of array indexing. Serving needs only NumPy, and the node
+    array can be memory-mapped from disk.
+    """
+
+    def __init__(self, nodes, roots, classes, n_features, max_depth, feature_names=None):
+        self.nodes = nodes
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.classes_ = np.asarray(classes)
+        self.n_features = n_features
+        self.max_depth = max_depth
+        self.feature_names = feature_names
+
+        self.feature = np.maximum(nodes["feature"], 0)
+        self.threshold = nodes["threshold"]
+        self.left = nodes["left"]
+        self.right = nodes["right"]
+        self.value = nodes["value"]
+
+    @staticmethod
+    def node_dtype(n_outputs):
+        return np.dtype([
+            ("feature", np.int32), ("threshold", np.float64),
+            ("left", np.int32), ("right", np.int32),
+            ("value", np.float64, (n_outputs,)),
+        ])
+
+    @classmethod
+    def from_estimator(cls, model):
+        """
+        Flatten a fitted `RandomForestClassifier` (anything with `estimators_` of
+        decision trees) into a compiled forest. Leaf values are normalised to class
+        probabilities, exactly as the trees' `predict_proba` does.
+        """
+        n_classes = len(model.classes_)
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        nodes = np.zeros(sum(tree.node_count for tree in trees), dtype=cls.node_dtype(n_classes))
+
+        roots, offset = [], 0
+        for tree in trees:
+            count = tree.node_count
+            block = nodes[offset:offset + count]
+            leaves = tree.children_left == -1
+
+            block["feature"] = tree.feature
+            block["threshold"] = tree.threshold
+            own_index = np.arange(offset, offset + count)
+            block["left"] = np.where(leaves, own_index, tree.children_left + offset)
+            block["right"] = np.where(leaves, own_index, tree.children_right + offset)
+
+            value = tree.value[:, 0, :].astype(np.float64)
+            totals = value.sum(axis=1, keepdims=True)
+            totals[totals == 0] = 1
+            block["value"] = value / totals
+
+            roots.append(offset)
+            offset += count
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        return cls(nodes, roots, model.classes_, model.n_features_in_, max(tree.max_depth for tree in trees),
+                   None if feature_names is None else list(feature_names))
+
+    def apply(self, X):
+        """Return the (n_rows, n_trees) leaf index each row reaches in each tree."""
+        # Trees were fitted on float32 inputs, compare the same way to get identical splits
+        X = np.asarray(X, dtype=np.float32).reshape(-1, self.n_features)
+        n_rows, n_trees = len(X), len(self.roots)
+        leaf = np.tile(self.roots, n_rows)
+
+        # Only (row, tree) pairs that have not reached a leaf are stepped each level
+        active = np.arange(n_rows * n_trees)
+        rows = active // n_trees
+        node = leaf.copy()
+
+        for _ in range(self.max_depth):
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+            leaf[active] = node
+
+            moving = self.left[node] != node
+            if not moving.all():
+                active, rows, node = active[moving], rows[moving], node[moving]
+                if not len(active):
+                    break
+        return leaf.reshape(n_rows, n_trees)
+
+    def predict_proba(self, X):
+        """Mean class probabilities over all trees."""
+        return self.value[self.apply(X)].mean(axis=1)
+
+    def predict(self, X):
+        """Predicted class per row, the argmax of the mean class probabilities."""
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def metadata(self):
+        """Everything besides the node array that `load` needs to rebuild the forest."""
+        return {
+            "roots": self.roots.tolist(),
+            "classes": self.classes_.tolist(),
+            "n_features": int(self.n_features),
+            "max_depth": int(self.max_depth),
+            "feature_names": self.feature_names,
+        }
+
+    def save(self, path):
+        """Write the node array to `path` (.npy) and the metadata to the matching .json."""
+        # Replaced, never rewritten in place: running services may have the old nodes mapped
+        save_array(path, self.nodes)
+        save_json(forest_metadata_path(path), self.metadata(), indent=None)
+
+    @classmethod
+    def from_metadata(cls, nodes, metadata):
+        return cls(nodes, metadata["roots"], metadata["classes"], metadata["n_features"],
+                   metadata["max_depth"], metadata["feature_names"])
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Load a compiled forest, memory-mapping the node array by default."""
+        with open(forest_metadata_path(path), "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+        return cls.from_metadata(np.load(path, mmap_mode=mmap_mode), metadata)
+
+
+def average_path_length(n_samples):
+    """Expected path length of an unsuccessful BST search over `n_samples` points, c(n)."""
+    n_samples = np.asarray(n_samples, dtype=np.float64)
+    lengths = np.zeros_like(n_samples)
+    lengths[n_samples == 2] = 1.0
+    large = n_samples > 2
+    n = n_samples[large]
+    lengths[large] = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return lengths
+
+
+class CompiledIsolationForest(CompiledForest):
+    """
+    A trained `IsolationForest` in the same flat node layout.
+
+    Each leaf stores its isolation depth plus c(n) for the samples left in it, so
+    the anomaly score is the mean leaf value over the trees, normalised by c(max_samples)
+    and shifted by the fitted `offset_`, the same as sklearn's `decision_function`.
+    """
+
+    def __init__(self, nodes, roots, n_features, max_depth, normalizer, offset, feature_names=None):
+        super().__init__(nodes, roots, [], n_features, max_depth, feature_names)
+        self.normalizer = normalizer
+        self.offset = offset
+
+    @classmethod
+    def from_estimator(cls, model):
+        """Flatten a fitted `IsolationForest` into a compiled forest."""
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        nodes = np.zeros(sum(tree.node_count for tree in trees), dtype=cls.node_dtype(1))
+
+        roots, offset = [], 0
+        for tree, features in zip(trees, model.estimators_features_):
+            count = tree.node_count
+            block = nodes[offset:offset + count]
+            leaves = tree.children_left == -1
+
+            # Every tree sees its own ordering of the features, map them back to the input columns
+            block["feature"] = np.where(leaves, 0, np.asarray(features)[np.maximum(tree.feature, 0)])
+            block["threshold"] = tree.threshold
+            own_index = np.arange(offset, offset + count)
+            block["left"] = np.where(leaves, own_index, tree.children_left + offset)
+            block["right"] = np.where(leaves, own_index, tree.children_right + offset)
+
+            depth = np.zeros(count)
+            for node in range(count):
+                if not leaves[node]:
+                    depth[tree.children_left[node]] = depth[tree.children_right[node]] = depth[node] + 1
+            block["value"][:, 0] = depth + average_path_length(tree.n_node_samples)
+
+            roots.append(offset)
+            offset += count
+
+        feature_names = getattr(model, "feature_names_in_", None)
+        return cls(nodes, roots, model.n_features_in_, max(tree.max_depth for tree in trees),
+                   float(average_path_length([model.max_samples_])[0]), float(model.offset_),
+                   None if feature_names is None else list(feature_names))
+
+    def score_samples(self, X):
+        """Opposite of the anomaly score, lower is more abnormal (sklearn's `score_samples`)."""
+        depths = self.value[self.apply(X), 0].mean(axis=1)
+        return -np.power(2.0, -depths / self.normalizer)
+
+    def decision_function(self, X):
+        """Shifted score, negative for outliers (sklearn's `decision_function`)."""
+        return self.score_samples(X) - self.offset
+
+    def predict(self, X):
+        """-1 for outliers and 1 for inliers."""
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def metadata(self):
+        return {**super().metadata(), "normalizer": self.normalizer, "offset": self.offset}
+
+    @classmethod
+    def from_metadata(cls, nodes, metadata):
+        return cls(nodes, metadata["roots"], metadata["n_features"], metadata["max_depth"],
+                   metadata["normalizer"], metadata["offset"], metadata["feature_names"])
@@ -0,0 +1,74 @@
+import os
+import sys
+import json
+import hashlib
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import MODEL_DIR, MANIFEST_PATH
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Content hash of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def artifact_key(path):
+    """Manifest key of an artifact: its path relative to MODEL_DIR."""
+    return os.path.relpath(os.path.abspath(path), os.path.abspath(MODEL_DIR))
+
+
+def artifact_hashes(paths):
+    """Map every artifact path to its manifest key and content hash."""
+    return {artifact_key(path): file_sha256(path) for path in paths}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """The training manifest, or None if no artifacts were trained through `train.py`."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def atomic_write(path, write):
+    """
+    Write through `write(tmp_path)` and move the result over `path` in one step.
+
+    Services memory-map artifacts, so a file must never be rewritten in place: a
+    mapping keeps the replaced file alive, while a truncated one faults (SIGBUS).
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def save_array(path, array):
+    """`np.save` to `path` through `atomic_write` (without np.save appending .npy to the temp name)."""
+    import numpy as np
+
+    def write(tmp_path):
+        with open(tmp_path, "wb") as file:
+            np.save(file, array)
+
+    atomic_write(path, write)
+
+
+def save_json(path, value, indent=4):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(value, file, indent=indent)
+
+    atomic_write(path, write)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Write the manifest atomically so a reading service never sees half of it."""
+    save_json(path, manifest)
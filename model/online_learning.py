@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import asyncio
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.q_grid import QGrid, metadata_path
+from model.manifest import atomic_write, save_array
+from config.settings import ACTION_MAP, ONLINE_ALPHA, ONLINE_GAMMA, ONLINE_MAX_DELTA, Q_CHECKPOINT_INTERVAL
+
+
+class OnlineQLearner:
+    """
+    Incremental Q-learning for the running controller.
+
+    `observe` only queues a transition, so the control tick never waits on learning.
+    `run` applies the queued updates one at a time (one Q-row read and write each,
+    with the change clamped to `max_delta`) and periodically checkpoints the table
+    to disk atomically from a worker thread. After cancelling `run`, `close` applies
+    what is still queued and writes the final checkpoint.
+    """
+
+    def __init__(self, Q_table, path, alpha=ONLINE_ALPHA, gamma=ONLINE_GAMMA, max_delta=ONLINE_MAX_DELTA,
+                 checkpoint_interval=Q_CHECKPOINT_INTERVAL, max_pending=1000):
+        self.Q_table = Q_table
+        self.path = path
+        self.alpha = alpha
+        self.gamma = gamma
+        self.max_delta = max_delta
+        self.checkpoint_interval = checkpoint_interval
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.updates = 0
+        self.dropped = 0
+        self.last_checkpoint = time.time()
+        self.checkpointed_updates = 0
+        self._writing = None
+
+    def observe(self, state, action, reward, next_state):
+        """Queue one (state, action, reward, next_state) transition without blocking."""
+        try:
+            self.queue.put_nowait((state, action, reward, next_state))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def _get_row(self, state):
+        if isinstance(self.Q_table, QGrid):
+            return self.Q_table.lookup(state)
+        return self.Q_table.get(state)
+
+    def update(self, state, action, reward, next_state):
+        """Apply a single bounded Q-learning update."""
+        next_row = self._get_row(next_state)
+        next_value = 0.0
+        if next_row is not None and np.isfinite(next_row).any():
+            next_value = float(np.max(next_row[np.isfinite(next_row)]))
+
+        row = self._get_row(state)
+        row = np.full(len(ACTION_MAP), -np.inf, dtype=np.float32) if row is None else np.array(row, dtype=np.float32)
+        current = float(row[action]) if np.isfinite(row[action]) else 0.0
+
+        delta = self.alpha * (reward + self.gamma * next_value - current)
+        row[action] = current + float(np.clip(delta, -self.max_delta, self.max_delta))
+
+        if isinstance(self.Q_table, QGrid):
+            self.Q_table.set(state, row)
+        else:
+            self.Q_table[state] = row
+        self.updates += 1
+
+    def _write_checkpoint(self, snapshot):
+        if isinstance(snapshot, QGrid):
+            save_array(self.path, snapshot.table)
+            snapshot.save_metadata(metadata_path(self.path))
+        else:
+            import joblib
+
+            atomic_write(self.path, lambda tmp: joblib.dump(snapshot, tmp))
+
+    async def checkpoint(self):
+        """Copy the table on the event loop, then write it to disk in a worker thread."""
+        if isinstance(self.Q_table, QGrid):
+            snapshot = QGrid(self.Q_table.table.copy(), self.Q_table.grid, self.Q_table.n_actions,
+                             self.Q_table.size, self.Q_table.max_probe)
+        else:
+            snapshot = {state: row.copy() for state, row in self.Q_table.items()}
+
+        updates = self.updates
+        # Shielded: a cancelled `run` must not leave a write behind that `close` would race
+        self._writing = asyncio.ensure_future(asyncio.to_thread(self._write_checkpoint, snapshot))
+        await asyncio.shield(self._writing)
+        self.last_checkpoint = time.time()
+        self.checkpointed_updates = updates
+        print(f"💾 Q-table checkpoint saved ({self.updates} online updates, {self.dropped} dropped).")
+
+    def _apply(self, transition):
+        # A failed update must not end the task, learning would stop without a trace
+        try:
+            self.update(*transition)
+        except Exception as e:
+            self.dropped += 1
+            print(f"⚠️ Online Q-learning update failed: {e}")
+
+    async def close(self):
+        """Apply the still queued transitions and write a final checkpoint. Call after cancelling `run`."""
+        if self._writing is not None and not self._writing.done():
+            try:
+                await self._writing
+            except Exception:
+                pass
+        while not self.queue.empty():
+            self._apply(self.queue.get_nowait())
+        if self.updates != self.checkpointed_updates:
+            await self.checkpoint()
+
+    async def run(self):
+        """Background task: apply queued updates and checkpoint every `checkpoint_interval` seconds."""
+        while True:
+            # Not wait_for: it can swallow a cancel that lands as a transition arrives, and `run` would never end
+            try:
+                async with asyncio.timeout(max(self.checkpoint_interval - (time.time() - self.last_checkpoint), 0)):
+                    transition = await self.queue.get()
+            except TimeoutError:
+                transition = None
+
+            if transition is not None:
+                self._apply(transition)
+
+            if time.time() - self.last_checkpoint >= self.checkpoint_interval:
+                if self.updates == self.checkpointed_updates:
+                    self.last_checkpoint = time.time()
+                    continue
+                try:
+                    await self.checkpoint()
+                except Exception as e:
+                    print(f"⚠️ Failed to checkpoint Q-table: {e}")
+                    self.last_checkpoint = time.time()
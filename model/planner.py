@@ -0,0 +1,120 @@
+import os
+import sys
+import time
+import itertools
+import numpy as np
+from functools import lru_cache
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.simulator import DEVICES
+from utils.calculate import calculate_vpd_array
+from config.settings import (
+    VPD_MODES, MAX_HUMIDITY_LEVELS, MIN_HUMIDITY_LEVELS, MAX_AIR_TEMP, PLANNER_HORIZON, PLANNER_STEP, PLANNER_WEIGHTS
+)
+
+# Every exhaust/humidifier/dehumidifier state, all OFF first so it wins a tie
+DEVICE_COMBINATIONS = np.array(list(itertools.product([False, True], repeat=len(DEVICES))))
+
+
+@lru_cache(maxsize=16)
+def _level(depth):
+    """
+    Device combinations of every sequence prefix `depth + 1` steps long, (8**(depth + 1), 3),
+    and the switches from each prefix's previous step (None at depth 0).
+    """
+    count = len(DEVICE_COMBINATIONS)
+    combinations = np.tile(DEVICE_COMBINATIONS, (count ** depth, 1))
+    if depth == 0:
+        return combinations, None
+    previous = np.repeat(_level(depth - 1)[0], count, axis=0)
+    return combinations, (combinations != previous).sum(axis=1)
+
+
+def plan_devices(air_temp, leaf_temp, humidity, room_model, grow_stage="flowering", devices=None,
+                 vpd_range=None, horizon=PLANNER_HORIZON, step=PLANNER_STEP, weights=None):
+    """
+    Pick the device states to run now by simulating every sequence of device
+    combinations (8**horizon) `horizon` steps of `step` seconds ahead.
+
+    Sequences that share their first steps share those simulated steps: step h
+    moves the 8**(h + 1) distinct prefixes through `room_model` as one array.
+    Each step is scored on leaf VPD outside `vpd_range` (default: the stage band),
+    humidity outside the stage limits and heat above MAX_AIR_TEMP, plus the
+    switches from the current `devices` and the device runtime. Only the first
+    step of the cheapest sequence is meant to be applied; the next tick plans again.
+
+    Returns:
+    - dict: `devices` to run now, the chosen `sequence`, its `cost` and `predicted`
+      trajectory, the number of `candidates` and the planning `seconds`.
+    """
+    started = time.perf_counter()
+    if horizon < 1:
+        raise ValueError(f"❌ Planner horizon must be at least 1 step, got {horizon}.")
+    weights = {**PLANNER_WEIGHTS, **(weights or {})}
+    vpd_min, vpd_max = vpd_range or VPD_MODES.get(grow_stage, (1.2, 1.6))
+    max_humidity = MAX_HUMIDITY_LEVELS.get(grow_stage, 50)
+    min_humidity = MIN_HUMIDITY_LEVELS.get(grow_stage, max_humidity - 5)
+    current = np.array([bool((devices or {}).get(device, False)) for device in DEVICES])
+    # The measured leaf offset is held over the horizon
+    leaf_offset = air_temp - leaf_temp
+    count = len(DEVICE_COMBINATIONS)
+
+    air, hum, cost = np.array([float(air_temp)]), np.array([float(humidity)]), np.zeros(1)
+    levels = []
+    for depth in range(horizon):
+        combinations, switches = _level(depth)
+        if switches is None:
+            switches = (combinations != current).sum(axis=1)
+        air, hum = room_model.step(np.repeat(air, count), np.repeat(hum, count), combinations, step)
+        _, vpd_leaf = calculate_vpd_array(air, air - leaf_offset, hum)
+
+        cost = np.repeat(cost, count)
+        cost += weights["vpd"] * (np.maximum(vpd_min - vpd_leaf, 0) + np.maximum(vpd_leaf - vpd_max, 0))
+        cost += weights["humidity"] * (np.maximum(hum - max_humidity, 0) + np.maximum(min_humidity - hum, 0))
+        cost += weights["heat"] * np.maximum(air - MAX_AIR_TEMP, 0)
+        cost += weights["switch"] * switches
+        cost += weights["runtime"] * combinations.sum(axis=1)
+        cost += weights["conflict"] * (combinations[:, 1] & combinations[:, 2])
+        levels.append((air, hum, vpd_leaf))
+
+    # Sequences are numbered like itertools.product, so a prefix is the sequence index // 8**(steps left)
+    best = int(np.argmin(cost))
+    prefixes = [best // count ** (horizon - 1 - depth) for depth in range(horizon)]
+    as_dict = lambda states: {device: bool(state) for device, state in zip(DEVICES, states)}
+    sequence = [as_dict(DEVICE_COMBINATIONS[prefix % count]) for prefix in prefixes]
+    return {
+        "devices": sequence[0],
+        "sequence": sequence,
+        "cost": float(cost[best]),
+        "predicted": {
+            name: [round(float(level[i][prefix]), 3) for level, prefix in zip(levels, prefixes)]
+            for i, name in enumerate(["air_temp", "humidity", "vpd_leaf"])
+        },
+        "candidates": len(cost),
+        "seconds": time.perf_counter() - started,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from api.models import artifacts
+
+    parser = argparse.ArgumentParser(description="Plan device states for one reading with the room model.")
+    parser.add_argument("--air-temp", type=float, default=24.0)
+    parser.add_argument("--leaf-temp", type=float, help="Default: air temperature minus the model's leaf offset.")
+    parser.add_argument("--humidity", type=float, default=55.0)
+    parser.add_argument("--grow-stage", default="flowering", choices=list(VPD_MODES))
+    parser.add_argument("--horizon", type=int, default=PLANNER_HORIZON)
+    parser.add_argument("--step", type=float, default=PLANNER_STEP)
+    args = parser.parse_args()
+
+    room_model = artifacts.get("room_model")
+    leaf_temp = args.leaf_temp if args.leaf_temp is not None else args.air_temp - room_model.leaf_offset
+    plan = plan_devices(args.air_temp, leaf_temp, args.humidity, room_model, args.grow_stage,
+                        horizon=args.horizon, step=args.step)
+
+    print(f"✅ Scored {plan['candidates']} sequences in {plan['seconds'] * 1000:.2f} ms, cost {plan['cost']:.3f}")
+    for h, states in enumerate(plan["sequence"]):
+        running = ", ".join(device for device, on in states.items() if on) or "all OFF"
+        print(f"   +{(h + 1) * args.step:.0f}s {running:<35} air {plan['predicted']['air_temp'][h]:.1f}°C, "
+              f"humidity {plan['predicted']['humidity'][h]:.1f}%, leaf VPD {plan['predicted']['vpd_leaf'][h]:.2f} kPa")
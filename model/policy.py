@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.q_grid import QGrid
+from utils.state_encoder import STATE_FEATURES, scale_states, record_lookup, build_neighbour_index
+from config.settings import ACTION_MAP, MAX_AIR_TEMP, MAX_HUMIDITY_LEVELS, VPD_MODES
+
+# Serving-side Q-table code: the controller and proxy import this module, training
+# lives in train_rl_agent.py (pandas, joblib) and re-exports these functions.
+
+
+def build_state_lookup(Q_table):
+    """Build a KDTree over the scaled states (or visited Q-grid cells) for fast nearest-neighbor lookup."""
+    if not Q_table:
+        return None, []
+
+    return build_neighbour_index(Q_table)
+
+
+def choose_best_action(state, Q_table, state_tree, known_states, grow_stage, tolerance=1.0):
+    """
+    Choose the best action given the current state and growth stage.
+
+    - Ensures humidifier and dehumidifier are mutually exclusive.
+    - Adjusts exhaust behavior based on temperature, humidity, and VPD.
+    """
+    started = time.perf_counter()
+    state = tuple(map(float, state))
+
+    if isinstance(Q_table, QGrid):
+        q_values = Q_table.lookup(state)
+        if q_values is not None:
+            record_lookup("hit", started)
+            return int(np.argmax(q_values))
+    elif state in Q_table:
+        record_lookup("hit", started)
+        sorted_actions = np.argsort(Q_table[state])[::-1]
+        best_action = next((a for a in sorted_actions if a in ACTION_MAP), 1)
+        return best_action
+
+    if state_tree is not None:
+        distance, index = state_tree.query(scale_states(state))
+        if distance < tolerance:
+            record_lookup("near_hit", started)
+            closest_state = tuple(map(float, known_states[index]))
+            q_values = Q_table.lookup(closest_state) if isinstance(Q_table, QGrid) else Q_table[closest_state]
+            sorted_actions = np.argsort(q_values)[::-1]
+            best_action = next((a for a in sorted_actions if a in ACTION_MAP), 1)
+            print(f"⚠️ Warning: Unseen state {state}, using closest match {closest_state} with action {best_action}.")
+            return best_action
+
+    record_lookup("miss", started)
+    print(f"⚠️ Warning: Completely new state {state}, estimating best action.")
+
+    humidity, leaf_temp, air_temp, vpd_air, vpd_leaf = state
+    max_humidity = MAX_HUMIDITY_LEVELS.get(grow_stage, 50)
+    min_humidity = max_humidity - 5  # Maintain a 5% buffer
+    vpd_min, vpd_max = VPD_MODES.get(grow_stage, (1.2, 1.6))
+
+    actions = {"humidifier": False, "dehumidifier": False, "exhaust": False}
+
+    if air_temp > MAX_AIR_TEMP or vpd_leaf > vpd_max:
+        actions["exhaust"] = True  
+    elif vpd_leaf < vpd_min and grow_stage != "flowering":
+        actions["exhaust"] = False  
+
+    if humidity > max_humidity:
+        actions["humidifier"] = False  
+        actions["dehumidifier"] = True 
+        actions["exhaust"] = True  
+    elif humidity < min_humidity:
+        actions["dehumidifier"] = False  
+        actions["humidifier"] = True  
+    else:
+        actions["humidifier"] = False
+        actions["dehumidifier"] = False 
+        
+    # Prioritize dehumidifier in case of conflict
+    if actions["humidifier"] and actions["dehumidifier"]:
+        actions["humidifier"] = False  
+
+    for action, state_dict in ACTION_MAP.items():
+        if all(actions.get(k, False) == state_dict.get(k, False) for k in actions):
+            return action
+
+    return 1  # Default: Keep exhaust OFF
+
+
+def transition_reward(next_state, target_vpd=1.4, max_humidity=None, humidity_weight=0.05, switched=False, switch_cost=0.0):
+    """Scalar `shape_rewards` for a single (encoded) next state, used by online learning."""
+    reward = -abs(next_state[STATE_FEATURES.index("vpd_leaf")] - target_vpd)
+
+    if max_humidity is not None:
+        reward -= humidity_weight * max(next_state[STATE_FEATURES.index("humidity")] - max_humidity, 0)
+
+    if switched:
+        reward -= switch_cost
+
+    return reward
+
+
+def infer_logged_actions(devices):
+    """
+    Map consecutive logged device states onto ACTION_MAP actions.
+
+    `devices` is an (N, 3) bool array of exhaust/humidifier/dehumidifier states.
+    A transition where a device was switched gets that device's ON/OFF action
+    (the first one if several changed); a transition without a change gets the
+    action that holds the current exhaust state.
+
+    Returns:
+    - (np.ndarray, np.ndarray): N-1 action ids and a bool array marking switches.
+    """
+    changes = devices[1:] != devices[:-1]
+    switched = changes.any(axis=1)
+    device_index = np.where(switched, changes.argmax(axis=1), 0)
+    new_state = devices[1:][np.arange(len(device_index)), device_index]
+    actions = 2 * device_index + (~new_state).astype(np.int64)
+    return actions, switched
@@ -0,0 +1,221 @@
+import os
+import sys
+import json
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import Q_GRID, ACTION_MAP
+from model.manifest import save_array, save_json
+
+EMPTY_KEY = -1
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class QGrid:
+    """
+    Array-backed Q-table over a fixed (humidity, leaf_temp, air_temp, vpd_air, vpd_leaf) grid.
+
+    Each state is binned on the grid and flattened to one integer cell id. Visited
+    cells live in an open-addressing hash table stored as a single structured NumPy
+    array (`key`, `q`), so a lookup is a constant number of integer array reads and
+    the whole table is one `.npy` file that can be memory-mapped. The grid metadata
+    is written to a `.json` file next to it.
+
+    Only visited cells take memory (32 bytes per slot at <= 50 % load), which keeps a
+    full 0.1-resolution policy at a few MB where a dense 5-D array would not fit.
+    """
+
+    def __init__(self, table, grid=Q_GRID, n_actions=len(ACTION_MAP), size=None, max_probe=0):
+        self.grid = {name: tuple(float(v) for v in spec) for name, spec in grid.items()}
+        self.n_actions = n_actions
+        self.size = int(np.count_nonzero(table["key"] != EMPTY_KEY)) if size is None else size
+        self.max_probe = max_probe
+
+        self.lows = np.array([spec[0] for spec in self.grid.values()])
+        self.steps = np.array([spec[2] for spec in self.grid.values()])
+        self.shape = tuple(int(round((high - low) / step)) + 1 for low, high, step in self.grid.values())
+        self.strides = [int(np.prod(self.shape[i + 1:])) for i in range(len(self.shape))]
+        self._index_table(table)
+
+    def _index_table(self, table):
+        self.table = table
+        self.keys = table["key"]
+        self.q_values = table["q"]
+        self.mask = np.uint64(len(table) - 1)
+        self.shift = np.uint64(64 - int(len(table)).bit_length() + 1)
+
+    @staticmethod
+    def empty_table(capacity, n_actions=len(ACTION_MAP)):
+        dtype = np.dtype([("key", np.int64), ("q", np.float32, (n_actions,))])
+        table = np.zeros(capacity, dtype=dtype)
+        table["key"] = EMPTY_KEY
+        return table
+
+    @classmethod
+    def from_q_table(cls, Q_table, grid=Q_GRID):
+        """
+        Build a grid from a dict Q-table keyed by state tuples.
+
+        States that fall into the same cell are merged by averaging the finite
+        Q-values of each action; actions never seen in a cell stay at -inf.
+        """
+        n_actions = len(ACTION_MAP)
+        states = np.array(list(Q_table.keys()), dtype=np.float64).reshape(-1, len(grid))
+        values = np.array(list(Q_table.values()), dtype=np.float64).reshape(-1, n_actions)
+
+        grid_table = cls(cls.empty_table(16, n_actions), grid, n_actions)
+        cells = grid_table.cells(states)
+        unique_cells, inverse = np.unique(cells, return_inverse=True)
+
+        finite = np.isfinite(values)
+        sums = np.zeros((len(unique_cells), n_actions))
+        counts = np.zeros((len(unique_cells), n_actions))
+        np.add.at(sums, inverse, np.where(finite, values, 0.0))
+        np.add.at(counts, inverse, finite)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            merged = np.where(counts > 0, sums / counts, -np.inf)
+
+        grid_table.reserve(len(unique_cells))
+        for cell, row in zip(unique_cells.tolist(), merged):
+            grid_table.set_cell(cell, row)
+        return grid_table
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, state):
+        return self.lookup(state) is not None
+
+    def states(self):
+        """(N, 5) centres of the visited cells, ordered by cell id."""
+        cells = np.sort(self.keys[self.keys != EMPTY_KEY])
+        indices = np.stack(np.unravel_index(cells, self.shape), axis=1)
+        return np.round(self.lows + indices * self.steps, 6)
+
+    def bins(self, states):
+        """Bin an (N, 5) array of states into per-dimension grid indices."""
+        states = np.asarray(states, dtype=np.float64).reshape(-1, len(self.shape))
+        indices = np.rint((states - self.lows) / self.steps).astype(np.int64)
+        return np.clip(indices, 0, np.array(self.shape) - 1)
+
+    def cells(self, states):
+        """Flatten an (N, 5) array of states into grid cell ids."""
+        return np.ravel_multi_index(tuple(self.bins(states).T), self.shape)
+
+    def _slots(self, cells):
+        hashed = (np.asarray(cells, dtype=np.int64).astype(np.uint64) * _HASH_MULTIPLIER) >> self.shift
+        return (hashed & self.mask).astype(np.int64)
+
+    def cell(self, state):
+        """Flatten a single state into its grid cell id without allocating arrays."""
+        cell = 0
+        for value, (low, _, step), size, stride in zip(state, self.grid.values(), self.shape, self.strides):
+            cell += min(max(int(round((value - low) / step)), 0), size - 1) * stride
+        return cell
+
+    def _find_slot(self, cell):
+        mask = int(self.mask)
+        slot = ((cell * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> int(self.shift) & mask
+        keys = self.keys
+        probes = 0
+        while keys[slot] != cell and keys[slot] != EMPTY_KEY:
+            slot = (slot + 1) & mask
+            probes += 1
+        return slot, probes
+
+    def lookup(self, state):
+        """Return the Q-values of a single state's cell, or None if the cell was never visited."""
+        cell = self.cell(state)
+        slot, _ = self._find_slot(cell)
+        if self.keys[slot] == cell:
+            return self.q_values[slot]
+        return None
+
+    def lookup_batch(self, states):
+        """
+        Look up many states at once.
+
+        Returns:
+        - (np.ndarray, np.ndarray): (N, n_actions) Q-values (NaN rows for unvisited
+          cells) and a bool mask of the states that were found.
+        """
+        cells = self.cells(states)
+        slots = self._slots(cells)
+        keys = self.keys
+        rows = np.full(len(cells), -1, dtype=np.int64)
+        pending = np.ones(len(cells), dtype=bool)
+
+        for _ in range(self.max_probe + 1):
+            current = keys[slots]
+            hit = pending & (current == cells)
+            rows[hit] = slots[hit]
+            pending &= ~hit & (current != EMPTY_KEY)
+            if not pending.any():
+                break
+            slots = np.where(pending, (slots + 1) & np.int64(self.mask), slots)
+
+        found = rows >= 0
+        values = np.full((len(cells), self.n_actions), np.nan, dtype=np.float32)
+        values[found] = self.q_values[rows[found]]
+        return values, found
+
+    def reserve(self, count):
+        """Grow the hash table so `count` cells fit at <= 50 % load."""
+        capacity = len(self.table)
+        while capacity < 2 * count:
+            capacity *= 2
+        if capacity == len(self.table):
+            return
+
+        old_table = self.table[self.keys != EMPTY_KEY]
+        self._index_table(self.empty_table(capacity, self.n_actions))
+        self.size, self.max_probe = 0, 0
+        for entry in old_table:
+            self.set_cell(int(entry["key"]), entry["q"])
+
+    def set_cell(self, cell, values):
+        """Insert or overwrite the Q-values of one grid cell."""
+        if 2 * (self.size + 1) > len(self.table):
+            self.reserve(self.size + 1)
+
+        slot, probes = self._find_slot(cell)
+        if self.keys[slot] == EMPTY_KEY:
+            self.keys[slot] = cell
+            self.size += 1
+        self.q_values[slot] = values
+        self.max_probe = max(self.max_probe, probes)
+
+    def set(self, state, values):
+        """Insert or overwrite the Q-values of the cell a state falls into."""
+        self.set_cell(self.cell(state), values)
+
+    def save(self, path):
+        """Write the table to `path` (.npy) and the grid metadata to the matching .json."""
+        # Replaced, never rewritten in place: running services may have the old table mapped
+        save_array(path, self.table)
+        self.save_metadata(metadata_path(path))
+        print(f"✅ Q-grid saved at {path} ({self.size} cells, {self.table.nbytes / 1e6:.1f} MB)")
+
+    def save_metadata(self, path):
+        """Write the grid metadata (.json) that `load` needs to interpret the table."""
+        metadata = {
+            "grid": self.grid,
+            "n_actions": self.n_actions,
+            "size": self.size,
+            "max_probe": self.max_probe,
+        }
+        save_json(path, metadata)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Load a saved grid, memory-mapping the table by default."""
+        with open(metadata_path(path), "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+        table = np.load(path, mmap_mode=mmap_mode)
+        return cls(table, metadata["grid"], metadata["n_actions"], metadata["size"], metadata["max_probe"])
+
+
+def metadata_path(path):
+    """Path of the grid metadata stored next to a `.npy` table."""
+    return os.path.splitext(path)[0] + ".json"
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.simulator import DEFAULT_DYNAMICS, DEVICES
+from config.settings import ROOM_MODEL_PATH, MODEL_DIR, CSV_FILE, CONTROL_INTERVAL, LEAF_TEMP_OFFSET
+
+# Inputs of the linear response: the room's air temperature and humidity, the device
+# states and the exhaust's pull towards ambient (which grows with the difference)
+FEATURES = ["bias", "air_temp", "humidity", *DEVICES, "exhaust_air_temp", "exhaust_humidity"]
+OUTPUTS = ["air_temp", "humidity"]
+
+
+def room_features(air_temp, humidity, devices):
+    """(..., len(FEATURES)) inputs for air temperatures, humidities and (..., 3) device states."""
+    air_temp = np.asarray(air_temp, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+    devices = np.asarray(devices, dtype=np.float64)
+    exhaust = devices[..., 0]
+    return np.stack([
+        np.ones_like(air_temp), air_temp, humidity,
+        exhaust, devices[..., 1], devices[..., 2],
+        exhaust * air_temp, exhaust * humidity,
+    ], axis=-1)
+
+
+class RoomModel:
+    """
+    Linear response of one room: the rate of change (per second) of air temperature
+    and humidity is `room_features(...) @ coefficients`.
+
+    Leaf temperature follows the air at a fixed offset. The defaults linearise the
+    simulator's dynamics; `fit_room_model` estimates the coefficients from the log.
+    """
+
+    def __init__(self, coefficients, leaf_offset=LEAF_TEMP_OFFSET, metrics=None):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64).reshape(len(FEATURES), len(OUTPUTS))
+        self.leaf_offset = float(leaf_offset)
+        self.metrics = metrics or {}
+
+    @classmethod
+    def from_dynamics(cls, dynamics=None, vpd_leaf=1.0):
+        """The simulator's room (`DEFAULT_DYNAMICS`) with transpiration taken at `vpd_leaf` kPa."""
+        d = {**DEFAULT_DYNAMICS, **(dynamics or {})}
+        coefficients = np.zeros((len(FEATURES), len(OUTPUTS)))
+        temp, humidity = coefficients[:, 0], coefficients[:, 1]
+
+        temp[FEATURES.index("bias")] = d["passive_exchange"] * d["ambient_temp"] + d["light_heat"]
+        temp[FEATURES.index("air_temp")] = -d["passive_exchange"]
+        temp[FEATURES.index("exhaust")] = d["exhaust_exchange"] * d["ambient_temp"]
+        temp[FEATURES.index("exhaust_air_temp")] = -d["exhaust_exchange"]
+        temp[FEATURES.index("dehumidifier")] = d["dehumidifier_heat"]
+
+        humidity[FEATURES.index("bias")] = d["passive_exchange"] * d["ambient_humidity"] + d["transpiration"] * vpd_leaf
+        humidity[FEATURES.index("humidity")] = -d["passive_exchange"]
+        humidity[FEATURES.index("exhaust")] = d["exhaust_exchange"] * d["ambient_humidity"]
+        humidity[FEATURES.index("exhaust_humidity")] = -d["exhaust_exchange"]
+        humidity[FEATURES.index("humidifier")] = d["humidifier_rate"]
+        humidity[FEATURES.index("dehumidifier")] = -d["dehumidifier_rate"]
+        return cls(coefficients, LEAF_TEMP_OFFSET, {"source": "simulator dynamics"})
+
+    def rates(self, air_temp, humidity, devices):
+        """(°C/s, %/s) for every given air temperature, humidity and (..., 3) device states."""
+        rates = room_features(air_temp, humidity, devices) @ self.coefficients
+        return rates[..., 0], rates[..., 1]
+
+    def step(self, air_temp, humidity, devices, seconds):
+        """Air temperature and humidity `seconds` later with `devices` held."""
+        temp_rate, humidity_rate = self.rates(air_temp, humidity, devices)
+        return air_temp + temp_rate * seconds, np.clip(humidity + humidity_rate * seconds, 0, 100)
+
+    def save(self, path=ROOM_MODEL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        model = {
+            "features": FEATURES,
+            "outputs": OUTPUTS,
+            "coefficients": self.coefficients.tolist(),
+            "leaf_offset": self.leaf_offset,
+            "metrics": self.metrics,
+        }
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(model, file, indent=4)
+
+    @classmethod
+    def load(cls, path=ROOM_MODEL_PATH):
+        with open(path, "r", encoding="utf-8") as file:
+            model = json.load(file)
+        if model.get("features") != FEATURES:
+            raise ValueError(f"❌ Room model at {path} was fitted on {model.get('features')}, expected {FEATURES}.")
+        return cls(model["coefficients"], model["leaf_offset"], model.get("metrics"))
+
+
+def fit_room_model(timestamps, air_temp, leaf_temp, humidity, devices, max_gap=4 * CONTROL_INTERVAL,
+                   prior=None, prior_weight=1.0):
+    """
+    Least-squares fit of the per-second response from consecutive log rows.
+
+    The devices logged with a reading are the ones that ran until the next reading.
+    Pairs across a gap longer than `max_gap` seconds or with missing values are
+    dropped. The fit is shrunk towards `prior` (default: the simulator's room) with
+    `prior_weight` pseudo-observations per input, so a device that never ran keeps
+    the prior's response instead of none.
+    """
+    timestamps, air_temp, leaf_temp, humidity = (
+        np.asarray(values, dtype=np.float64) for values in (timestamps, air_temp, leaf_temp, humidity)
+    )
+    devices = np.asarray(devices, dtype=np.float64)
+    prior = prior or RoomModel.from_dynamics()
+
+    values = np.column_stack([air_temp, humidity])
+    gaps = np.diff(timestamps)
+    keep = (gaps > 0) & (gaps <= max_gap)
+    keep &= np.isfinite(values[:-1]).all(axis=1) & np.isfinite(values[1:]).all(axis=1) & np.isfinite(devices[:-1]).all(axis=1)
+
+    X = room_features(air_temp[:-1][keep], humidity[:-1][keep], devices[:-1][keep])
+    y = np.diff(values, axis=0)[keep] / gaps[keep, None]
+    offsets = (air_temp - leaf_temp)[np.isfinite(air_temp - leaf_temp)]
+    leaf_offset = float(np.median(offsets)) if len(offsets) else LEAF_TEMP_OFFSET
+
+    if len(X) < 2 * len(FEATURES):
+        print(f"⚠️ Only {len(X)} usable transitions, keeping the prior room model.")
+        return RoomModel(prior.coefficients, leaf_offset, {**prior.metrics, "transitions": len(X)})
+
+    penalty = np.diag(prior_weight * np.maximum((X ** 2).mean(axis=0), 1.0))
+    coefficients = np.linalg.solve(X.T @ X + penalty, X.T @ y + penalty @ prior.coefficients)
+
+    # Error of one logged tick ahead, in °C and %
+    residuals = (X @ coefficients - y) * gaps[keep, None]
+    metrics = {
+        "source": "fitted",
+        "transitions": len(X),
+        "rmse_air_temp": round(float(np.sqrt((residuals[:, 0] ** 2).mean())), 4),
+        "rmse_humidity": round(float(np.sqrt((residuals[:, 1] ** 2).mean())), 4),
+        "device_ticks": {device: int(X[:, FEATURES.index(device)].sum()) for device in DEVICES},
+    }
+    return RoomModel(coefficients, leaf_offset, metrics)
+
+
+def train_room_model(data, max_gap=4 * CONTROL_INTERVAL, prior_weight=1.0):
+    """
+    Fit the room model on a training frame and save it.
+
+    Returns the hyperparameters, fit metrics and the artifact paths that were written.
+    """
+    model = fit_room_model(
+        data["Timestamp"], data["temperature"], data["leaf_temperature"], data["humidity"],
+        data[DEVICES].to_numpy(dtype=np.float64), max_gap=max_gap, prior_weight=prior_weight
+    )
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    model.save(ROOM_MODEL_PATH)
+    print(f"✅ Room model saved at {ROOM_MODEL_PATH} ({model.metrics.get('transitions', 0)} transitions).")
+
+    return {
+        "hyperparameters": {"max_gap": max_gap, "prior_weight": prior_weight},
+        "metrics": model.metrics,
+        "artifacts": [ROOM_MODEL_PATH],
+    }
+
+
+if __name__ == "__main__":
+    from utils.dataset import load_dataset_frame
+
+    if not os.path.exists(CSV_FILE):
+        print(f"❌ Error: '{CSV_FILE}' not found! Ensure it exists in the root directory.")
+        exit()
+
+    train_room_model(load_dataset_frame(CSV_FILE))
@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from utils.calculate import calculate_vpd_array
+from config.settings import ACTION_MAP, VPD_MODES, MAX_HUMIDITY_LEVELS, MAX_AIR_TEMP, CONTROL_INTERVAL, LEAF_TEMP_OFFSET
+
+DEVICES = ["exhaust", "humidifier", "dehumidifier"]
+
+# Room response per second; rates are first-order pulls towards a set point
+DEFAULT_DYNAMICS = {
+    "ambient_temp": 21.0,          # °C outside the tent
+    "ambient_humidity": 45.0,      # % outside the tent
+    "light_heat": 0.0025,          # °C/s added by the lights
+    "passive_exchange": 0.0004,    # 1/s leak towards ambient
+    "exhaust_exchange": 0.004,     # 1/s extra exchange with the exhaust ON
+    "humidifier_rate": 0.03,       # %/s with the humidifier ON
+    "dehumidifier_rate": 0.02,     # %/s with the dehumidifier ON
+    "dehumidifier_heat": 0.0008,   # °C/s from the dehumidifier compressor
+    "transpiration": 0.004,        # %/s per kPa of leaf VPD
+    "temp_noise": 0.02,            # °C per sqrt(tick)
+    "humidity_noise": 0.2,         # % per sqrt(tick)
+}
+
+
+class GrowRoomSim:
+    """
+    Vectorized grow-room simulator: `n_envs` independent rooms stepped as NumPy arrays.
+
+    Air temperature and humidity relax towards ambient through leaks and the exhaust,
+    the humidifier and dehumidifier move humidity, and plants transpire in proportion
+    to leaf VPD. VPD uses the same `calculate_vpd` math as the controller, and
+    observations are (humidity, leaf_temp, air_temp, vpd_air, vpd_leaf) like the
+    Q-table states.
+    """
+
+    def __init__(self, n_envs, grow_stage="flowering", dt=CONTROL_INTERVAL, dynamics=None, seed=None):
+        self.n_envs = n_envs
+        self.grow_stage = grow_stage
+        self.dt = dt
+        self.dynamics = {**DEFAULT_DYNAMICS, **(dynamics or {})}
+        self.rng = np.random.default_rng(seed)
+
+        self.vpd_min, self.vpd_max = VPD_MODES[grow_stage]
+        self.max_humidity = MAX_HUMIDITY_LEVELS[grow_stage]
+
+        # Action id -> (device column, target state) for fancy-indexed updates
+        self.action_device = np.array([DEVICES.index(next(iter(a))) for a in ACTION_MAP.values()])
+        self.action_state = np.array([next(iter(a.values())) for a in ACTION_MAP.values()])
+        self.reset()
+
+    def reset(self, air_temp=None, humidity=None):
+        """Start every room from the given (or randomised) conditions with all devices OFF."""
+        self.air_temp = np.asarray(air_temp if air_temp is not None else self.rng.uniform(20, 28, self.n_envs), dtype=np.float64)
+        self.humidity = np.asarray(humidity if humidity is not None else self.rng.uniform(35, 70, self.n_envs), dtype=np.float64)
+        self.air_temp = np.broadcast_to(self.air_temp, (self.n_envs,)).copy()
+        self.humidity = np.broadcast_to(self.humidity, (self.n_envs,)).copy()
+        self.devices = np.zeros((self.n_envs, len(DEVICES)), dtype=bool)
+        self.ticks = 0
+        return self.observe()
+
+    def observe(self):
+        """Current (N, 5) observations rounded like the sensor readings."""
+        air_temp = np.round(self.air_temp, 1)
+        leaf_temp = np.round(np.maximum(air_temp - LEAF_TEMP_OFFSET, 0), 1)
+        humidity = np.round(self.humidity, 1)
+        vpd_air, vpd_leaf = calculate_vpd_array(air_temp, leaf_temp, humidity, decimals=2)
+        return np.column_stack([humidity, leaf_temp, air_temp, vpd_air, vpd_leaf])
+
+    def apply_actions(self, actions):
+        """Apply one ACTION_MAP action per room (switch a single device ON or OFF)."""
+        actions = np.asarray(actions)
+        self.devices[np.arange(self.n_envs), self.action_device[actions]] = self.action_state[actions]
+
+    def step(self, actions=None, device_states=None):
+        """
+        Advance every room by `dt` seconds.
+
+        Pass either ACTION_MAP `actions` (one per room) or a full (N, 3) bool array of
+        `device_states`. Returns the next observations and rewards.
+        """
+        if device_states is not None:
+            self.devices = np.asarray(device_states, dtype=bool).reshape(self.n_envs, len(DEVICES)).copy()
+        elif actions is not None:
+            self.apply_actions(actions)
+
+        d = self.dynamics
+        exhaust, humidifier, dehumidifier = self.devices.T
+        exchange = d["passive_exchange"] + d["exhaust_exchange"] * exhaust
+        pull = 1 - np.exp(-exchange * self.dt)
+
+        leaf_temp = np.maximum(self.air_temp - LEAF_TEMP_OFFSET, 0)
+        _, vpd_leaf = calculate_vpd_array(self.air_temp, leaf_temp, self.humidity)
+
+        self.air_temp += pull * (d["ambient_temp"] - self.air_temp)
+        self.air_temp += (d["light_heat"] + d["dehumidifier_heat"] * dehumidifier) * self.dt
+        self.humidity += pull * (d["ambient_humidity"] - self.humidity)
+        self.humidity += (
+            d["humidifier_rate"] * humidifier
+            - d["dehumidifier_rate"] * dehumidifier
+            + d["transpiration"] * np.maximum(vpd_leaf, 0)
+        ) * self.dt
+
+        noise_scale = np.sqrt(self.dt / CONTROL_INTERVAL)
+        self.air_temp += self.rng.normal(0, d["temp_noise"] * noise_scale, self.n_envs)
+        self.humidity += self.rng.normal(0, d["humidity_noise"] * noise_scale, self.n_envs)
+        self.humidity = np.clip(self.humidity, 0, 100)
+        self.ticks += 1
+
+        observations = self.observe()
+        return observations, self.reward(observations)
+
+    def reward(self, observations):
+        """Negative distance of leaf VPD from the stage band, with humidity and heat penalties."""
+        humidity, _, air_temp, _, vpd_leaf = observations.T
+        band_error = np.maximum(self.vpd_min - vpd_leaf, 0) + np.maximum(vpd_leaf - self.vpd_max, 0)
+        humidity_excess = np.maximum(humidity - self.max_humidity, 0)
+        heat_excess = np.maximum(air_temp - MAX_AIR_TEMP, 0)
+        return -(band_error + 0.05 * humidity_excess + 0.1 * heat_excess)
+
+    def rollout(self, policy, ticks):
+        """
+        Run `policy(observations) -> actions` for `ticks` steps in every room.
+
+        Returns per-room total reward, time-in-band share, and simulated ticks per second.
+        """
+        observations = self.observe()
+        total_reward = np.zeros(self.n_envs)
+        in_band = np.zeros(self.n_envs)
+        start = time.perf_counter()
+
+        for _ in range(ticks):
+            observations, rewards = self.step(policy(observations))
+            total_reward += rewards
+            in_band += (observations[:, 4] >= self.vpd_min) & (observations[:, 4] <= self.vpd_max)
+
+        elapsed = time.perf_counter() - start
+        return {
+            "total_reward": total_reward,
+            "time_in_band": in_band / ticks,
+            "ticks_per_second": self.n_envs * ticks / elapsed if elapsed else float("inf"),
+        }
+
+
+def rule_policy(grow_stage):
+    """Vectorized version of the rule-based fallback in `choose_best_action`."""
+    max_humidity = MAX_HUMIDITY_LEVELS.get(grow_stage, 50)
+    min_humidity = max_humidity - 5
+    vpd_min, vpd_max = VPD_MODES.get(grow_stage, (1.2, 1.6))
+
+    def policy(observations):
+        humidity, _, air_temp, _, vpd_leaf = observations.T
+        exhaust = (air_temp > MAX_AIR_TEMP) | (vpd_leaf > vpd_max) | (humidity > max_humidity)
+        humidifier = humidity < min_humidity
+        dehumidifier = humidity > max_humidity
+
+        # Same priority as matching `actions` against ACTION_MAP in choose_best_action
+        actions = np.full(len(observations), 1)
+        actions[exhaust & ~humidifier & ~dehumidifier] = 0
+        actions[~exhaust & humidifier] = 2
+        return actions
+
+    return policy
+
+
+def q_table_policy(Q_table, grow_stage):
+    """
+    Batched policy over a `QGrid`: greedy action where the cell was visited, the
+    rule-based fallback everywhere else.
+    """
+    from utils.state_encoder import encode_states
+
+    fallback = rule_policy(grow_stage)
+
+    def policy(observations):
+        states = encode_states(observations)
+        q_values, found = Q_table.lookup_batch(states)
+        actions = fallback(states)
+        if found.any():
+            actions[found] = np.argmax(q_values[found], axis=1)
+        return actions
+
+    return policy
+
+
+def scalar_policy(choose_best_action, Q_table, state_tree, known_states, grow_stage, tolerance=1.0):
+    """Wrap the controller's scalar `choose_best_action` so it can drive the simulator."""
+    from utils.state_encoder import encode_states
+
+    def policy(observations):
+        return np.array([
+            choose_best_action(tuple(state), Q_table, state_tree, known_states, grow_stage, tolerance)
+            for state in encode_states(observations)
+        ])
+
+    return policy
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stress-test the rule-based policy on simulated grow rooms.")
+    parser.add_argument("--envs", type=int, default=10000)
+    parser.add_argument("--ticks", type=int, default=2880, help="Ticks per room (2880 = one day at 30 s).")
+    parser.add_argument("--grow-stage", default="flowering", choices=list(VPD_MODES))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    sim = GrowRoomSim(args.envs, args.grow_stage, seed=args.seed)
+    result = sim.rollout(rule_policy(args.grow_stage), args.ticks)
+    print(f"✅ {args.envs} rooms x {args.ticks} ticks: mean reward {result['total_reward'].mean():.2f}, "
+          f"time in band {result['time_in_band'].mean():.1%}, "
+          f"{result['ticks_per_second'] * 60 / 1e6:.1f}M ticks/min")
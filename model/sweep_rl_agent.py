@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import MODEL_DIR, CSV_FILE, ACTION_MAP, VPD_MODES, MAX_HUMIDITY_LEVELS, CONTROL_INTERVAL, STATE_RESOLUTION
+from model.train_rl_agent import (
+    STATE_FEATURES, DEVICE_COLUMNS, load_dataset, preprocess_data, build_transitions_from_arrays,
+    select_transitions, shape_rewards, train_q_learning_vectorized, save_model
+)
+
+SWEEP_REPORT_PATH = os.path.join(MODEL_DIR, "sweep_report.json")
+SWEEP_BEST_PATH = os.path.join(MODEL_DIR, "q_learning_sweep_best.pkl")
+
+# Training hyperparameters only: training has no exploration, so the epsilon of the
+# evaluated policy and the evaluation discount are fixed sweep settings instead
+DEFAULT_GRID = {
+    "alpha": [0.05, 0.1, 0.2],
+    "gamma": [0.8, 0.9, 0.95],
+    "resolution_scale": [1, 2],
+}
+
+# Arrays attached from shared memory in each worker process
+_shared = {}
+
+
+def share_arrays(arrays):
+    """Copy arrays into shared memory blocks once; returns the blocks and specs to attach them."""
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def attach_arrays(specs):
+    """Worker initializer: map the shared blocks as read-only arrays without copying."""
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+        array.flags.writeable = False
+        _shared[name] = array
+        _shared[f"_{name}_block"] = block
+
+
+def split_segments(n_rows, segment_length, holdout_fraction):
+    """Cut the log into fixed-length segments and mark every k-th one as held out."""
+    segment_ids = np.arange(n_rows) // segment_length
+    every = max(int(round(1 / holdout_fraction)), 2)
+    return segment_ids, (segment_ids % every) == every - 1
+
+
+def logged_rewards(states, target_vpd, max_humidity):
+    """
+    Reward of the transition starting at every log row, from the raw next reading.
+
+    Computed once before encoding, so candidates with different state resolutions are
+    trained and scored against the same rewards.
+    """
+    return shape_rewards({"next_states": np.asarray(states, dtype=np.float64)[1:]}, target_vpd, max_humidity)
+
+
+def behaviour_policy(transitions, n_actions):
+    """Smoothed empirical probability of each logged action, per encoded state."""
+    _, state_ids = np.unique(transitions["states"], axis=0, return_inverse=True)
+    state_ids = state_ids.reshape(-1)
+    counts = np.zeros((state_ids.max() + 1, n_actions))
+    np.add.at(counts, (state_ids, transitions["actions"]), 1)
+    probabilities = (counts + 1) / (counts.sum(axis=1, keepdims=True) + n_actions)
+    return probabilities[state_ids, transitions["actions"]]
+
+
+def target_policy(Q_table, states, actions, epsilon, n_actions):
+    """
+    Probability that an epsilon-greedy policy over `Q_table` takes the logged actions.
+
+    States missing from the table are treated as uniform random, which is what
+    the policy can promise without its rule-based fallback.
+    """
+    probabilities = np.full(len(actions), 1.0 / n_actions)
+    found = np.zeros(len(actions), dtype=bool)
+    for i, (state, action) in enumerate(zip(map(tuple, states.tolist()), actions)):
+        q_values = Q_table.get(state)
+        if q_values is not None:
+            found[i] = True
+            greedy = int(np.argmax(q_values))
+            probabilities[i] = epsilon / n_actions + (1 - epsilon) * (action == greedy)
+    return probabilities, found
+
+
+def evaluate_policy(Q_table, eval_transitions, rewards, behaviour, segment_ids, epsilon, gamma):
+    """
+    Per-decision weighted importance sampling estimate of the policy value on held-out segments.
+
+    Returns the estimated discounted return per segment start, the same quantity for
+    the logged (behaviour) policy, and the share of held-out states the table covers.
+    Pass the same `gamma` for every candidate: rewards are negative, so a smaller
+    discount alone would make a policy look better.
+    """
+    n_actions = len(ACTION_MAP)
+    target, found = target_policy(Q_table, eval_transitions["states"], eval_transitions["actions"], epsilon, n_actions)
+    ratios = target / behaviour
+
+    # Step index of every transition inside its segment and the cumulative importance weight
+    _, segment_start, segment_index = np.unique(segment_ids, return_index=True, return_inverse=True)
+    steps = np.arange(len(segment_ids)) - segment_start[segment_index]
+    log_ratio = np.cumsum(np.log(ratios))
+    log_weights = log_ratio - (log_ratio - np.log(ratios))[segment_start][segment_index]
+
+    # Normalise per step before exponentiating so long segments cannot overflow
+    step_max = np.full(steps.max() + 1, -np.inf)
+    np.maximum.at(step_max, steps, log_weights)
+    weights = np.exp(log_weights - step_max[steps])
+
+    numerator = np.bincount(steps, weights=weights * rewards)
+    denominator = np.bincount(steps, weights=weights)
+    step_counts = np.bincount(steps)
+    discounts = gamma ** np.arange(len(numerator))
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        policy_value = np.nansum(discounts * numerator / denominator)
+    behaviour_value = float(np.sum(discounts * np.bincount(steps, weights=rewards) / step_counts))
+    return float(policy_value), behaviour_value, float(found.mean()) if len(found) else 0.0
+
+
+def run_candidate(params, settings):
+    """Train and score one hyperparameter combination against the shared data."""
+    start = time.perf_counter()
+    resolution = tuple(step * params["resolution_scale"] for step in STATE_RESOLUTION)
+
+    transitions = build_transitions_from_arrays(
+        _shared["states"], _shared["devices"], _shared["timestamps"], settings["max_gap"], resolution
+    )
+    transitions["rewards"] = _shared["rewards"][transitions["index"]]
+    transition_segments = _shared["segment_ids"][transitions["index"]]
+    holdout = _shared["holdout"][transitions["index"]]
+    train_transitions = select_transitions(transitions, ~holdout)
+    eval_transitions = select_transitions(transitions, holdout)
+    if not holdout.any():
+        return {**params, "skipped": "no held-out transitions, use a longer log or a smaller --segment-length",
+                "seconds": time.perf_counter() - start}
+
+    reward_fn = lambda t: t["rewards"]
+    Q_table, _ = train_q_learning_vectorized(
+        train_transitions, alpha=params["alpha"], gamma=params["gamma"],
+        epochs=settings["epochs"], lr_decay=settings["lr_decay"], reward_fn=reward_fn, verbose=False
+    )
+
+    behaviour = behaviour_policy(transitions, len(ACTION_MAP))[holdout]
+    policy_value, behaviour_value, coverage = evaluate_policy(
+        Q_table, eval_transitions, eval_transitions["rewards"], behaviour,
+        transition_segments[holdout], settings["eval_epsilon"], settings["eval_gamma"]
+    )
+
+    return {
+        **params,
+        "ope_value": policy_value,
+        "behaviour_value": behaviour_value,
+        "coverage": coverage,
+        "states": len(Q_table),
+        "train_transitions": len(train_transitions["actions"]),
+        "eval_transitions": len(eval_transitions["actions"]),
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def sweep(data, grid, settings, workers=None):
+    """
+    Run every combination of `grid` in parallel worker processes and rank them by OPE value.
+    Candidates without held-out transitions are reported and left out of the ranking.
+    """
+    segment_ids, holdout = split_segments(len(data), settings["segment_length"], settings["holdout_fraction"])
+    states = data[STATE_FEATURES].to_numpy(dtype=np.float64)
+    arrays = {
+        "states": states,
+        "rewards": logged_rewards(states, settings["target_vpd"], settings["max_humidity"]),
+        "devices": data[DEVICE_COLUMNS].fillna(False).to_numpy().astype(bool),
+        "timestamps": data["Timestamp"].to_numpy(dtype=np.float64) if "Timestamp" in data.columns
+        else np.arange(len(data), dtype=np.float64) * CONTROL_INTERVAL,
+        "segment_ids": segment_ids,
+        "holdout": holdout,
+    }
+    candidates = [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+    workers = workers or os.cpu_count()
+    print(f"🚀 Sweeping {len(candidates)} candidates on {workers} workers ({len(data)} rows shared)...")
+
+    blocks, specs = share_arrays(arrays)
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=attach_arrays, initargs=(specs,)) as executor:
+            futures = [executor.submit(run_candidate, params, settings) for params in candidates]
+            for future in as_completed(futures):
+                result = future.result()
+                if "skipped" in result:
+                    print(f"   ⚠️ alpha={result['alpha']} gamma={result['gamma']} "
+                          f"scale={result['resolution_scale']}: skipped, {result['skipped']}")
+                    continue
+                results.append(result)
+                print(f"   ✅ alpha={result['alpha']} gamma={result['gamma']} "
+                      f"scale={result['resolution_scale']}: OPE={result['ope_value']:.4f} "
+                      f"({result['seconds']:.1f}s)")
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    return sorted(results, key=lambda result: result["ope_value"], reverse=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel hyperparameter sweep with offline policy evaluation.")
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--grid", help="JSON file overriding the parameter grid.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: every core).")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--lr-decay", type=float, default=0.98)
+    parser.add_argument("--grow-stage", default="flowering", choices=list(VPD_MODES))
+    parser.add_argument("--segment-length", type=int, default=120, help="Rows per evaluation segment.")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of segments held out.")
+    parser.add_argument("--eval-gamma", type=float, default=0.9, help="Discount of the policy score, the same for every candidate.")
+    parser.add_argument("--eval-epsilon", type=float, default=0.1, help="Exploration of the evaluated epsilon-greedy policy.")
+    args = parser.parse_args()
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid, "r", encoding="utf-8") as file:
+            grid = {**DEFAULT_GRID, **json.load(file)}
+        if grid.pop("epsilon", None) is not None:
+            print("⚠️ epsilon does not change training, scoring with --eval-epsilon instead.")
+
+    vpd_min, vpd_max = VPD_MODES[args.grow_stage]
+    settings = {
+        "epochs": args.epochs,
+        "lr_decay": args.lr_decay,
+        "target_vpd": (vpd_min + vpd_max) / 2,
+        "max_humidity": MAX_HUMIDITY_LEVELS[args.grow_stage],
+        "max_gap": 4 * CONTROL_INTERVAL,
+        "segment_length": args.segment_length,
+        "holdout_fraction": args.holdout,
+        "eval_gamma": args.eval_gamma,
+        "eval_epsilon": args.eval_epsilon,
+    }
+
+    data = preprocess_data(load_dataset(args.csv))
+    start = time.perf_counter()
+    ranking = sweep(data, grid, settings, args.workers)
+    elapsed = time.perf_counter() - start
+    if not ranking:
+        print("❌ No candidate could be scored, the held-out segments have no transitions.")
+        exit(1)
+
+    with open(SWEEP_REPORT_PATH, "w", encoding="utf-8") as file:
+        json.dump({"settings": settings, "seconds": elapsed, "ranking": ranking}, file, indent=4)
+
+    print(f"\n📊 Sweep finished in {elapsed:.1f}s, report saved at {SWEEP_REPORT_PATH}")
+    for rank, result in enumerate(ranking[:10], start=1):
+        print(f"   {rank:2d}. OPE={result['ope_value']:.4f} (logged {result['behaviour_value']:.4f}, "
+              f"coverage {result['coverage']:.0%}) alpha={result['alpha']} gamma={result['gamma']} "
+              f"scale={result['resolution_scale']}")
+
+    # Retrain the winner on all data and store it as the sweep artifact
+    best = ranking[0]
+    resolution = tuple(step * best["resolution_scale"] for step in STATE_RESOLUTION)
+    states = data[STATE_FEATURES].to_numpy(dtype=np.float64)
+    transitions = build_transitions_from_arrays(
+        states, data[DEVICE_COLUMNS].fillna(False).to_numpy().astype(bool),
+        data["Timestamp"].to_numpy(dtype=np.float64) if "Timestamp" in data.columns else None,
+        settings["max_gap"], resolution
+    )
+    transitions["rewards"] = logged_rewards(states, settings["target_vpd"], settings["max_humidity"])[transitions["index"]]
+    Q_table, _ = train_q_learning_vectorized(
+        transitions, alpha=best["alpha"], gamma=best["gamma"], epochs=settings["epochs"],
+        lr_decay=settings["lr_decay"], reward_fn=lambda t: t["rewards"], verbose=False
+    )
+    save_model(Q_table, SWEEP_BEST_PATH)
+    if best["resolution_scale"] != 1:
+        print(f"⚠️ Best table uses STATE_RESOLUTION={resolution}; update settings before serving it.")
@@ -1,32 +1,65 @@
 import os
 import sys
-import pandas as pd
 import joblib
+import numpy as np
 from sklearn.ensemble import IsolationForest
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config.settings import COLUMN_MAPPING
+from config.settings import CSV_FILE, MODEL_DIR, ANOMALY_MODEL_PATH, ANOMALY_FOREST_PATH
+from model.compiled_forest import CompiledIsolationForest, remove_forest
+from utils.dataset import load_dataset_frame
 
+FEATURES = ["temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf", "exhaust", "humidifier", "dehumidifier"]
 
-csv_file = "vpd_log.csv"
-if not os.path.exists(csv_file):
-    print(f"❌ Error: '{csv_file}' not found! Ensure it exists in the root directory.")
-    exit()
 
-data = pd.read_csv(csv_file)
-print("✅ Dataset loaded successfully!")
+def train_anomaly_detector(data, contamination=0.05, random_state=42):
+    """
+    Fit the IsolationForest, save it and its compiled copy.
 
-data.rename(columns=COLUMN_MAPPING, inplace=True)
+    Returns the hyperparameters and the artifact paths that were written.
+    """
+    data = data[FEATURES].fillna(0)
+    data.columns = data.columns.astype(str)
 
-features = ["temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf", "exhaust", "humidifier", "dehumidifier"]
-data = data[features].fillna(0)
+    anomaly_detector = IsolationForest(contamination=contamination, random_state=random_state)
+    anomaly_detector.fit(data)
 
-data.columns = data.columns.astype(str)
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(anomaly_detector, ANOMALY_MODEL_PATH)
+    print("✅ Anomaly Detection Model saved successfully!")
+    artifacts = [ANOMALY_MODEL_PATH]
 
-anomaly_detector = IsolationForest(contamination=0.05, random_state=42)
-anomaly_detector.fit(data)
+    # Export an array-based copy for the controller's in-process anomaly checks
+    compiled = CompiledIsolationForest.from_estimator(anomaly_detector)
+    sample = data.sample(min(len(data), 10000), random_state=random_state)
+    if np.allclose(compiled.decision_function(sample.to_numpy(dtype=np.float64)), anomaly_detector.decision_function(sample)):
+        compiled.save(ANOMALY_FOREST_PATH)
+        artifacts.append(ANOMALY_FOREST_PATH)
+        print("✅ Compiled anomaly forest exported successfully!")
+    else:
+        # A forest exported by an earlier run no longer matches the new model
+        remove_forest(ANOMALY_FOREST_PATH)
+        print("⚠️ Warning: Compiled anomaly forest disagrees with sklearn, not exporting it.")
 
-os.makedirs("model", exist_ok=True)
-joblib.dump(anomaly_detector, "model/anomaly_detector.pkl")
-print("✅ Anomaly Detection Model saved successfully!")
+    return {
+        "hyperparameters": {"contamination": contamination, "random_state": random_state},
+        "artifacts": artifacts,
+    }
+
+
+if __name__ == "__main__":
+    if "--tier" in sys.argv:
+        from utils.history import load_rollup_frame
+        tier = sys.argv[sys.argv.index("--tier") + 1]
+        data = load_rollup_frame(tier)
+        print(f"✅ Loaded {len(data)} rows from the '{tier}' rollup tier.")
+    else:
+        if not os.path.exists(CSV_FILE):
+            print(f"❌ Error: '{CSV_FILE}' not found! Ensure it exists in the root directory.")
+            exit()
+
+        data = load_dataset_frame(CSV_FILE)
+        print("✅ Dataset loaded successfully!")
+
+    train_anomaly_detector(data)
@@ -2,12 +2,19 @@ import os
 import sys
 import numpy as np
 import pandas as pd
+import time
+import argparse
 import joblib
 from collections import defaultdict
-from scipy.spatial import KDTree
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config.settings import Q_TABLE_PATH, MODEL_DIR, CSV_FILE, ACTION_MAP, MAX_AIR_TEMP, MIN_HUMIDITY_LEVELS, MAX_HUMIDITY_LEVELS, VPD_MODES, COLUMN_MAPPING
+from model.q_grid import QGrid, metadata_path
+from utils.dataset import load_dataset_frame
+from utils.state_encoder import STATE_FEATURES, encode_state, encode_states, save_neighbour_index
+from model.policy import build_state_lookup, choose_best_action, transition_reward, infer_logged_actions
+from config.settings import Q_GRID_PATH, Q_INDEX_PATH, Q_GRID_INDEX_PATH, Q_TABLE_PATH, MODEL_DIR, CSV_FILE, ACTION_MAP, MIN_HUMIDITY_LEVELS, MAX_HUMIDITY_LEVELS, VPD_MODES, COLUMN_MAPPING, CONTROL_INTERVAL
+
+DEVICE_COLUMNS = ["exhaust", "humidifier", "dehumidifier"]
 
 
 def ensure_directories():
@@ -21,7 +28,7 @@ def load_dataset(csv_file):
         print(f"❌ Error: '{csv_file}' not found! Please ensure it exists.")
         exit()
 
-    data = pd.read_csv(csv_file)
+    data = load_dataset_frame(csv_file)
     print("✅ Dataset loaded successfully!")
     return data
 
@@ -47,7 +54,7 @@ def train_q_learning(data, alpha=0.1, gamma=0.9, epsilon=0.1):
     Q_table = defaultdict(lambda: np.zeros(len(ACTION_MAP), dtype=np.float32))
 
     for _, row in data.iterrows():
-        state = tuple(float(row[col]) for col in ["humidity", "leaf_temperature", "temperature", "vpd_air", "vpd_leaf"])
+        state = encode_state(*(float(row[col]) for col in STATE_FEATURES))
         action = np.random.choice(len(ACTION_MAP))
         reward = -abs(row["vpd_leaf"] - 1.4)
 
@@ -57,88 +64,198 @@ def train_q_learning(data, alpha=0.1, gamma=0.9, epsilon=0.1):
     return Q_table
 
 
-def save_model(Q_table, path):
-    """Save trained Q-table to file."""
-    Q_table_dict = {state: actions for state, actions in Q_table.items()}
-    joblib.dump(Q_table_dict, path)
-    print(f"✅ Reinforcement Learning Model saved successfully at {path}!")
+def build_transitions(data, max_gap=4 * CONTROL_INTERVAL, resolution=None):
+    """
+    Build (state, action, next_state) arrays from consecutive log rows in one pass.
+
+    States are encoded with the shared state encoder, so the Q-table keys match
+    what the controller looks up. Transitions that span a gap longer than `max_gap`
+    seconds (when the data has a `Timestamp` column) or touch a row with missing
+    readings are dropped.
+    """
+    states = data[STATE_FEATURES].to_numpy(dtype=np.float64)
+    devices = data[DEVICE_COLUMNS].fillna(False).to_numpy().astype(bool)
+    timestamps = data["Timestamp"].to_numpy(dtype=np.float64) if "Timestamp" in data.columns else None
+    return build_transitions_from_arrays(states, devices, timestamps, max_gap, resolution)
+
 
+def build_transitions_from_arrays(states, devices, timestamps=None, max_gap=4 * CONTROL_INTERVAL, resolution=None):
+    """
+    Array version of `build_transitions` for raw (N, 5) states and (N, 3) device states.
+
+    The returned `index` holds the log row each transition starts from.
+    """
+    states = encode_states(states) if resolution is None else encode_states(states, resolution)
+    actions, switched = infer_logged_actions(np.asarray(devices, dtype=bool))
+
+    valid = ~np.isnan(states).any(axis=1)
+    keep = valid[:-1] & valid[1:]
+    if max_gap is not None and timestamps is not None:
+        keep &= np.diff(timestamps) <= max_gap
+
+    return {
+        "states": states[:-1][keep],
+        "actions": actions[keep],
+        "next_states": states[1:][keep],
+        "switched": switched[keep],
+        "index": np.flatnonzero(keep),
+    }
 
-def build_state_lookup(Q_table):
-    """Build a KDTree for fast nearest-neighbor lookup."""
-    if not Q_table:
-        return None, []
 
-    known_states = np.array(list(Q_table.keys()))
-    tree = KDTree(known_states)
-    return tree, known_states
+def select_transitions(transitions, mask):
+    """Return the subset of a transitions dict selected by a bool mask."""
+    return {name: values[mask] for name, values in transitions.items()}
 
 
-def choose_best_action(state, Q_table, state_tree, known_states, grow_stage, tolerance=1.0):
+def shape_rewards(transitions, target_vpd=1.4, max_humidity=None, humidity_weight=0.05, switch_cost=0.0):
     """
-    Choose the best action given the current state and growth stage.
+    Reward each transition by how close the next leaf VPD is to the target.
 
-    - Ensures humidifier and dehumidifier are mutually exclusive.
-    - Adjusts exhaust behavior based on temperature, humidity, and VPD.
+    Optional shaping terms penalise humidity above `max_humidity` (per % over the
+    limit) and every device switch, to discourage flapping.
     """
-    state = tuple(map(float, state))
-
-    if state in Q_table:
-        sorted_actions = np.argsort(Q_table[state])[::-1]
-        best_action = next((a for a in sorted_actions if a in ACTION_MAP), 1)
-        return best_action
-
-    if state_tree is not None:
-        distance, index = state_tree.query(state)
-        if distance < tolerance:
-            closest_state = tuple(known_states[index])
-            sorted_actions = np.argsort(Q_table[closest_state])[::-1]
-            best_action = next((a for a in sorted_actions if a in ACTION_MAP), 1)
-            print(f"⚠️ Warning: Unseen state {state}, using closest match {closest_state} with action {best_action}.")
-            return best_action
-
-    print(f"⚠️ Warning: Completely new state {state}, estimating best action.")
-
-    humidity, leaf_temp, air_temp, vpd_air, vpd_leaf = state
-    max_humidity = MAX_HUMIDITY_LEVELS.get(grow_stage, 50)
-    min_humidity = max_humidity - 5  # Maintain a 5% buffer
-    vpd_min, vpd_max = VPD_MODES.get(grow_stage, (1.2, 1.6))
-
-    actions = {"humidifier": False, "dehumidifier": False, "exhaust": False}
-
-    if air_temp > MAX_AIR_TEMP or vpd_leaf > vpd_max:
-        actions["exhaust"] = True  
-    elif vpd_leaf < vpd_min and grow_stage != "flowering":
-        actions["exhaust"] = False  
-
-    if humidity > max_humidity:
-        actions["humidifier"] = False  
-        actions["dehumidifier"] = True 
-        actions["exhaust"] = True  
-    elif humidity < min_humidity:
-        actions["dehumidifier"] = False  
-        actions["humidifier"] = True  
-    else:
-        actions["humidifier"] = False
-        actions["dehumidifier"] = False 
-        
-    # Prioritize dehumidifier in case of conflict
-    if actions["humidifier"] and actions["dehumidifier"]:
-        actions["humidifier"] = False  
+    next_states = transitions["next_states"]
+    rewards = -np.abs(next_states[:, STATE_FEATURES.index("vpd_leaf")] - target_vpd)
 
-    for action, state_dict in ACTION_MAP.items():
-        if all(actions.get(k, False) == state_dict.get(k, False) for k in actions):
-            return action
+    if max_humidity is not None:
+        excess = np.maximum(next_states[:, STATE_FEATURES.index("humidity")] - max_humidity, 0)
+        rewards -= humidity_weight * excess
 
-    return 1  # Default: Keep exhaust OFF
+    if switch_cost:
+        rewards -= switch_cost * transitions["switched"]
 
+    return rewards.astype(np.float32)
 
-if __name__ == "__main__":
+
+def train_q_learning_vectorized(transitions, alpha=0.1, gamma=0.9, epochs=50, lr_decay=0.98, reward_fn=shape_rewards, verbose=True):
+    """
+    Train a Q-table from logged transitions with batched, multi-epoch updates.
+
+    Every epoch applies the mean temporal-difference error of all transitions that
+    share a (state, action) pair at once, bootstrapping from the logged next state.
+    The learning rate decays as `alpha * lr_decay ** epoch`. Actions never logged
+    in a state are stored as -inf so they are never picked over logged ones.
+
+    Returns:
+    - (dict, list): Q-table keyed by state tuple, and wall time per epoch in seconds.
+    """
+    n_actions = len(ACTION_MAP)
+    n_transitions = len(transitions["actions"])
+    if n_transitions == 0:
+        print("⚠️ Warning: No usable transitions, returning an empty Q-table.")
+        return {}, []
+
+    rewards = reward_fn(transitions)
+    all_states = np.concatenate([transitions["states"], transitions["next_states"]])
+    unique_states, inverse = np.unique(all_states, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    state_ids, next_ids = inverse[:n_transitions], inverse[n_transitions:]
+
+    Q = np.zeros((len(unique_states), n_actions), dtype=np.float32)
+    flat_index = state_ids * n_actions + transitions["actions"]
+    counts = np.bincount(flat_index, minlength=Q.size)
+    visited = (counts > 0).reshape(Q.shape)
+    counts[counts == 0] = 1
+
+    # Only bootstrap from actions that were actually logged in the next state
+    next_visited = visited[next_ids]
+    next_has_actions = next_visited.any(axis=1)
+
+    epoch_times = []
+    for epoch in range(epochs):
+        start = time.perf_counter()
+        learning_rate = alpha * lr_decay ** epoch
+
+        next_values = np.where(next_visited, Q[next_ids], -np.inf).max(axis=1)
+        targets = rewards + gamma * np.where(next_has_actions, next_values, 0.0)
+        td_error = targets - Q[state_ids, transitions["actions"]]
+        mean_td = np.bincount(flat_index, weights=td_error, minlength=Q.size) / counts
+        Q += (learning_rate * mean_td).astype(np.float32).reshape(Q.shape)
+
+        epoch_times.append(time.perf_counter() - start)
+        if verbose:
+            print(f"🔁 Epoch {epoch + 1}/{epochs}: lr={learning_rate:.4f}, "
+                  f"mean |TD|={np.abs(td_error).mean():.5f}, {epoch_times[-1] * 1000:.1f} ms")
+
+    # Actions never logged in a state must not win over ones that were
+    Q[~visited] = -np.inf
+    Q_table = {
+        tuple(state): Q[i] for i, state in enumerate(unique_states.tolist()) if visited[i].any()
+    }
+    return Q_table, epoch_times
+
+
+def save_model(Q_table, path):
+    """Save trained Q-table to file."""
+    Q_table_dict = {state: actions for state, actions in Q_table.items()}
+    joblib.dump(Q_table_dict, path)
+    print(f"✅ Reinforcement Learning Model saved successfully at {path}!")
+
+
+def train_agent(data, max_gap=4 * CONTROL_INTERVAL, epochs=50, alpha=0.1, gamma=0.9, lr_decay=0.98,
+                grow_stage="flowering", switch_cost=0.0):
+    """
+    Train the Q-table on logged transitions and save the table, the Q-grid and the
+    neighbour index.
+
+    Returns the hyperparameters, training stats and the artifact paths that were written.
+    """
     ensure_directories()
-    data = load_dataset(CSV_FILE)
-    data = preprocess_data(data)
 
-    Q_table = train_q_learning(data)
+    vpd_min, vpd_max = VPD_MODES[grow_stage]
+    transitions = build_transitions(data, max_gap=max_gap)
+    print(f"✅ Built {len(transitions['actions'])} transitions.")
+
+    reward_fn = lambda t: shape_rewards(
+        t, target_vpd=(vpd_min + vpd_max) / 2,
+        max_humidity=MAX_HUMIDITY_LEVELS[grow_stage], switch_cost=switch_cost
+    )
+    start = time.perf_counter()
+    Q_table, epoch_times = train_q_learning_vectorized(
+        transitions, alpha=alpha, gamma=gamma, epochs=epochs,
+        lr_decay=lr_decay, reward_fn=reward_fn
+    )
+    print(f"⏱️ Trained {len(Q_table)} states in {time.perf_counter() - start:.2f}s "
+          f"({np.mean(epoch_times) * 1000:.1f} ms/epoch)")
     save_model(Q_table, Q_TABLE_PATH)
+    Q_grid = QGrid.from_q_table(Q_table)
+    Q_grid.save(Q_GRID_PATH)
 
     state_tree, known_states = build_state_lookup(Q_table)
+    save_neighbour_index(state_tree, known_states)
+    # The controller serves the grid, its misses fall back to the nearest visited cell
+    state_tree, known_states = build_state_lookup(Q_grid)
+    save_neighbour_index(state_tree, known_states, Q_GRID_INDEX_PATH)
+
+    return {
+        "hyperparameters": {
+            "epochs": epochs, "alpha": alpha, "gamma": gamma, "lr_decay": lr_decay,
+            "grow_stage": grow_stage, "switch_cost": switch_cost, "max_gap": max_gap,
+        },
+        "metrics": {"transitions": len(transitions["actions"]), "states": len(Q_table)},
+        "artifacts": [Q_TABLE_PATH, Q_GRID_PATH, metadata_path(Q_GRID_PATH), Q_INDEX_PATH, Q_GRID_INDEX_PATH],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the Q-learning agent from logged transitions.")
+    parser.add_argument("--tier", help="Train on a rollup tier (1m, 15m, 1h) instead of the raw CSV log.")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--alpha", type=float, default=0.1)
+    parser.add_argument("--gamma", type=float, default=0.9)
+    parser.add_argument("--lr-decay", type=float, default=0.98)
+    parser.add_argument("--grow-stage", default="flowering", choices=list(VPD_MODES))
+    parser.add_argument("--switch-cost", type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.tier:
+        from utils.history import load_rollup_frame
+        data = load_rollup_frame(args.tier).rename(columns={"timestamp": "Timestamp"})
+        print(f"✅ Loaded {len(data)} rows from the '{args.tier}' rollup tier.")
+        max_gap = 4 * max(CONTROL_INTERVAL, int(args.tier[:-1]) * {"m": 60, "h": 3600}[args.tier[-1]])
+    else:
+        data = load_dataset(CSV_FILE)
+        data = preprocess_data(data)
+        max_gap = 4 * CONTROL_INTERVAL
+
+    train_agent(data, max_gap, args.epochs, args.alpha, args.gamma, args.lr_decay, args.grow_stage, args.switch_cost)
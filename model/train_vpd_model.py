@@ -1,6 +1,5 @@
 import os
 import sys
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -8,67 +7,108 @@ from sklearn.metrics import accuracy_score
 import joblib
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
-from config.settings import COLUMN_MAPPING
-
-try:
-    data = pd.read_csv("vpd_log.csv")
-    print("✅ Dataset loaded successfully!")
-except FileNotFoundError:
-    print("❌ Error: vpd_log.csv not found!")
-    exit()
-
-data.rename(columns=COLUMN_MAPPING, inplace=True)
-
-expected_columns = [
-    "temperature", "leaf_temperature", "humidity",
-    "vpd_air", "vpd_leaf", "exhaust", "humidifier", "dehumidifier"
-]
-
-for col in expected_columns:
-    if col not in data.columns:
-        print(f"⚠️ Warning: Missing column '{col}', filling with default values.")
-        if col in ["exhaust", "humidifier", "dehumidifier"]:
-            data[col] = False  
-        else:
-            data[col] = np.nan 
-            
-data["exhaust"] = data["exhaust"].astype(bool)
-data["humidifier"] = data["humidifier"].astype(bool)
-data["dehumidifier"] = data["dehumidifier"].astype(bool)
-
-print("✅ Dataset processed with all expected columns.")
-
-X = data[["temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf"]]
-y_exhaust = data["exhaust"].astype(int)
-y_humidifier = data["humidifier"].astype(int)
-y_dehumidifier = data["dehumidifier"].astype(int)
-
-X_train, X_test, y_train_ex, y_test_ex = train_test_split(X, y_exhaust, test_size=0.2, random_state=42)
-y_train_hum, y_test_hum = train_test_split(y_humidifier, test_size=0.2, random_state=42)
-y_train_deh, y_test_deh = train_test_split(y_dehumidifier, test_size=0.2, random_state=42)
-
-exhaust_model = RandomForestClassifier(n_estimators=100, random_state=42)
-humidifier_model = RandomForestClassifier(n_estimators=100, random_state=42)
-dehumidifier_model = RandomForestClassifier(n_estimators=100, random_state=42)
-
-exhaust_model.fit(X_train, y_train_ex)
-humidifier_model.fit(X_train, y_train_hum)
-dehumidifier_model.fit(X_train, y_train_deh)
-
-y_pred_ex = exhaust_model.predict(X_test)
-y_pred_hum = humidifier_model.predict(X_test)
-y_pred_deh = dehumidifier_model.predict(X_test)
-
-print("📊 Model Accuracy Scores:")
-print("   ✅ Exhaust Model Accuracy:", accuracy_score(y_test_ex, y_pred_ex))
-print("   ✅ Humidifier Model Accuracy:", accuracy_score(y_test_hum, y_pred_hum))
-print("   ✅ Dehumidifier Model Accuracy:", accuracy_score(y_test_deh, y_pred_deh))
-
-model_dir = "model"
-os.makedirs(model_dir, exist_ok=True)
-
-joblib.dump(exhaust_model, os.path.join(model_dir, "exhaust_model.pkl"))
-joblib.dump(humidifier_model, os.path.join(model_dir, "humidifier_model.pkl"))
-joblib.dump(dehumidifier_model, os.path.join(model_dir, "dehumidifier_model.pkl"))
-
-print("✅ Models saved successfully!")
+from config.settings import (
+    CSV_FILE, MODEL_DIR, EXHAUST_MODEL_PATH, HUMIDIFIER_MODEL_PATH, DEHUMIDIFIER_MODEL_PATH,
+    EXHAUST_FOREST_PATH, HUMIDIFIER_FOREST_PATH, DEHUMIDIFIER_FOREST_PATH
+)
+from model.compiled_forest import CompiledForest, remove_forest
+from utils.dataset import load_dataset_frame
+
+FEATURES = ["temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf"]
+
+# Device -> (sklearn model path, compiled forest path)
+DEVICE_MODELS = {
+    "exhaust": (EXHAUST_MODEL_PATH, EXHAUST_FOREST_PATH),
+    "humidifier": (HUMIDIFIER_MODEL_PATH, HUMIDIFIER_FOREST_PATH),
+    "dehumidifier": (DEHUMIDIFIER_MODEL_PATH, DEHUMIDIFIER_FOREST_PATH),
+}
+
+
+def prepare_data(data):
+    """Fill missing columns and make the device columns boolean."""
+    expected_columns = [
+        "temperature", "leaf_temperature", "humidity",
+        "vpd_air", "vpd_leaf", "exhaust", "humidifier", "dehumidifier"
+    ]
+
+    for col in expected_columns:
+        if col not in data.columns:
+            print(f"⚠️ Warning: Missing column '{col}', filling with default values.")
+            if col in ["exhaust", "humidifier", "dehumidifier"]:
+                data[col] = False
+            else:
+                data[col] = np.nan
+
+    data["exhaust"] = data["exhaust"].astype(bool)
+    data["humidifier"] = data["humidifier"].astype(bool)
+    data["dehumidifier"] = data["dehumidifier"].astype(bool)
+
+    print("✅ Dataset processed with all expected columns.")
+    return data
+
+
+def train_device_model(data, device, n_estimators=100, test_size=0.2, random_state=42):
+    """
+    Fit the forest predicting one device's state, save it and its compiled copy.
+
+    Every device uses the same split (same `random_state` and row count), so the
+    models can be trained separately or in parallel. Returns the hyperparameters,
+    test accuracy and the artifact paths that were written.
+    """
+    model_path, forest_path = DEVICE_MODELS[device]
+    X = data[FEATURES]
+    y = data[device].astype(int)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=random_state)
+
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=random_state)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print(f"   ✅ {device.capitalize()} Model Accuracy:", accuracy)
+
+    os.makedirs(MODEL_DIR, exist_ok=True)
+    joblib.dump(model, model_path)
+    artifacts = [model_path]
+
+    # Export an array-based copy so serving does not need sklearn
+    compiled = CompiledForest.from_estimator(model)
+    if np.array_equal(compiled.predict(X_test), y_pred):
+        compiled.save(forest_path)
+        artifacts.append(forest_path)
+    else:
+        # A forest exported by an earlier run no longer matches the new model
+        remove_forest(forest_path)
+        print(f"⚠️ Warning: Compiled forest at {forest_path} disagrees with sklearn, not exporting it.")
+
+    return {
+        "hyperparameters": {"n_estimators": n_estimators, "test_size": test_size, "random_state": random_state},
+        "metrics": {"accuracy": float(accuracy)},
+        "artifacts": artifacts,
+    }
+
+
+if __name__ == "__main__":
+    if "--tier" in sys.argv:
+        from utils.history import load_rollup_frame
+        tier = sys.argv[sys.argv.index("--tier") + 1]
+        data = load_rollup_frame(tier)
+        print(f"✅ Loaded {len(data)} rows from the '{tier}' rollup tier.")
+
+        # Rollups hold duty cycles, label a bucket ON when the device ran most of it
+        for col in ["exhaust", "humidifier", "dehumidifier"]:
+            data[col] = data[col] >= 0.5
+    else:
+        try:
+            data = load_dataset_frame(CSV_FILE)
+            print("✅ Dataset loaded successfully!")
+        except FileNotFoundError:
+            print(f"❌ Error: {CSV_FILE} not found!")
+            exit()
+
+    data = prepare_data(data)
+
+    print("📊 Model Accuracy Scores:")
+    for device in DEVICE_MODELS:
+        train_device_model(data, device)
+
+    print("✅ Models saved successfully!")
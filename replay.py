@@ -0,0 +1,261 @@
+import os
+import sys
+import csv
+import json
+import time
+import asyncio
+import argparse
+import numpy as np
+from collections import Counter
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from config.settings import CSV_FILE, HISTORY_DB, CONTROL_INTERVAL, VPD_MODES, ACTION_MAP, CONTROL_POLICY
+from utils.dataset import load_features, FEATURE_COLUMNS
+from utils.history import load_readings
+from utils.state_encoder import LOOKUP_STATS
+from api.rooms import Room
+from api.state import new_state
+from api.models import artifacts
+from main import LiveIO, monitor_vpd, sync_device_states
+
+# A reading holds until the next one, but not across a gap where the controller was down
+MAX_GAP = 4 * CONTROL_INTERVAL
+
+_TIME, _AIR_TEMP, _LEAF_TEMP, _HUMIDITY = (
+    FEATURE_COLUMNS.index(column) for column in ["Timestamp", "temperature", "leaf_temperature", "humidity"]
+)
+_DEVICES = [(device, FEATURE_COLUMNS.index(device)) for device in ["exhaust", "humidifier", "dehumidifier"]]
+TRACE_COLUMNS = [
+    "timestamp", "temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf",
+    "exhaust", "humidifier", "dehumidifier", "anomaly", "action", "interval", "reason"
+]
+
+
+class ReplayIO(LiveIO):
+    """
+    Feeds logged readings to `monitor_vpd` on a virtual clock, so nothing sleeps.
+
+    By default every logged row is one tick at its own timestamp. With
+    `follow_cadence` the clock advances by the interval the adaptive cadence picks
+    and each tick sees the latest row at that time, so cadence changes are replayed
+    too. The room's device states follow the log (what was really switched), the
+    commands the loop would send are recorded instead, and nothing is logged.
+    """
+
+    anomaly_backend = "local"
+
+    def __init__(self, readings, follow_cadence=False, max_gap=MAX_GAP):
+        readings = np.asarray(readings, dtype=np.float64)
+        readings = readings[np.isfinite(readings[:, [_TIME, _AIR_TEMP, _LEAF_TEMP, _HUMIDITY]]).all(axis=1)]
+        self.readings = readings[np.argsort(readings[:, _TIME], kind="stable")]
+        self.timestamps = self.readings[:, _TIME]
+        self.follow_cadence = follow_cadence
+        self.max_gap = max_gap
+
+        self.now = float(self.timestamps[0]) if len(self.timestamps) else 0.0
+        self.index = -1
+        self.decisions = []
+        self.device_calls = []
+
+    def time(self):
+        return self.now
+
+    async def read_sensor(self, room):
+        if self.follow_cadence and self.index >= 0:
+            index = int(np.searchsorted(self.timestamps, self.now, side="right")) - 1
+            # Resume at the next logged reading after a gap in the log
+            if self.now - self.timestamps[index] > self.max_gap:
+                index += 1
+        else:
+            index = self.index + 1
+        if index >= len(self.readings):
+            return None
+
+        self.index = index
+        row = self.readings[index]
+        self.now = max(self.now, float(row[_TIME]))
+        room.state.update({device: bool(row[column] == 1) for device, column in _DEVICES})
+        return float(row[_AIR_TEMP]), float(row[_LEAF_TEMP]), float(row[_HUMIDITY])
+
+    async def sleep(self, seconds):
+        if self.follow_cadence:
+            self.now += seconds
+
+    async def wait(self, cadence, interval):
+        await self.sleep(interval)
+
+    def record(self, timestamp, air_temp, leaf_temp, humidity, vpd_air, vpd_leaf, room):
+        pass
+
+    async def apply(self, action, humidity, max_humidity, air_temp, room):
+        # Unlike the live loop, show what the policy would switch
+        await sync_device_states(dict(action), humidity, max_humidity, air_temp, room, self.toggle)
+
+    async def toggle(self, device, state, room):
+        self.device_calls.append({"timestamp": self.now, "room": room.name, "device": device, "state": state})
+        room.state[device] = state
+
+    def trace(self, entry):
+        self.decisions.append(entry)
+
+
+def load_replay_readings(source=CSV_FILE, start=None, end=None):
+    """Logged readings in FEATURE_COLUMNS order, from the CSV log or (for a .db path) the history database."""
+    if source.endswith(".db"):
+        rows = load_readings(start, end, source)
+        return np.array(rows, dtype=np.float64).reshape(-1, len(FEATURE_COLUMNS))
+
+    readings = np.asarray(load_features(source))
+    timestamps = readings[:, _TIME]
+    keep = np.ones(len(readings), dtype=bool)
+    if start is not None:
+        keep &= timestamps >= start
+    if end is not None:
+        keep &= timestamps < end
+    return readings[keep]
+
+
+def run_replay(readings, grow_stage="flowering", vpd_target=None, follow_cadence=False, Q_table=None, verbose=False,
+               policy=CONTROL_POLICY):
+    """
+    Run `monitor_vpd` over `readings` until they run out.
+
+    Returns:
+    - (ReplayIO, float): the replay with its decision trace and device calls, and the wall-clock seconds it took.
+    """
+    replay = ReplayIO(readings, follow_cadence)
+    # A private in-memory state, the replay must not touch the rooms the services share
+    room = Room("replay", grow_stage=grow_stage, vpd_target=vpd_target,
+                room_state=new_state(grow_stage, "replay", path=":memory:"))
+    target_vpd_min, target_vpd_max = room.vpd_range()
+
+    # Load the models up front so the throughput only counts ticks
+    Q_table = artifacts.get("q_table") if Q_table is None else Q_table
+    artifacts.get("neighbour_index")
+    if "anomaly_detector" in artifacts.available():
+        artifacts.get("anomaly_detector")
+    if policy == "planner":
+        artifacts.get("room_model")
+
+    lookups = dict(LOOKUP_STATS)
+    with open(os.devnull, "w", encoding="utf-8") as devnull, redirect_stdout(sys.stdout if verbose else devnull):
+        start = time.perf_counter()
+        asyncio.run(monitor_vpd(target_vpd_min, target_vpd_max, Q_table, room=room, io=replay, policy=policy))
+        seconds = time.perf_counter() - start
+    replay.lookups = {outcome: LOOKUP_STATS[outcome] - count for outcome, count in lookups.items()}
+    return replay, seconds
+
+
+def action_label(action):
+    device, state = next(iter(ACTION_MAP[int(action)].items()))
+    return f"{device} {'ON' if state else 'OFF'}"
+
+
+def decision_label(entry):
+    """The Q-table action, or the device combination the planner chose."""
+    if entry.get("plan") is not None:
+        return " + ".join(device for device, on in entry["plan"]["devices"].items() if on) or "all OFF"
+    return "" if entry.get("action") is None else action_label(entry["action"])
+
+
+def time_in_band(decisions, vpd_range, max_gap=MAX_GAP):
+    """Share of the replayed time the leaf VPD spent below, inside and above `vpd_range`."""
+    vpd_min, vpd_max = vpd_range
+    totals = {"below": 0.0, "in_band": 0.0, "above": 0.0}
+    for current, following in zip(decisions, decisions[1:]):
+        dwell = min(following["timestamp"] - current["timestamp"], max_gap)
+        vpd_leaf = current["vpd_leaf"]
+        totals["below" if vpd_leaf < vpd_min else "above" if vpd_leaf > vpd_max else "in_band"] += dwell
+
+    total = sum(totals.values())
+    return {zone: round(seconds / total, 4) if total else None for zone, seconds in totals.items()}
+
+
+def summarize(replay, seconds, grow_stage):
+    decisions = replay.decisions
+    iso = lambda t: datetime.fromtimestamp(t, timezone.utc).isoformat()
+    replayed = decisions[-1]["timestamp"] - decisions[0]["timestamp"] if decisions else 0.0
+    intervals = [entry["interval"] for entry in decisions if not entry["anomaly"]]
+    plan_ms = [entry["plan"]["seconds"] * 1000 for entry in decisions if entry.get("plan") is not None]
+
+    return {
+        "ticks": len(decisions),
+        "anomalies": sum(entry["anomaly"] for entry in decisions),
+        "start": iso(decisions[0]["timestamp"]) if decisions else None,
+        "end": iso(decisions[-1]["timestamp"]) if decisions else None,
+        "replayed_seconds": round(replayed, 1),
+        "wall_seconds": round(seconds, 3),
+        "ticks_per_second": round(len(decisions) / seconds, 1) if seconds else None,
+        "speedup": round(replayed / seconds, 1) if seconds else None,
+        "mean_interval": round(float(np.mean(intervals)), 1) if intervals else None,
+        "actions": dict(Counter(decision_label(entry) for entry in decisions if not entry["anomaly"]).most_common()),
+        "device_calls": dict(Counter(
+            f"{call['device']} {'ON' if call['state'] else 'OFF'}" for call in replay.device_calls
+        ).most_common()),
+        "lookups": replay.lookups,
+        "plan_ms": {"mean": round(float(np.mean(plan_ms)), 3), "max": round(float(np.max(plan_ms)), 3)} if plan_ms else None,
+        "vpd_band": list(VPD_MODES[grow_stage]),
+        "time_in_band": time_in_band(decisions, VPD_MODES[grow_stage], replay.max_gap),
+    }
+
+
+def save_trace(decisions, path):
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, TRACE_COLUMNS, extrasaction="ignore")
+        writer.writeheader()
+        for entry in decisions:
+            writer.writerow({**entry, "action": decision_label(entry)})
+
+
+def print_summary(summary):
+    print(f"✅ Replayed {summary['ticks']} ticks ({summary['start']} - {summary['end']}) in {summary['wall_seconds']}s: "
+          f"{summary['ticks_per_second']} ticks/s, {summary['speedup']}x real time")
+    print(f"🚨 Anomalies: {summary['anomalies']} | Mean interval: {summary['mean_interval']}s | Lookups: {summary['lookups']}")
+    if summary["plan_ms"]:
+        print(f"🧭 Planning: {summary['plan_ms']['mean']} ms mean, {summary['plan_ms']['max']} ms max")
+    print(f"🎯 Leaf VPD vs {summary['vpd_band'][0]}-{summary['vpd_band'][1]} kPa: " + ", ".join(
+        f"{zone} {share:.1%}" for zone, share in summary["time_in_band"].items() if share is not None
+    ))
+    print("📊 Actions: " + ", ".join(f"{label} {count}" for label, count in summary["actions"].items()))
+    print("🔌 Device calls: " + (", ".join(f"{label} {count}" for label, count in summary["device_calls"].items()) or "none"))
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value).timestamp()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay logged readings through the control loop on a virtual clock.")
+    parser.add_argument("--source", default=CSV_FILE, help="CSV log, or a .db history database.")
+    parser.add_argument("--start", type=_timestamp, help="ISO date/time of the first reading to replay.")
+    parser.add_argument("--end", type=_timestamp, help="ISO date/time to stop at.")
+    parser.add_argument("--grow-stage", default="flowering", choices=list(VPD_MODES))
+    parser.add_argument("--vpd-target", type=float, nargs=2, metavar=("MIN", "MAX"), help="Room VPD target (default: the stage band).")
+    parser.add_argument("--policy", default=CONTROL_POLICY, choices=["q_table", "planner"], help="Device policy to replay.")
+    parser.add_argument("--follow-cadence", action="store_true", help="Tick at the adaptive cadence instead of once per logged row.")
+    parser.add_argument("--trace", help="Write the decision trace to this CSV file.")
+    parser.add_argument("--output", help="Write the summary to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Show the control loop's output.")
+    args = parser.parse_args()
+
+    try:
+        readings = load_replay_readings(args.source, args.start, args.end)
+    except FileNotFoundError as e:
+        print(e)
+        exit()
+    print(f"⏪ Replaying {len(readings)} readings from {args.source}...")
+
+    replay, seconds = run_replay(readings, args.grow_stage, args.vpd_target, args.follow_cadence, verbose=args.verbose,
+                                 policy=args.policy)
+    summary = summarize(replay, seconds, args.grow_stage)
+    print_summary(summary)
+
+    if args.trace:
+        save_trace(replay.decisions, args.trace)
+        print(f"✅ Decision trace saved at {args.trace}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=4)
+        print(f"✅ Summary saved at {args.output}")
@@ -0,0 +1,44 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.anomaly_engine import StreamingAnomalyDetector, ANOMALY_FEATURES
+from model.compiled_forest import CompiledIsolationForest
+from utils.calculate import calculate_vpd_array
+
+
+def normal_readings(count=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    air_temp = rng.normal(24.5, 1.0, count)
+    leaf_temp = air_temp - 1.3
+    humidity = rng.normal(55.0, 4.0, count)
+    vpd_air, vpd_leaf = calculate_vpd_array(air_temp, leaf_temp, humidity)
+    devices = rng.random((count, 3)) < 0.3
+    return np.column_stack([air_temp, leaf_temp, humidity, vpd_air, vpd_leaf, devices])
+
+
+def reading(air_temp, leaf_temp, humidity, devices=(False, False, False)):
+    vpd_air, vpd_leaf = calculate_vpd_array(air_temp, leaf_temp, humidity)
+    return dict(zip(ANOMALY_FEATURES, [air_temp, leaf_temp, humidity, float(vpd_air), float(vpd_leaf), *devices]))
+
+
+@pytest.fixture(scope="module")
+def forest():
+    ensemble = pytest.importorskip("sklearn.ensemble")
+    model = ensemble.IsolationForest(random_state=0).fit(normal_readings())
+    return CompiledIsolationForest.from_estimator(model)
+
+
+def test_isolation_forest_flags_an_obvious_outlier(forest):
+    # A fresh detector has no baseline yet, so only the forest can flag the first reading
+    anomalous, reasons = StreamingAnomalyDetector(forest).check(reading(45.0, 10.0, 98.0, (True, True, True)))
+    assert anomalous
+    assert reasons == ["isolation_forest"]
+
+
+def test_isolation_forest_accepts_a_typical_reading(forest):
+    anomalous, reasons = StreamingAnomalyDetector(forest).check(reading(24.5, 23.2, 55.0))
+    assert not anomalous
+    assert reasons == []
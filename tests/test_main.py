@@ -0,0 +1,40 @@
+import os
+import sys
+import types
+import asyncio
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import main
+import api.tapo_controller as tapo_controller
+from api.rooms import Room
+from api.state import new_state
+from api.models import artifacts
+from config.settings import DEVICE_MAP
+
+
+def test_run_room_reads_the_plugs_on_start(tmp_path, monkeypatch):
+    room_state = new_state(room="test-room", path=str(tmp_path / "state.db"))
+    # Stale states and an override stored by an earlier run
+    room_state.update({"exhaust": True, "humidifier": True, "overrides": {"dehumidifier": 1e12}})
+    room = Room("test-room", DEVICE_MAP, room_state=room_state)
+
+    plugs = {"exhaust": False, "humidifier": False, "dehumidifier": True}
+
+    async def get_device_info(device_name, room=None):
+        return types.SimpleNamespace(device_on=plugs[device_name])
+
+    async def no_reading(room=None):
+        return None
+
+    monkeypatch.setattr(tapo_controller, "get_device_info", get_device_info)
+    # The loop stops on the first missing reading, so only the start-up path runs
+    monkeypatch.setattr(main, "get_sensor_data", no_reading)
+    monkeypatch.setattr(main.LiveIO, "anomaly_backend", "proxy")
+    monkeypatch.setattr(main, "AIR_EXCHANGE_ENABLED", False)
+    artifacts.override("neighbour_index", (None, []), "test")
+
+    asyncio.run(main.run_room(room, {}))
+
+    _, snapshot = room_state.snapshot()
+    assert {device: snapshot[device] for device in plugs} == plugs
+    assert snapshot["overrides"] == {"dehumidifier": 1e12}
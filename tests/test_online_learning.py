@@ -0,0 +1,37 @@
+import os
+import sys
+import asyncio
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.online_learning import OnlineQLearner
+from model.q_grid import QGrid
+
+STATE = (55.0, 23.0, 24.3, 1.4, 1.2)
+NEXT_STATE = (55.0, 23.0, 24.3, 1.4, 1.3)
+
+
+def test_close_applies_queued_updates_and_checkpoints(tmp_path):
+    path = str(tmp_path / "q_grid.npy")
+    grid = QGrid(QGrid.empty_table(16))
+
+    async def run():
+        # Nothing is due for a checkpoint, only `close` can save these updates
+        learner = OnlineQLearner(grid, path, checkpoint_interval=3600)
+        task = asyncio.create_task(learner.run())
+        learner.observe(STATE, 2, -0.1, NEXT_STATE)
+        await asyncio.sleep(0.05)
+        learner.observe(NEXT_STATE, 3, -0.2, STATE)
+
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await learner.close()
+        return learner
+
+    learner = asyncio.run(run())
+    assert learner.updates == 2
+    assert learner.checkpointed_updates == 2
+
+    saved = QGrid.load(path)
+    assert np.isfinite(saved.lookup(STATE)[2])
+    assert np.isfinite(saved.lookup(NEXT_STATE)[3])
@@ -0,0 +1,82 @@
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from model.q_grid import QGrid, EMPTY_KEY, metadata_path
+
+
+def random_grid(count=500, seed=0):
+    rng = np.random.default_rng(seed)
+    states = np.column_stack([
+        rng.uniform(30, 80, count), rng.uniform(15, 30, count), rng.uniform(15, 32, count),
+        rng.uniform(0.2, 2.5, count), rng.uniform(0.0, 2.0, count),
+    ])
+    Q_table = {tuple(state): rng.normal(size=6) for state in np.round(states, 1)}
+    return QGrid.from_q_table(Q_table), np.array(list(Q_table)), rng
+
+
+def test_scalar_and_batch_lookups_agree():
+    grid, states, rng = random_grid()
+    misses = states + rng.choice([-1, 1], size=states.shape) * np.array([25.0, 10.0, 10.0, 1.0, 1.0])
+    queries = np.concatenate([states, misses])
+
+    values, found = grid.lookup_batch(queries)
+    for state, row, hit in zip(queries, values, found):
+        scalar = grid.lookup(tuple(state))
+        assert (scalar is not None) == hit
+        if hit:
+            np.testing.assert_array_equal(scalar, row)
+        else:
+            assert np.isnan(row).all()
+    assert found[:len(states)].all()
+    assert not found[len(states):].all()
+
+
+def test_colliding_keys_round_trip():
+    grid = QGrid(QGrid.empty_table(64))
+    # Cells that hash to one slot, so every insert after the first has to probe
+    candidates = np.arange(200_000, dtype=np.int64)
+    slots = grid._slots(candidates)
+    colliding = candidates[slots == slots[0]][:8]
+    assert len(colliding) == 8
+
+    for i, cell in enumerate(colliding.tolist()):
+        grid.set_cell(cell, np.full(grid.n_actions, i, dtype=np.float32))
+    assert grid.max_probe >= 7
+
+    for i, cell in enumerate(colliding.tolist()):
+        slot, _ = grid._find_slot(cell)
+        assert grid.keys[slot] == cell
+        assert (grid.q_values[slot] == i).all()
+
+    # The batch path must follow the same probe chains
+    bins = np.stack(np.unravel_index(colliding, grid.shape), axis=1)
+    values, found = grid.lookup_batch(grid.lows + bins * grid.steps)
+    assert found.all()
+    np.testing.assert_array_equal(values[:, 0], np.arange(8))
+
+
+def test_save_and_load(tmp_path):
+    grid, states, _ = random_grid()
+    path = str(tmp_path / "q_grid.npy")
+    grid.save(path)
+    assert os.path.exists(metadata_path(path))
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+    for mmap_mode in ("r", None):
+        loaded = QGrid.load(path, mmap_mode=mmap_mode)
+        assert len(loaded) == len(grid)
+        assert loaded.max_probe == grid.max_probe
+        assert loaded.table.tobytes() == grid.table.tobytes()
+        np.testing.assert_array_equal(loaded.lookup_batch(states)[0], grid.lookup_batch(states)[0])
+        np.testing.assert_array_equal(loaded.states(), grid.states())
+
+    # Saving over a mapped table replaces the file, the old mapping stays readable
+    mapped = QGrid.load(path)
+    before = mapped.table.tobytes()
+    grid.set(tuple(states[0]), np.zeros(grid.n_actions))
+    grid.save(path)
+    assert mapped.table.tobytes() == before
+    np.testing.assert_array_equal(QGrid.load(path).lookup(tuple(states[0])), np.zeros(grid.n_actions))
+    assert (QGrid.load(path).keys != EMPTY_KEY).sum() == len(grid)
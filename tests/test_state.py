@@ -0,0 +1,95 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+import pytest
+
+from api.state import SharedState, new_state
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def write_from_process(path, room, code):
+    """Run `code` with `state` bound to the room's shared state in a separate interpreter."""
+    script = f"from api.state import new_state\nstate = new_state(room={room!r}, path={path!r})\n{code}"
+    subprocess.run([sys.executable, "-c", script], cwd=ROOT, check=True, timeout=30)
+
+
+def test_versions_follow_writes_from_another_process(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = new_state(room="room", path=path)
+    version, snapshot = state.snapshot()
+    assert snapshot["exhaust"] is False
+
+    write_from_process(path, "room", "state['exhaust'] = True\nstate.set_in('overrides', 'humidifier', 1.0)")
+    version_after, snapshot = state.snapshot()
+    assert version_after == version + 2
+    assert snapshot["exhaust"] is True
+    assert snapshot["overrides"] == {"humidifier": 1.0}
+
+    # A write that changes nothing is rolled back and does not bump the version
+    write_from_process(path, "room", "state['exhaust'] = True")
+    assert state.snapshot()[0] == version_after
+
+    # Other rooms in the same database keep their own version
+    write_from_process(path, "other", "state['exhaust'] = True")
+    assert state.snapshot()[0] == version_after
+    assert new_state(room="other", path=path)["exhaust"] is True
+
+
+def test_transactions_from_several_processes_are_not_lost(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = new_state(room="room", path=path)
+    version = state.snapshot()[0]
+
+    code = "for _ in range(20):\n    state.modify('count', lambda count: count + 1, 0)"
+    writers = [threading.Thread(target=write_from_process, args=(path, "room", code)) for _ in range(3)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert state["count"] == 60
+    assert state.snapshot()[0] == version + 60
+
+
+def test_subscribers_are_notified_of_other_processes(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = new_state(room="room", path=path)
+    version = state.snapshot()[0]
+    received = []
+    notified = threading.Event()
+
+    def on_change(change):
+        received.append(change)
+        notified.set()
+
+    state.subscribe(on_change)
+    try:
+        write_from_process(path, "room", "state['humidifier'] = True")
+        assert notified.wait(5)
+    finally:
+        state.unsubscribe(on_change)
+
+    change = received[0]
+    assert change["room"] == "room"
+    assert change["keys"] == ["humidifier"]
+    assert change["pid"] != os.getpid()
+    assert change["version"] == version + 1 == state.snapshot()[0]
+    assert state["humidifier"] is True
+
+
+def test_one_instance_per_room_and_process(tmp_path):
+    path = str(tmp_path / "state.db")
+    state = new_state(room="room", path=path)
+    assert new_state(room="room", path=path) is state
+
+    # A second instance would share the connection and miss the first one's commits
+    with pytest.raises(ValueError):
+        SharedState("room", path=path)
+
+    state["exhaust"] = True
+    assert new_state(room="room", path=path)["exhaust"] is True
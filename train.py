@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import hashlib
+import argparse
+import numpy as np
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.append(os.path.abspath(os.path.dirname(__file__)))
+from config.settings import CSV_FILE, CONTROL_INTERVAL, VPD_MODES, MANIFEST_PATH
+from utils.dataset import load_features, cache_paths, features_to_frame, FEATURE_COLUMNS
+from model.manifest import artifact_hashes, load_manifest, save_manifest
+from model.train_rl_agent import train_agent, preprocess_data
+from model.train_vpd_model import train_device_model, prepare_data, DEVICE_MODELS
+from model.train_anomaly_detector import train_anomaly_detector
+from model.room_model import train_room_model
+
+JOBS = ["q_table", *(f"{device}_model" for device in DEVICE_MODELS), "anomaly_detector", "room_model"]
+
+
+def run_job(name, cache_file, rows, options):
+    """
+    Train one artifact in a worker process.
+
+    Every worker memory-maps the same feature cache, so the data is parsed once and
+    shared through the page cache instead of being pickled to each process.
+    """
+    data = features_to_frame(np.load(cache_file, mmap_mode="r")[:rows])
+    start = time.perf_counter()
+
+    if name == "q_table":
+        result = train_agent(preprocess_data(data), **options)
+    elif name == "anomaly_detector":
+        result = train_anomaly_detector(data, **options)
+    elif name == "room_model":
+        result = train_room_model(data, **options)
+    else:
+        result = train_device_model(prepare_data(data), name.removesuffix("_model"), **options)
+
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["artifacts"] = artifact_hashes(result["artifacts"])
+    return name, result
+
+
+def describe_data(csv_path, features):
+    """Source, row count, time range and content hash of the training snapshot."""
+    timestamps = features[:, FEATURE_COLUMNS.index("Timestamp")]
+    timestamps = timestamps[np.isfinite(timestamps)]
+    start, end = (float(timestamps.min()), float(timestamps.max())) if len(timestamps) else (None, None)
+    iso = lambda t: None if t is None else datetime.fromtimestamp(t, timezone.utc).isoformat()
+    return {
+        "source": os.path.abspath(csv_path),
+        "rows": int(len(features)),
+        "start": start,
+        "end": end,
+        "start_iso": iso(start),
+        "end_iso": iso(end),
+        "sha256": hashlib.sha256(np.ascontiguousarray(features).tobytes()).hexdigest(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train every model in parallel and write model/manifest.json.")
+    parser.add_argument("--csv", default=CSV_FILE)
+    parser.add_argument("--only", nargs="+", choices=JOBS, help="Train only these artifacts (the rest of the manifest is kept).")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per job, up to every core).")
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--alpha", type=float, default=0.1)
+    parser.add_argument("--gamma", type=float, default=0.9)
+    parser.add_argument("--lr-decay", type=float, default=0.98)
+    parser.add_argument("--grow-stage", default="flowering", choices=list(VPD_MODES))
+    parser.add_argument("--switch-cost", type=float, default=0.0)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--contamination", type=float, default=0.05)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.csv):
+        print(f"❌ Error: '{args.csv}' not found!")
+        exit()
+
+    # Bring the feature cache up to date once; workers map this exact snapshot
+    features = load_features(args.csv)
+    cache_file, _ = cache_paths(args.csv)
+    rows = len(features)
+
+    options = {
+        "q_table": {
+            "max_gap": 4 * CONTROL_INTERVAL, "epochs": args.epochs, "alpha": args.alpha, "gamma": args.gamma,
+            "lr_decay": args.lr_decay, "grow_stage": args.grow_stage, "switch_cost": args.switch_cost,
+        },
+        "anomaly_detector": {"contamination": args.contamination},
+        "room_model": {"max_gap": 4 * CONTROL_INTERVAL},
+        **{f"{device}_model": {"n_estimators": args.n_estimators} for device in DEVICE_MODELS},
+    }
+    jobs = args.only or JOBS
+    workers = args.workers or min(len(jobs), os.cpu_count() or 1)
+
+    previous = (load_manifest() or {}).get("artifacts", {}) if args.only else {}
+    manifest = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "data": describe_data(args.csv, features),
+        "artifacts": dict(previous),
+    }
+
+    print(f"🚀 Training {', '.join(jobs)} on {workers} workers ({rows} rows)...")
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, name, cache_file, rows, options[name]) for name in jobs]
+        for future in as_completed(futures):
+            name, result = future.result()
+            manifest["artifacts"][name] = {**result, "data_sha256": manifest["data"]["sha256"]}
+            print(f"   ✅ {name} trained in {result['seconds']:.1f}s")
+
+    manifest["seconds"] = round(time.perf_counter() - start, 3)
+    save_manifest(manifest)
+    print(f"✅ All artifacts trained in {manifest['seconds']:.1f}s, manifest saved at {MANIFEST_PATH}")
@@ -0,0 +1,124 @@
+import os
+import sys
+import time
+import asyncio
+from collections import deque
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import (
+    CONTROL_INTERVAL, VPD_MODES, MAX_HUMIDITY_LEVELS, CADENCE_MIN_INTERVAL, CADENCE_MAX_INTERVAL,
+    CADENCE_FAST_RATES, CADENCE_LIMIT_MARGINS, CADENCE_STABLE_TICKS
+)
+
+# Changes this small are sensor rounding (0.1 % humidity, 0.1 °C behind leaf VPD), not a trend
+_DEADBAND = {"humidity": 0.1, "vpd_leaf": 0.02}
+
+
+class AdaptiveCadence:
+    """
+    Picks the wait before the next tick from how the room is behaving.
+
+    - Outside the grow stage's VPD band or above its max humidity: `min_interval`.
+    - Humidity or leaf VPD changing faster than `fast_rates` (per minute): halve the interval.
+    - Within `limit_margins` of a limit: at most half the base interval.
+    - Calm for `stable_ticks` ticks in a row: grow the interval by half, up to `max_interval`.
+
+    Every decision is kept with its reason in `history`. `wake()` cuts the current
+    wait short, so events such as a finished device job are handled right away.
+    """
+
+    def __init__(self, base_interval=CONTROL_INTERVAL, min_interval=CADENCE_MIN_INTERVAL, max_interval=CADENCE_MAX_INTERVAL,
+                 fast_rates=CADENCE_FAST_RATES, limit_margins=CADENCE_LIMIT_MARGINS, stable_ticks=CADENCE_STABLE_TICKS,
+                 history_size=100):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.fast_rates = fast_rates
+        self.limit_margins = limit_margins
+        self.stable_ticks = stable_ticks
+
+        self.interval = base_interval
+        self.previous = None
+        self.stable_count = 0
+        self.history = deque(maxlen=history_size)
+        self._wake = None
+        self._wake_reason = None
+
+    def _excursion(self, humidity, vpd_leaf, vpd_min, vpd_max, max_humidity):
+        if humidity > max_humidity:
+            return f"humidity {humidity}% above max {max_humidity}%"
+        if vpd_leaf < vpd_min:
+            return f"leaf VPD {vpd_leaf} kPa below {vpd_min} kPa"
+        if vpd_leaf > vpd_max:
+            return f"leaf VPD {vpd_leaf} kPa above {vpd_max} kPa"
+        return None
+
+    def _near_limit(self, humidity, vpd_leaf, vpd_min, vpd_max, max_humidity):
+        if max_humidity - humidity < self.limit_margins["humidity"]:
+            return f"humidity {humidity}% near max {max_humidity}%"
+        if min(vpd_leaf - vpd_min, vpd_max - vpd_leaf) < self.limit_margins["vpd_leaf"]:
+            return f"leaf VPD {vpd_leaf} kPa near the {vpd_min}-{vpd_max} kPa band edge"
+        return None
+
+    def next_interval(self, humidity, vpd_leaf, grow_stage, timestamp=None, vpd_range=None):
+        """
+        Choose the wait before the next tick from the current reading. `vpd_range`
+        replaces the grow stage's VPD band for a room with its own target.
+
+        Returns:
+        - (float, str): the interval in seconds and why it was chosen.
+        """
+        timestamp = time.time() if timestamp is None else timestamp
+        vpd_min, vpd_max = vpd_range or VPD_MODES.get(grow_stage, (1.2, 1.6))
+        max_humidity = MAX_HUMIDITY_LEVELS.get(grow_stage, 50)
+
+        rates = {}
+        if self.previous is not None:
+            minutes = max(timestamp - self.previous[0], 1.0) / 60
+            changes = {"humidity": humidity - self.previous[1], "vpd_leaf": vpd_leaf - self.previous[2]}
+            rates = {
+                feature: max(abs(change) - _DEADBAND[feature], 0.0) * (1 if change >= 0 else -1) / minutes
+                for feature, change in changes.items()
+            }
+        self.previous = (timestamp, humidity, vpd_leaf)
+        fast = [feature for feature, rate in rates.items() if abs(rate) > self.fast_rates[feature]]
+
+        excursion = self._excursion(humidity, vpd_leaf, vpd_min, vpd_max, max_humidity)
+        near_limit = self._near_limit(humidity, vpd_leaf, vpd_min, vpd_max, max_humidity)
+
+        if self._wake_reason:
+            interval, reason = self.interval, f"woken: {self._wake_reason}"
+            self._wake_reason = None
+        elif excursion:
+            interval, reason = self.min_interval, f"excursion, {excursion}"
+        elif fast:
+            interval = self.interval / 2
+            reason = "fast change, " + ", ".join(f"{feature} {rates[feature]:+.2f}/min" for feature in fast)
+        elif near_limit:
+            interval, reason = min(self.interval, self.base_interval / 2), f"near limit, {near_limit}"
+        elif rates and self.stable_count + 1 >= self.stable_ticks:
+            interval, reason = self.interval * 1.5, f"stable for {self.stable_count + 1} ticks"
+        else:
+            interval, reason = self.interval, "settling"
+
+        self.stable_count = 0 if (excursion or fast or near_limit) else self.stable_count + 1
+        self.interval = min(max(interval, self.min_interval), self.max_interval)
+        self.history.append({"timestamp": timestamp, "interval": self.interval, "reason": reason})
+        return self.interval, reason
+
+    async def wait(self, interval):
+        """Sleep for `interval` seconds, or until `wake()` is called."""
+        if self._wake is None:
+            self._wake = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._wake.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            self._wake.clear()
+
+    def wake(self, reason):
+        """End the current wait early; the next decision records `reason`."""
+        self._wake_reason = reason
+        if self._wake is not None:
+            self._wake.set()
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 
 def calculate_vpd(air_temp, leaf_temp, humidity):
     """
@@ -52,3 +53,104 @@ def calculate_required_humidity(target_leaf_vpd, air_temp, leaf_temp):
     
     return round(required_humidity, 1)
 
+
+def saturation_vapor_pressure(temp, svp_table=None):
+    """
+    Vectorized Saturation Vapor Pressure in kPa for an array of temperatures (°C).
+
+    When an `SVPTable` is given, values inside its range are interpolated from the
+    table instead of calling `np.exp`.
+    """
+    temp = np.asarray(temp, dtype=np.float64)
+    if svp_table is not None:
+        return svp_table(temp)
+    return 0.61078 * np.exp((temp / (temp + 237.3)) * 17.2694)
+
+
+class SVPTable:
+    """
+    Precomputed Saturation Vapor Pressure lookup over the sensor's 0.1 °C resolution.
+
+    Temperatures inside [t_min, t_max] are linearly interpolated between grid points,
+    anything outside falls back to the exact formula. NaN stays NaN.
+
+    NumPy's `exp` is vectorised, so the table is slower than the exact formula
+    (about 1.3 vs 0.7 ms per 100k rows, see the `vpd.calculate_vpd.*_svp_table`
+    benchmark) and is never used by default. Keep it for platforms without a
+    vectorised `exp`, or where values must come from one shared grid.
+    """
+
+    def __init__(self, t_min=-10.0, t_max=50.0, step=0.1):
+        self.t_min = t_min
+        self.step = step
+        self.temps = np.linspace(t_min, t_max, int(round((t_max - t_min) / step)) + 1)
+        self.t_max = self.temps[-1]
+        self.values = saturation_vapor_pressure(self.temps)
+        self.slopes = np.append(np.diff(self.values), 0.0)
+
+    def __call__(self, temp):
+        temp = np.asarray(temp, dtype=np.float64)
+        position = temp - self.t_min
+        position *= 1 / self.step
+        # Out-of-range (and NaN) indices are clipped by `take`, NaN then propagates through the fraction
+        with np.errstate(invalid="ignore"):
+            index = position.astype(np.intp)
+        position -= index
+        result = self.slopes.take(index, mode="clip")
+        result *= position
+        result += self.values.take(index, mode="clip")
+
+        # Only a batch reaching past the table pays for the range masks
+        if not (temp.min(initial=self.t_min) >= self.t_min and temp.max(initial=self.t_max) <= self.t_max):
+            outside = (temp < self.t_min) | (temp > self.t_max)
+            result = np.where(outside, 0.61078 * np.exp((temp / (temp + 237.3)) * 17.2694), result)
+        return result
+
+
+def calculate_vpd_array(air_temp, leaf_temp, humidity, dtype=np.float64, svp_table=None, decimals=None):
+    """
+    Array-in/array-out version of `calculate_vpd`.
+
+    Missing readings (NaN) propagate to NaN instead of the scalar 0.0 default.
+    Pass `dtype=np.float32` to halve the output size and `decimals=2` to match the
+    rounding of the scalar function.
+
+    Returns:
+    - (np.ndarray, np.ndarray): Air VPD and Leaf VPD in kPa.
+    """
+    air_temp = np.asarray(air_temp, dtype=np.float64)
+    leaf_temp = np.asarray(leaf_temp, dtype=np.float64)
+    humidity = np.asarray(humidity, dtype=np.float64)
+
+    asvp = saturation_vapor_pressure(air_temp, svp_table)
+    lsvp = saturation_vapor_pressure(leaf_temp, svp_table)
+
+    air_vpd = asvp * (1 - humidity / 100)
+    leaf_vpd = lsvp - asvp * (humidity / 100)
+
+    if decimals is not None:
+        air_vpd = np.round(air_vpd, decimals)
+        leaf_vpd = np.round(leaf_vpd, decimals)
+
+    return air_vpd.astype(dtype, copy=False), leaf_vpd.astype(dtype, copy=False)
+
+
+def calculate_required_humidity_array(target_leaf_vpd, air_temp, leaf_temp, dtype=np.float64, svp_table=None, decimals=None):
+    """
+    Array-in/array-out version of `calculate_required_humidity`.
+
+    Results are clipped to 0-100 %. Rows with a zero ASVP get the scalar default of
+    50 %, missing readings (NaN) stay NaN.
+    """
+    target_leaf_vpd = np.asarray(target_leaf_vpd, dtype=np.float64)
+    asvp = saturation_vapor_pressure(air_temp, svp_table)
+    lsvp = saturation_vapor_pressure(leaf_temp, svp_table)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        required_humidity = np.clip(((lsvp - target_leaf_vpd) / asvp) * 100, 0, 100)
+    required_humidity = np.where(asvp == 0, 50.0, required_humidity)
+
+    if decimals is not None:
+        required_humidity = np.round(required_humidity, decimals)
+
+    return required_humidity.astype(dtype, copy=False)
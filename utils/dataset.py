@@ -0,0 +1,179 @@
+import io
+import os
+import sys
+import csv
+import json
+import hashlib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import CSV_FILE, COLUMN_MAPPING
+
+FEATURE_COLUMNS = ["Timestamp"] + list(COLUMN_MAPPING.values())
+DEVICE_COLUMNS = ["exhaust", "humidifier", "dehumidifier"]
+
+_HEAD_BYTES = 4096
+_BOOLEANS = {"true": 1.0, "false": 0.0}
+
+
+def cache_paths(csv_path):
+    """Feature cache (.npy) and its metadata (.json) stored next to the log."""
+    base = os.path.splitext(csv_path)[0]
+    return f"{base}.features.npy", f"{base}.features.json"
+
+
+def _head_digest(file, length):
+    file.seek(0)
+    return hashlib.sha1(file.read(length)).hexdigest()
+
+
+def _parse_value(value):
+    value = value.strip()
+    if not value:
+        return np.nan
+    boolean = _BOOLEANS.get(value.lower())
+    if boolean is not None:
+        return boolean
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def _parse_rows(lines, column_index):
+    """Parse CSV lines into an (N, len(FEATURE_COLUMNS)) float64 array."""
+    rows = np.full((len(lines), len(FEATURE_COLUMNS)), np.nan)
+    for i, record in enumerate(csv.reader(lines)):
+        for j, source in enumerate(column_index):
+            if source is not None and source < len(record):
+                rows[i, j] = _parse_value(record[source])
+    return rows
+
+
+def _column_index(header):
+    """Map each feature column to its position in the CSV header (None if missing)."""
+    names = [COLUMN_MAPPING.get(name.strip(), name.strip()) for name in header]
+    return [names.index(column) if column in names else None for column in FEATURE_COLUMNS]
+
+
+def _append_rows(cache_file, rows):
+    """
+    Append rows to an existing .npy in place.
+
+    NumPy leaves spare room in the header for the first axis to grow, so only the
+    header is rewritten and the old rows are never touched. Returns False if the
+    header would not fit and the caller has to rewrite the file.
+    """
+    with open(cache_file, "r+b") as file:
+        version = np.lib.format.read_magic(file)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(file)
+        data_offset = file.tell()
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            return False
+
+        header = {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False,
+                  "shape": (shape[0] + len(rows),) + shape[1:]}
+        # Build the new header aside first, the file is only touched once it is known to fit
+        buffer = io.BytesIO()
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(buffer, header)
+        else:
+            np.lib.format.write_array_header_2_0(buffer, header)
+        if buffer.tell() != data_offset:
+            return False
+
+        file.seek(0)
+        file.write(buffer.getvalue())
+        file.seek(data_offset + shape[0] * rows.shape[1] * rows.itemsize)
+        file.write(np.ascontiguousarray(rows).tobytes())
+    return True
+
+
+def load_features(csv_path=CSV_FILE, verbose=True):
+    """
+    Load the log as a typed (N, len(FEATURE_COLUMNS)) float64 array.
+
+    The parsed rows are cached in `<log>.features.npy`. Later calls only parse the
+    bytes appended to the log since the cached offset, append them to the cache and
+    return the whole cache memory-mapped. The cache is rebuilt if the log was
+    replaced, truncated or its header changed. Device states are stored as 0/1 and
+    missing values as NaN.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"❌ Error: '{csv_path}' not found!")
+
+    cache_file, meta_file = cache_paths(csv_path)
+    metadata = None
+    if os.path.exists(cache_file) and os.path.exists(meta_file):
+        with open(meta_file, "r", encoding="utf-8") as file:
+            metadata = json.load(file)
+
+    with open(csv_path, "rb") as file:
+        size = os.path.getsize(csv_path)
+
+        # The start of the log identifies it, a different digest means it was replaced
+        if (metadata is None or metadata.get("columns") != FEATURE_COLUMNS or size < metadata.get("offset", 0)
+                or metadata.get("head_digest") != _head_digest(file, metadata.get("head_bytes", 0))):
+            metadata = None
+
+        offset = metadata["offset"] if metadata else 0
+        file.seek(offset)
+        chunk = file.read()
+
+    # Only parse complete lines, a partially written last row is picked up next time
+    end = chunk.rfind(b"\n") + 1
+    lines = [line for line in chunk[:end].decode("utf-8").splitlines() if line.strip()]
+
+    if metadata is None:
+        if not lines:
+            return np.empty((0, len(FEATURE_COLUMNS)))
+        header = next(csv.reader([lines[0]]))
+        lines = lines[1:]
+    else:
+        header = metadata["header"]
+
+    if metadata is not None and not lines:
+        if verbose:
+            print(f"✅ Feature cache up to date: {metadata['rows']} rows (0 new).")
+        return np.load(cache_file, mmap_mode="r")
+
+    rows = _parse_rows(lines, _column_index(header))
+
+    if metadata is None or not _append_rows(cache_file, rows):
+        if metadata is not None:
+            rows = np.concatenate([np.load(cache_file), rows])
+        np.save(cache_file, rows)
+
+    total = (metadata["rows"] if metadata else 0) + len(lines)
+    with open(csv_path, "rb") as file:
+        head_bytes = metadata["head_bytes"] if metadata else min(_HEAD_BYTES, offset + end)
+        head_digest = metadata["head_digest"] if metadata else _head_digest(file, head_bytes)
+
+    with open(meta_file, "w", encoding="utf-8") as file:
+        json.dump({"columns": FEATURE_COLUMNS, "header": header, "offset": offset + end, "rows": total,
+                   "head_bytes": head_bytes, "head_digest": head_digest}, file, indent=4)
+
+    if verbose:
+        print(f"✅ Feature cache up to date: {total} rows ({len(lines)} new).")
+    return np.load(cache_file, mmap_mode="r")
+
+
+def features_to_frame(features):
+    """
+    Wrap a feature matrix from `load_features` in a DataFrame with the training column names.
+
+    Device columns are booleans (missing treated as OFF); sensor values keep NaN
+    for missing readings so each script can apply its own fill.
+    """
+    import pandas as pd
+
+    data = pd.DataFrame(np.asarray(features), columns=FEATURE_COLUMNS)
+    for column in DEVICE_COLUMNS:
+        data[column] = data[column].fillna(0).astype(bool)
+    return data
+
+
+def load_dataset_frame(csv_path=CSV_FILE, verbose=True):
+    """Load the cached features as a DataFrame (see `features_to_frame`)."""
+    return features_to_frame(load_features(csv_path, verbose))
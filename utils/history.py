@@ -0,0 +1,299 @@
+import os
+import sys
+import sqlite3
+import threading
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import HISTORY_DB, ROLLUP_TIERS, HISTORY_RETENTION, HISTORY_PRUNE_INTERVAL, ENERGY_RETENTION, CONTROL_INTERVAL
+from utils.metrics import LOG_SECONDS
+
+# Sensor readings plus the device states, stored as 0/1 so their mean is the duty cycle
+HISTORY_FIELDS = [
+    "temperature", "leaf_temperature", "humidity", "vpd_air", "vpd_leaf",
+    "exhaust", "humidifier", "dehumidifier"
+]
+
+# Telemetry of the energy-monitoring plugs; the energy and runtime counters reset at the plug's midnight
+ENERGY_FIELDS = ["power_w", "today_energy_wh", "today_runtime_min", "month_energy_wh"]
+
+# One connection and prune time per database, each room of a multi-room controller has its own
+_connections = {}
+_lock = threading.Lock()
+_last_prune = {}
+
+
+def rollup_table(tier):
+    """Return the table name of a rollup tier."""
+    if tier not in ROLLUP_TIERS:
+        raise ValueError(f"❌ Invalid rollup tier: {tier}")
+    return f"rollup_{tier}"
+
+
+def _create_tables(conn):
+    raw_columns = ", ".join(f"{field} REAL" for field in HISTORY_FIELDS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS readings (timestamp REAL NOT NULL, {raw_columns})")
+    conn.execute("CREATE INDEX IF NOT EXISTS readings_timestamp ON readings (timestamp)")
+
+    aggregate_columns = ", ".join(
+        f"{field}_min REAL, {field}_max REAL, {field}_sum REAL" for field in HISTORY_FIELDS
+    )
+    for tier in ROLLUP_TIERS:
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {rollup_table(tier)} "
+            f"(bucket INTEGER PRIMARY KEY, samples INTEGER NOT NULL, {aggregate_columns})"
+        )
+
+    energy_columns = ", ".join(f"{field} REAL" for field in ENERGY_FIELDS)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS energy (timestamp REAL NOT NULL, device TEXT NOT NULL, {energy_columns})")
+    conn.execute("CREATE INDEX IF NOT EXISTS energy_device_timestamp ON energy (device, timestamp)")
+
+
+def get_connection(path=HISTORY_DB):
+    """Open (once per path) the SQLite history database and make sure all tables exist."""
+    if path not in _connections:
+        connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        _create_tables(connection)
+        _connections[path] = connection
+    return _connections[path]
+
+
+def _rollup_upsert_sql(tier):
+    columns = ", ".join(f"{field}_min, {field}_max, {field}_sum" for field in HISTORY_FIELDS)
+    placeholders = ", ".join("?, ?, ?" for _ in HISTORY_FIELDS)
+    updates = ", ".join(
+        f"{field}_min = MIN({field}_min, excluded.{field}_min), "
+        f"{field}_max = MAX({field}_max, excluded.{field}_max), "
+        f"{field}_sum = {field}_sum + excluded.{field}_sum"
+        for field in HISTORY_FIELDS
+    )
+    return (
+        f"INSERT INTO {rollup_table(tier)} (bucket, samples, {columns}) VALUES (?, 1, {placeholders}) "
+        f"ON CONFLICT(bucket) DO UPDATE SET samples = samples + 1, {updates}"
+    )
+
+
+def record_reading(timestamp, air_temp, leaf_temp, humidity, vpd_air, vpd_leaf, exhaust_state, humidifier_state, dehumidifier_state,
+                   path=HISTORY_DB):
+    """
+    Store one raw reading and fold it into every rollup tier.
+
+    Each tier keeps min/max/sum per bucket, so updating it costs one upsert per tier
+    no matter how much history has already been stored.
+    """
+    values = [
+        float(air_temp), float(leaf_temp), float(humidity), float(vpd_air), float(vpd_leaf),
+        float(bool(exhaust_state)), float(bool(humidifier_state)), float(bool(dehumidifier_state))
+    ]
+
+    with _lock, LOG_SECONDS.time(sink="history"):
+        conn = get_connection(path)
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                f"INSERT INTO readings (timestamp, {', '.join(HISTORY_FIELDS)}) VALUES (?{', ?' * len(HISTORY_FIELDS)})",
+                [timestamp] + values
+            )
+            aggregates = [v for value in values for v in (value, value, value)]
+            for tier, width in ROLLUP_TIERS.items():
+                bucket = int(timestamp // width) * width
+                conn.execute(_rollup_upsert_sql(tier), [bucket] + aggregates)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    if timestamp - _last_prune.get(path, 0.0) >= HISTORY_PRUNE_INTERVAL:
+        prune_history(timestamp, path)
+
+
+def record_energy(timestamp, samples, path=HISTORY_DB):
+    """Store one poll of the energy-monitoring plugs: `samples` maps a device name to its ENERGY_FIELDS values."""
+    rows = [
+        [timestamp, device] + [None if sample.get(field) is None else float(sample[field]) for field in ENERGY_FIELDS]
+        for device, sample in samples.items()
+    ]
+    if not rows:
+        return
+
+    with _lock, LOG_SECONDS.time(sink="energy"):
+        get_connection(path).executemany(
+            f"INSERT INTO energy (timestamp, device, {', '.join(ENERGY_FIELDS)}) VALUES (?, ?{', ?' * len(ENERGY_FIELDS)})",
+            rows
+        )
+
+
+def prune_history(now=None, path=HISTORY_DB):
+    """Delete raw readings and rollup buckets older than their configured retention."""
+    now = time.time() if now is None else now
+    deleted = {}
+
+    with _lock:
+        conn = get_connection(path)
+        retention = HISTORY_RETENTION.get("raw")
+        if retention is not None:
+            deleted["raw"] = conn.execute("DELETE FROM readings WHERE timestamp < ?", (now - retention,)).rowcount
+
+        for tier in ROLLUP_TIERS:
+            retention = HISTORY_RETENTION.get(tier)
+            if retention is not None:
+                deleted[tier] = conn.execute(
+                    f"DELETE FROM {rollup_table(tier)} WHERE bucket < ?", (now - retention,)
+                ).rowcount
+
+        if ENERGY_RETENTION is not None:
+            deleted["energy"] = conn.execute("DELETE FROM energy WHERE timestamp < ?", (now - ENERGY_RETENTION,)).rowcount
+
+    _last_prune[path] = now
+    return deleted
+
+
+def load_readings(start=None, end=None, path=HISTORY_DB):
+    """Raw readings between `start` and `end` as (timestamp, *HISTORY_FIELDS) rows, oldest first."""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("timestamp < ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with _lock:
+        return get_connection(path).execute(
+            f"SELECT timestamp, {', '.join(HISTORY_FIELDS)} FROM readings {where} ORDER BY timestamp", params
+        ).fetchall()
+
+
+def load_energy(start=None, end=None, device=None, path=HISTORY_DB):
+    """Energy samples between `start` and `end` (of one `device`, or all) as dicts, oldest first."""
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("timestamp >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("timestamp < ?")
+        params.append(end)
+    if device is not None:
+        conditions.append("device = ?")
+        params.append(device)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with _lock:
+        rows = get_connection(path).execute(
+            f"SELECT timestamp, device, {', '.join(ENERGY_FIELDS)} FROM energy {where} ORDER BY timestamp", params
+        ).fetchall()
+    return [dict(zip(["timestamp", "device"] + ENERGY_FIELDS, row)) for row in rows]
+
+
+def _counter_increase(previous, current):
+    """Increase of a daily counter between two samples; a drop means it reset at midnight."""
+    if previous is None or current is None:
+        return 0.0
+    return current - previous if current >= previous else current
+
+
+def energy_summary(start, end, vpd_range, max_gap=4 * CONTROL_INTERVAL, path=HISTORY_DB):
+    """
+    Energy use of every plug between `start` and `end`.
+
+    Energy and runtime come from the plugs' own daily counters, so they are exact
+    however often the plugs were polled. Per device: `energy_wh`, `runtime_s`,
+    `duty_cycle` (runtime over the sampled time) and `mean_power_w`. The room's
+    `vpd_hours` are the hours its leaf VPD spent inside `vpd_range` (a reading
+    holds for at most `max_gap` seconds); `wh_per_vpd_hour` divides each plug's
+    energy by them.
+    """
+    vpd_min, vpd_max = vpd_range
+    readings = load_readings(start, end, path)
+    vpd_leaf = HISTORY_FIELDS.index("vpd_leaf") + 1
+    in_band = sum(
+        min(following[0] - current[0], max_gap)
+        for current, following in zip(readings, readings[1:])
+        if current[vpd_leaf] is not None and vpd_min <= current[vpd_leaf] <= vpd_max
+    )
+    vpd_hours = in_band / 3600
+
+    samples = {}
+    for sample in load_energy(start, end, path=path):
+        samples.setdefault(sample["device"], []).append(sample)
+
+    devices = {}
+    for device, series in samples.items():
+        sampled = series[-1]["timestamp"] - series[0]["timestamp"]
+        energy_wh = sum(_counter_increase(a["today_energy_wh"], b["today_energy_wh"]) for a, b in zip(series, series[1:]))
+        runtime_s = 60 * sum(_counter_increase(a["today_runtime_min"], b["today_runtime_min"]) for a, b in zip(series, series[1:]))
+        powers = [sample["power_w"] for sample in series if sample["power_w"] is not None]
+        devices[device] = {
+            "samples": len(series),
+            "sampled_s": round(sampled, 1),
+            "energy_wh": round(energy_wh, 3),
+            "runtime_s": round(runtime_s, 1),
+            "duty_cycle": round(min(runtime_s / sampled, 1.0), 4) if sampled else None,
+            "mean_power_w": round(sum(powers) / len(powers), 2) if powers else None,
+            "wh_per_vpd_hour": round(energy_wh / vpd_hours, 3) if vpd_hours else None,
+        }
+
+    total_wh = sum(entry["energy_wh"] for entry in devices.values())
+    return {
+        "start": start,
+        "end": end,
+        "vpd_range": list(vpd_range),
+        "vpd_hours": round(vpd_hours, 3),
+        "energy_wh": round(total_wh, 3),
+        "wh_per_vpd_hour": round(total_wh / vpd_hours, 3) if vpd_hours else None,
+        "devices": devices,
+    }
+
+
+def load_rollup(tier, start=None, end=None, path=HISTORY_DB):
+    """
+    Read one rollup tier as a list of dicts with min/max/mean per field.
+
+    Device fields report their mean as the duty cycle (0.0-1.0) of the bucket.
+    """
+    table = rollup_table(tier)
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("bucket >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("bucket < ?")
+        params.append(end)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with _lock:
+        cursor = get_connection(path).execute(f"SELECT * FROM {table} {where} ORDER BY bucket", params)
+        columns = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
+
+    result = []
+    for row in rows:
+        record = dict(zip(columns, row))
+        entry = {"timestamp": record["bucket"], "samples": record["samples"]}
+        for field in HISTORY_FIELDS:
+            entry[f"{field}_min"] = record[f"{field}_min"]
+            entry[f"{field}_max"] = record[f"{field}_max"]
+            entry[f"{field}_mean"] = record[f"{field}_sum"] / record["samples"]
+        result.append(entry)
+    return result
+
+
+def load_rollup_frame(tier, start=None, end=None, path=HISTORY_DB):
+    """
+    Read a rollup tier into a DataFrame shaped like the cleaned training data.
+
+    The plain field columns hold the bucket means, so training scripts can use a
+    coarse tier wherever they would otherwise read `vpd_log.csv`.
+    """
+    import pandas as pd
+
+    data = pd.DataFrame(load_rollup(tier, start, end, path))
+    if data.empty:
+        return pd.DataFrame(columns=["timestamp"] + HISTORY_FIELDS)
+
+    for field in HISTORY_FIELDS:
+        data[field] = data[f"{field}_mean"]
+    return data
@@ -0,0 +1,170 @@
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import METRIC_BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A metric family: one series per combination of label values, passed as keyword arguments."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"❌ {self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self.lock:
+            for key, value in sorted(self.series.items()):
+                lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.series[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; every series keeps its bucket counts, sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=METRIC_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_series(self, key, value):
+        counts, total, count = value
+        lines = [
+            f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {bucket_count}"
+            for bound, bucket_count in zip(self.buckets, counts)
+        ]
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+REGISTRY = []
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+# Control tick stages
+TICK_SECONDS = Histogram("vpd_tick_seconds", "Time spent in one control tick, excluding the wait.", ["room"])
+TICK_INTERVAL = Gauge("vpd_tick_interval_seconds", "Wait chosen before the next control tick.", ["room"])
+TICK_OVERRUNS = Counter("vpd_tick_overruns_total", "Control ticks that took longer than the planned interval.", ["room"])
+SENSOR_SECONDS = Histogram("vpd_sensor_read_seconds", "get_sensor_data latency, including retries.", ["room", "outcome"])
+SENSOR_ATTEMPTS = Counter("vpd_sensor_attempts_total", "Sensor hub reads by outcome.", ["room", "outcome"])
+ANOMALY_SECONDS = Histogram("vpd_anomaly_check_seconds", "Anomaly detection latency.", ["backend"])
+ANOMALIES = Counter("vpd_anomalies_total", "Readings flagged as anomalous.", ["room"])
+POLICY_SECONDS = Histogram("vpd_policy_seconds", "choose_best_action latency by lookup path.", ["path"])
+PLAN_SECONDS = Histogram("vpd_plan_seconds", "Lookahead planner latency.", ["room"])
+DEVICE_SECONDS = Histogram("vpd_device_command_seconds", "toggle_device latency.", ["device", "outcome"])
+DEVICE_COMMANDS = Counter("vpd_device_commands_total", "toggle_device calls.", ["room", "device", "outcome"])
+ENERGY_POLL_SECONDS = Histogram("vpd_energy_poll_seconds", "Energy telemetry read latency per plug.", ["device", "outcome"])
+DEVICE_POWER = Gauge("vpd_device_power_watts", "Current power draw of an energy-monitoring plug.", ["room", "device"])
+DEVICE_ENERGY_TODAY = Gauge("vpd_device_energy_today_wh", "Energy used today, as counted by the plug.", ["room", "device"])
+DEVICE_RUNTIME_TODAY = Gauge("vpd_device_runtime_today_seconds", "Time switched on today, as counted by the plug.", ["room", "device"])
+LOG_SECONDS = Histogram("vpd_log_write_seconds", "Reading log write latency.", ["sink"])
+
+# HTTP services
+REQUEST_SECONDS = Histogram("vpd_http_request_seconds", "HTTP route latency.", ["service", "route", "method", "status"])
+
+
+def start_metrics_server(port, host="0.0.0.0"):
+    """Serve `/metrics` from a daemon thread, for processes without a web framework."""
+    # http.server is only needed by the process that serves metrics itself
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"📈 Metrics served on http://{host}:{server.server_address[1]}/metrics")
+    return server
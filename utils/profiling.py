@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+import marshal
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import PROFILE_DIR, PROFILE_MAX_DURATION, PROFILE_SAMPLE_INTERVAL, PROFILE_TOP
+
+
+def _frame_key(frame):
+    code = frame.f_code
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _frame_label(key):
+    filename, line, name = key
+    return f"{os.path.basename(filename)}:{name}:{line}"
+
+
+class SamplingProfiler:
+    """
+    Statistical CPU profiler for a live process.
+
+    A background thread records the stack of every other thread every `interval`
+    seconds, so the profiled code runs unmodified and the overhead stays flat no
+    matter how many calls it makes. Samples are written as collapsed stacks (for
+    flame graphs) and as a pstats file whose times are sample counts × interval.
+    """
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+
+    def _sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_key(frame))
+                frame = frame.f_back
+            self.stacks[(names.get(ident, str(ident)), tuple(reversed(stack)))] += 1
+        self.samples += 1
+
+    def run(self, duration):
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            self._sample()
+            time.sleep(self.interval)
+
+    def write_collapsed(self, path):
+        with open(path, "w", encoding="utf-8") as file:
+            for (thread, stack), count in self.stacks.most_common():
+                file.write(";".join([thread, *map(_frame_label, stack)]) + f" {count}\n")
+
+    def write_pstats(self, path):
+        """Write the samples in the marshalled format `pstats.Stats` loads."""
+        own, total, callers = Counter(), Counter(), {}
+        for (_, stack), count in self.stacks.items():
+            if not stack:
+                continue
+            own[stack[-1]] += count
+            # Count a recursive function once per sample
+            for key in set(stack):
+                total[key] += count
+            for caller, callee in zip(stack, stack[1:]):
+                entry = callers.setdefault(callee, {})
+                entry[caller] = entry.get(caller, 0) + count
+
+        stats = {
+            key: (
+                total[key], total[key], own[key] * self.interval, total[key] * self.interval,
+                {caller: (n, n, 0.0, n * self.interval) for caller, n in callers.get(key, {}).items()},
+            )
+            for key in total
+        }
+        with open(path, "wb") as file:
+            marshal.dump(stats, file)
+
+    def top(self, limit=PROFILE_TOP):
+        """Functions with the most samples on top of the stack."""
+        own = Counter()
+        for (_, stack), count in self.stacks.items():
+            if stack:
+                own[stack[-1]] += count
+        return [{"function": _frame_label(key), "samples": count} for key, count in own.most_common(limit)]
+
+
+def trace_memory(duration, path, limit=PROFILE_TOP):
+    """
+    Compare two tracemalloc snapshots taken `duration` seconds apart.
+
+    The second snapshot is dumped to `path` (load it with `tracemalloc.Snapshot.load`).
+    Returns the lines whose allocations grew the most in between.
+    """
+    started_here = not tracemalloc.is_tracing()
+    if started_here:
+        tracemalloc.start(25)
+    try:
+        before = tracemalloc.take_snapshot()
+        time.sleep(duration)
+        after = tracemalloc.take_snapshot()
+    finally:
+        if started_here:
+            tracemalloc.stop()
+
+    after.dump(path)
+    return [
+        {
+            "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            "size_kb": round(stat.size / 1024, 1),
+            "size_diff_kb": round(stat.size_diff / 1024, 1),
+            "count_diff": stat.count_diff,
+        }
+        for stat in after.compare_to(before, "lineno")[:limit]
+    ]
+
+
+class ProfileSession:
+    """
+    Runs one CPU profile or memory trace at a time in a background thread, so a
+    running service can be profiled without blocking it or restarting it.
+    """
+
+    def __init__(self, output_dir=PROFILE_DIR, name="service"):
+        self.output_dir = output_dir
+        self.name = name
+        self.lock = threading.Lock()
+        self.current = None
+        self.last = None
+
+    def start(self, kind, duration):
+        """Start a "cpu" or "memory" capture. Returns its status, or None while another one runs."""
+        if kind not in ("cpu", "memory"):
+            raise ValueError(f"❌ Invalid profile kind: {kind}")
+        duration = min(max(float(duration), 0.1), PROFILE_MAX_DURATION)
+
+        with self.lock:
+            if self.current is not None:
+                return None
+            os.makedirs(self.output_dir, exist_ok=True)
+            prefix = os.path.join(self.output_dir, f"{self.name}-{kind}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+            self.current = {"kind": kind, "duration": duration, "started": time.time(), "prefix": prefix}
+            status = dict(self.current)
+
+        threading.Thread(target=self._run, args=(kind, duration, prefix), name=f"profile-{kind}", daemon=True).start()
+        print(f"🔬 {kind.upper()} profile started for {duration:g}s, writing {prefix}.*")
+        return status
+
+    def _run(self, kind, duration, prefix):
+        result = dict(self.current)
+        try:
+            if kind == "cpu":
+                profiler = SamplingProfiler()
+                profiler.run(duration)
+                profiler.write_collapsed(f"{prefix}.collapsed")
+                profiler.write_pstats(f"{prefix}.pstats")
+                result.update(samples=profiler.samples, files=[f"{prefix}.collapsed", f"{prefix}.pstats"], top=profiler.top())
+            else:
+                top = trace_memory(duration, f"{prefix}.tracemalloc")
+                result.update(files=[f"{prefix}.tracemalloc"], top=top)
+            print(f"✅ {kind.upper()} profile written to {prefix}.*")
+        except Exception as e:
+            result["error"] = str(e)
+            print(f"❌ {kind.upper()} profile failed: {e}")
+
+        with self.lock:
+            result["finished"] = time.time()
+            self.last = result
+            self.current = None
+
+    def status(self):
+        with self.lock:
+            return {"running": self.current, "last": self.last}
@@ -0,0 +1,99 @@
+import os
+import sys
+import time
+import hashlib
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from config.settings import STATE_RESOLUTION, STATE_SCALE, Q_INDEX_PATH
+from utils.metrics import POLICY_SECONDS
+
+STATE_FEATURES = ["humidity", "leaf_temperature", "temperature", "vpd_air", "vpd_leaf"]
+
+# Q-table lookup outcomes since process start: exact hit, nearest-neighbour hit, miss
+LOOKUP_STATS = {"hit": 0, "near_hit": 0, "miss": 0}
+
+
+def encode_state(humidity, leaf_temp, air_temp, vpd_air, vpd_leaf, resolution=STATE_RESOLUTION):
+    """Round a single reading onto the shared state grid (the Q-table key)."""
+    return tuple(
+        round(round(value / step) * step, 6)
+        for value, step in zip((humidity, leaf_temp, air_temp, vpd_air, vpd_leaf), resolution)
+    )
+
+
+def encode_states(states, resolution=STATE_RESOLUTION):
+    """Vectorized `encode_state` for an (N, 5) array; gives the same keys as the scalar version."""
+    steps = np.asarray(resolution, dtype=np.float64)
+    return np.round(np.round(np.asarray(states, dtype=np.float64) / steps) * steps, 6)
+
+
+def scale_states(states):
+    """Scale states so one unit of Euclidean distance means the same in every dimension."""
+    return np.asarray(states, dtype=np.float64) / np.asarray(STATE_SCALE)
+
+
+def record_lookup(outcome, started=None):
+    """Count a Q-table lookup outcome ("hit", "near_hit" or "miss"), timed from `started` (perf_counter) if given."""
+    LOOKUP_STATS[outcome] += 1
+    if started is not None:
+        POLICY_SECONDS.observe(time.perf_counter() - started, path=outcome)
+
+
+def _index_signature(known_states):
+    digest = hashlib.sha1(np.ascontiguousarray(known_states).tobytes())
+    digest.update(np.asarray(STATE_SCALE, dtype=np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def known_states_of(Q_table):
+    """(N, 5) states of a dict Q-table, or the visited cell centres of a Q-grid."""
+    if hasattr(Q_table, "states"):
+        return Q_table.states()
+    return np.array(list(Q_table.keys()), dtype=np.float64)
+
+
+def build_neighbour_index(Q_table):
+    """Build a KDTree over the scaled Q-table states (visited cells of a Q-grid)."""
+    from scipy.spatial import KDTree
+
+    if not Q_table:
+        return None, []
+
+    known_states = known_states_of(Q_table)
+    return KDTree(scale_states(known_states)), known_states
+
+
+def save_neighbour_index(state_tree, known_states, path=Q_INDEX_PATH):
+    """Persist a built neighbour index next to the Q-table."""
+    import joblib
+
+    joblib.dump({"signature": _index_signature(known_states), "tree": state_tree, "known_states": known_states}, path)
+    print(f"✅ Neighbour index saved at {path}!")
+
+
+def load_neighbour_index(Q_table, path=Q_INDEX_PATH):
+    """
+    Load the persisted neighbour index, rebuilding (and re-saving) it when it is
+    missing or was built from a different Q-table.
+    """
+    if not Q_table:
+        return None, []
+
+    known_states = known_states_of(Q_table)
+
+    if os.path.exists(path):
+        import joblib
+
+        try:
+            index = joblib.load(path)
+            if index.get("signature") == _index_signature(known_states):
+                print("✅ Neighbour index loaded.")
+                return index["tree"], index["known_states"]
+            print("⚠️ Neighbour index is stale, rebuilding...")
+        except Exception as e:
+            print(f"⚠️ Failed to load neighbour index: {e}, rebuilding...")
+
+    state_tree, known_states = build_neighbour_index(Q_table)
+    save_neighbour_index(state_tree, known_states, path)
+    return state_tree, known_states